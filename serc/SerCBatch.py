@@ -0,0 +1,125 @@
+import os
+import glob
+import time
+from serc.SerCExceptions import SerCError, SerCParseError
+
+def expandSpecPaths(patterns):
+    """
+    Expand a list of spec files, directories and glob patterns into a sorted
+    list of spec file paths with duplicates removed. Directories contribute
+    every .json file directly inside them.
+    """
+    specPaths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            specPaths.update(glob.glob(os.path.join(pattern, '*.json')))
+        elif glob.has_magic(pattern):
+            matches = glob.glob(pattern)
+            if not matches:
+                raise SerCParseError('No spec files match: ' + pattern)
+            specPaths.update(matches)
+        else:
+            specPaths.add(pattern)
+    return sorted(specPaths)
+
+def outputPathFor(specPath, outputDir=None):
+    """
+    The output file for a spec. This is the spec's base name with a .c
+    extension, either next to the spec or inside outputDir.
+    """
+    baseName = os.path.splitext(os.path.basename(specPath))[0] + '.c'
+    if outputDir is None:
+        return os.path.join(os.path.dirname(specPath), baseName)
+    return os.path.join(outputDir, baseName)
+
+class SerCSpecResult(object):
+    """
+    The outcome of generating a single spec file. cacheHits and
+    cacheMisses count the structures found in and missing from the cache,
+    and are None when no cache was used.
+    """
+    def __init__(self, specPath, outputPath, wallTime, error=None, cacheHits=None, cacheMisses=None):
+        self.specPath = specPath
+        self.outputPath = outputPath
+        self.wallTime = wallTime
+        self.error = error
+        self.cacheHits = cacheHits
+        self.cacheMisses = cacheMisses
+
+def generateSpec(specPath, outputPath, cacheDir=None, cacheSize=None, defaults=None, roots=None):
+    """
+    Parse and render a single spec file into outputPath. The output is
+    written to a temporary file first so that a failed spec never leaves a
+    partial output file behind. This runs inside worker processes, so all
+    errors are returned in the result rather than raised.
+    """
+    # Imported here so that worker processes only pay for what they use
+    import serc
+    from serc.SerCCache import SerCSectionCache
+
+    startTime = time.perf_counter()
+    tmpPath = '{0}.{1}.tmp'.format(outputPath, os.getpid())
+    cache = None
+    try:
+        if cacheDir is not None:
+            cache = SerCSectionCache(cacheDir, cacheSize if cacheSize is not None else SerCSectionCache.DEFAULT_MAX_BYTES)
+        with open(specPath, 'r') as specFile, open(tmpPath, 'w') as outFile:
+            serializer = serc.JsonToCSerializer(specFile, outFile, cache, defaults, roots=roots)
+            serializer.parse()
+        os.replace(tmpPath, outputPath)
+        error = None
+    except (SerCError, OSError, ValueError, TypeError) as e:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        error = '{0}: {1}'.format(type(e).__name__, e)
+    wallTime = time.perf_counter() - startTime
+    if cache is None:
+        return SerCSpecResult(specPath, outputPath, wallTime, error)
+    return SerCSpecResult(specPath, outputPath, wallTime, error, cache.hits, cache.misses)
+
+def generateSpecs(specPaths, outputDir=None, jobs=1, cacheDir=None, cacheSize=None, defaults=None, roots=None):
+    """
+    Generate every spec in specPaths, using a pool of jobs worker processes
+    when jobs is more than one. defaults holds structure options for
+    structures that do not set them in their spec. roots limits every spec
+    to the named structures and their dependencies. Returns the results in the same order as
+    specPaths. If any spec failed, a single SerCParseError describing every
+    failure is raised after all of the specs have been attempted, with the
+    results attached as its results attribute.
+    """
+    if outputDir is not None:
+        os.makedirs(outputDir, exist_ok=True)
+    outputPaths = [outputPathFor(specPath, outputDir) for specPath in specPaths]
+    if len(set(outputPaths)) != len(outputPaths):
+        raise SerCParseError('Several spec files would generate the same output file. Give each spec a unique name')
+
+    if jobs <= 1 or len(specPaths) <= 1:
+        results = [generateSpec(specPath, outputPath, cacheDir, cacheSize, defaults, roots) for specPath, outputPath in zip(specPaths, outputPaths)]
+    else:
+        # Imported here since it is slow to import and only needed for jobs > 1
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(generateSpec, specPath, outputPath, cacheDir, cacheSize, defaults, roots) for specPath, outputPath in zip(specPaths, outputPaths)]
+            results = [future.result() for future in futures]
+
+    failures = [result for result in results if result.error is not None]
+    if failures:
+        error = SerCParseError('{0} of {1} spec files failed:\n{2}'.format(
+            len(failures), len(results), '\n'.join('  {0}: {1}'.format(result.specPath, result.error) for result in failures)))
+        error.results = results
+        raise error
+    return results
+
+def formatCacheStats(results):
+    """Format the total cache hits and misses of the specs that used a cache"""
+    cached = [result for result in results if result.cacheHits is not None]
+    return 'serc cache: {0} hits, {1} misses'.format(sum(result.cacheHits for result in cached), sum(result.cacheMisses for result in cached))
+
+def formatSummary(results, wallTime):
+    """Format a table of the wall time taken by each spec and the whole run"""
+    lines = []
+    for result in results:
+        status = 'ok' if result.error is None else 'FAILED'
+        lines.append('{0:9.3f}s  {1:6}  {2}'.format(result.wallTime, status, result.specPath))
+    lines.append('{0:9.3f}s  total for {1} spec files'.format(wallTime, len(results)))
+    return '\n'.join(lines)
@@ -0,0 +1,291 @@
+"""
+Benchmarks for the generator and for the C code it generates.
+
+    python -m serc.SerCBench run -o results.json
+    python -m serc.SerCBench compare baseline.json results.json
+
+run measures how long a fresh interpreter takes to import serc, times the
+parse and emit phases of JsonToCSerializer over synthetic specs of
+increasing size, then compiles a small harness around generated
+code with the local C compiler and times serialize, deserialize and
+allocate throughput. compare flags every metric that got slower than the
+threshold between two runs.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+import serc
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+DEFAULT_THRESHOLD = 0.10
+
+# The generator is spawned thousands of times per build, so importing it
+# must stay cheap. run fails if importing the CLI takes longer than this.
+DEFAULT_IMPORT_BUDGET = 0.100
+
+def makeSyntheticSpec(structCount, seed=0):
+    """
+    Build a spec with structCount structures mixing ints, doubles, vectors
+    and struct stubs. Stubs only refer to earlier fixed size structures so
+    that the spec is valid C in declaration order.
+    """
+    rng = random.Random(seed)
+    structList = []
+    fixedNames = []
+    for structIndex in range(structCount):
+        typeName = 'bench_struct_{0}'.format(structIndex)
+        contents = [{'name': 'count', 'type': 'uint8_t'}]
+        hasVector = False
+        for memberIndex in range(rng.randint(2, 12)):
+            name = 'm{0}'.format(memberIndex)
+            choice = rng.random()
+            if choice < 0.4:
+                contents.append({'name': name, 'type': {'type_name': 'int', 'args': [rng.choice(['signed', 'unsigned']), rng.choice([8, 16, 32, 64])]}})
+            elif choice < 0.7:
+                contents.append({'name': name, 'type': 'double'})
+            elif choice < 0.85 or not fixedNames:
+                contents.append({'name': name, 'type': {'type_name': 'vector', 'args': [rng.choice(['double', 'uint8_t', 'int'])]}, 'list_length': 'this->count'})
+                hasVector = True
+            else:
+                contents.append({'name': name, 'type': {'type_name': 'struct', 'args': [rng.choice(fixedNames)]}})
+        structList.append({'type_name': typeName, 'contents': contents})
+        if not hasVector:
+            fixedNames.append(typeName)
+    return {'struct_list': structList}
+
+def _bestOf(repeats, function):
+    best = None
+    for _ in range(repeats):
+        startTime = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - startTime
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def benchGenerator(sizes, repeats=3):
+    """Time the parse and emit phases for a synthetic spec of each size"""
+    results = {}
+    for size in sizes:
+        specText = json.dumps(makeSyntheticSpec(size))
+        serializers = []
+
+        def parse():
+            serializer = serc.JsonToCSerializer(io.StringIO(specText))
+            serializer.parseStructures()
+            serializers.append(serializer)
+
+        def emit():
+            serializers[-1].emit(io.StringIO())
+
+        parseTime = _bestOf(repeats, parse)
+        emitTime = _bestOf(repeats, emit)
+        results['generator.parse.{0}'.format(size)] = parseTime
+        results['generator.emit.{0}'.format(size)] = emitTime
+    return results
+
+def benchImport(repeats=5):
+    """
+    Time importing serc and its CLI in fresh interpreters, minus the time
+    taken to start an interpreter that imports nothing
+    """
+    def timeInterpreter(code):
+        return _bestOf(repeats, lambda: subprocess.run([sys.executable, '-c', code], check=True))
+    baseline = timeInterpreter('pass')
+    return {
+        'startup.import_serc': max(timeInterpreter('import serc') - baseline, 0.0),
+        'startup.import_cli': max(timeInterpreter('import serc.__main__') - baseline, 0.0),
+    }
+
+# The spec that the generated C code is benchmarked with
+HARNESS_SPEC = {'struct_list': [
+    {'type_name': 'point', 'contents': [
+        {'name': 'x', 'type': 'int'},
+        {'name': 'y', 'type': 'int'},
+        {'name': 'z', 'type': 'int'},
+    ]},
+    {'type_name': 'telemetry', 'contents': [
+        {'name': 'count', 'type': {'type_name': 'int', 'args': ['unsigned', 32]}},
+        {'name': 'timestamp', 'type': 'double'},
+        {'name': 'flags', 'type': 'uint8_t'},
+        {'name': 'samples', 'type': {'type_name': 'vector', 'args': ['double']}, 'list_length': 'this->count'},
+        {'name': 'origin', 'type': {'type_name': 'struct', 'args': ['point']}},
+    ]},
+]}
+
+HARNESS_MAIN = r"""
+#include <stdio.h>
+#include <time.h>
+
+#define SAMPLES 64
+
+static volatile size_t sink;
+
+static double now(void) {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return ts.tv_sec + ts.tv_nsec * 1e-9;
+}
+
+int main(int argc, char** argv) {
+    long iterations = argc > 1 ? atol(argv[1]) : 1000000;
+    static uint8_t buffer[4096];
+    double samples[SAMPLES] = {0};
+    struct point origin = {1, 2, 3};
+    struct telemetry* message;
+    struct telemetry decoded;
+    double start;
+    long i;
+
+    if (telemetry_new(&message, SAMPLES, 1.5, 7, samples, origin) < 0) {
+        return 1;
+    }
+    decoded.samples = malloc(sizeof(double) * SAMPLES);
+
+    start = now();
+    for (i = 0; i < iterations; i++) {
+        sink += point_serialize(buffer, sizeof(buffer), &origin);
+    }
+    printf("\"c.point_serialize\": %.6e,\n", (now() - start) / iterations);
+
+    start = now();
+    for (i = 0; i < iterations; i++) {
+        sink += point_deserialize(buffer, sizeof(buffer), &origin);
+    }
+    printf("\"c.point_deserialize\": %.6e,\n", (now() - start) / iterations);
+
+    start = now();
+    for (i = 0; i < iterations; i++) {
+        sink += telemetry_serialize(buffer, sizeof(buffer), message);
+    }
+    printf("\"c.telemetry_serialize\": %.6e,\n", (now() - start) / iterations);
+
+    start = now();
+    for (i = 0; i < iterations; i++) {
+        sink += telemetry_deserialize(buffer, sizeof(buffer), &decoded);
+    }
+    printf("\"c.telemetry_deserialize\": %.6e,\n", (now() - start) / iterations);
+
+    start = now();
+    for (i = 0; i < iterations; i++) {
+        struct telemetry* allocated;
+        sink += telemetry_new(&allocated, SAMPLES, 1.5, 7, samples, origin);
+        free(allocated->samples);
+        free(allocated);
+    }
+    printf("\"c.telemetry_new\": %.6e\n", (now() - start) / iterations);
+    return 0;
+}
+"""
+
+def findCompiler(compiler=None):
+    """Find a C compiler, preferring compiler, then $CC, then cc, gcc and clang"""
+    for candidate in [compiler, os.environ.get('CC'), 'cc', 'gcc', 'clang']:
+        if candidate and shutil.which(candidate):
+            return candidate
+    return None
+
+def benchGeneratedCode(compiler=None, iterations=1000000):
+    """
+    Generate code for HARNESS_SPEC, compile it with a timing harness and
+    return the seconds per operation of each generated function. Returns
+    an empty dictionary if there is no C compiler.
+    """
+    compiler = findCompiler(compiler)
+    if compiler is None:
+        sys.stderr.write('serc bench: no C compiler found, skipping the generated code benchmarks\n')
+        return {}
+
+    with tempfile.TemporaryDirectory() as workDir:
+        sourcePath = os.path.join(workDir, 'harness.c')
+        binaryPath = os.path.join(workDir, 'harness')
+        with open(sourcePath, 'w') as source:
+            serc.JsonToCSerializer(io.StringIO(json.dumps(HARNESS_SPEC)), source).parse()
+            source.write(HARNESS_MAIN)
+        subprocess.run([compiler, '-O2', '-std=gnu11', '-o', binaryPath, sourcePath], check=True)
+        output = subprocess.run([binaryPath, str(iterations)], check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads('{' + output + '}')
+
+def runBenchmarks(sizes=DEFAULT_SIZES, compiler=None, repeats=3, iterations=1000000):
+    """Run every benchmark and return the results, ready to be saved as JSON"""
+    metrics = benchImport()
+    metrics.update(benchGenerator(sizes, repeats))
+    metrics.update(benchGeneratedCode(compiler, iterations))
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'compiler': findCompiler(compiler),
+        },
+        'metrics': metrics,
+    }
+
+def compareResults(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare two sets of results. Every metric is a time, so lower is better.
+    Returns a list of (metric, baseline time, current time, change) for each
+    metric that got more than threshold slower, as a fraction of baseline.
+    """
+    regressions = []
+    for metric, baselineTime in sorted(baseline['metrics'].items()):
+        currentTime = current['metrics'].get(metric)
+        if currentTime is None or baselineTime <= 0:
+            continue
+        change = (currentTime - baselineTime) / baselineTime
+        if change > threshold:
+            regressions.append((metric, baselineTime, currentTime, change))
+    return regressions
+
+def formatResults(results):
+    return '\n'.join('{0:40} {1:.6e}s'.format(metric, value) for metric, value in sorted(results['metrics'].items()))
+
+parser = argparse.ArgumentParser(prog='python -m serc.SerCBench')
+subparsers = parser.add_subparsers(dest='command')
+runParser = subparsers.add_parser('run', help='Run the benchmarks')
+runParser.add_argument('-o', '--output', help='Save the results to this JSON file')
+runParser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                       help='The numbers of structures in the synthetic specs')
+runParser.add_argument('--repeats', type=int, default=3,
+                       help='Take the best of this many runs of each generator phase')
+runParser.add_argument('--iterations', type=int, default=1000000,
+                       help='Iterations of each generated C function')
+runParser.add_argument('--cc', help='The C compiler to use')
+runParser.add_argument('--import-budget', type=float, default=DEFAULT_IMPORT_BUDGET,
+                       help='Fail if importing the CLI takes longer than this many seconds')
+compareParser = subparsers.add_parser('compare', help='Flag regressions between two runs')
+compareParser.add_argument('baseline')
+compareParser.add_argument('current')
+compareParser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                           help='Flag metrics that are slower by more than this fraction')
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    if args.command == 'run':
+        results = runBenchmarks(args.sizes, args.cc, args.repeats, args.iterations)
+        print(formatResults(results))
+        if args.output is not None:
+            with open(args.output, 'w') as outputFile:
+                json.dump(results, outputFile, indent=2, sort_keys=True)
+        importTime = results['metrics']['startup.import_cli']
+        if importTime > args.import_budget:
+            print('OVER BUDGET: importing the CLI took {0:.3f}s, the budget is {1:.3f}s'.format(importTime, args.import_budget))
+            sys.exit(1)
+    elif args.command == 'compare':
+        with open(args.baseline) as baselineFile, open(args.current) as currentFile:
+            regressions = compareResults(json.load(baselineFile), json.load(currentFile), args.threshold)
+        for metric, baselineTime, currentTime, change in regressions:
+            print('REGRESSION {0}: {1:.6e}s -> {2:.6e}s ({3:+.1%})'.format(metric, baselineTime, currentTime, change))
+        if regressions:
+            sys.exit(1)
+        print('No regressions')
+    else:
+        parser.print_help()
@@ -0,0 +1,92 @@
+"""
+Table driven CRCs for frame envelopes. Both CRCs are the reflected
+variants, so one slice-by-N loop serves both: CRC-16/X-25 (poly 0x1021,
+as used by HDLC) and CRC-32/ISO-HDLC (poly 0x04C11DB7, as used by zlib
+and Ethernet). The lookup tables are computed here and emitted into the
+generated code as constants.
+"""
+
+# name: (width, reflected polynomial, initial value, final xor)
+CRC_PARAMETERS = {
+    'crc16': (16, 0x8408, 0xffff, 0xffff),
+    'crc32': (32, 0xedb88320, 0xffffffff, 0xffffffff),
+}
+
+# How many bytes the generated update loop consumes per iteration, and so
+# how many 256 entry tables it needs
+SLICES = 8
+
+def crcTables(name):
+    """
+    Return the SLICES tables of a CRC. Table 0 is the usual byte at a
+    time table, and table k is the CRC of a byte followed by k zero
+    bytes, so that SLICES bytes can be folded in at once.
+    """
+    width, polynomial, initial, xorOut = CRC_PARAMETERS[name]
+    first = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ polynomial if crc & 1 else crc >> 1
+        first.append(crc)
+    tables = [first]
+    for _ in range(1, SLICES):
+        previous = tables[-1]
+        tables.append([(value >> 8) ^ first[value & 0xff] for value in previous])
+    return tables
+
+def crc(name, data):
+    """Compute a CRC of bytes in Python, for type IDs and checks"""
+    width, polynomial, initial, xorOut = CRC_PARAMETERS[name]
+    table = crcTables(name)[0]
+    value = initial
+    for byte in data:
+        value = (value >> 8) ^ table[(value ^ byte) & 0xff]
+    return value ^ xorOut
+
+def formatCRCSupport(name):
+    """Format the C support code for one CRC: its tables, constants and update function"""
+    width, polynomial, initial, xorOut = CRC_PARAMETERS[name]
+    cType = 'uint{0}_t'.format(width)
+    digits = width // 4
+    upper = name.upper()
+
+    lines = ['#ifndef SERC_{0}_DEFINED'.format(upper), '#define SERC_{0}_DEFINED'.format(upper)]
+    lines.append('#define SERC_{0}_INIT 0x{1:0{2}x}u'.format(upper, initial, digits))
+    lines.append('#define SERC_{0}_XOROUT 0x{1:0{2}x}u'.format(upper, xorOut, digits))
+    lines.append('#define SERC_{0}_SIZE {1}'.format(upper, width // 8))
+    lines.append('')
+    lines.append('static const {0} serc_{1}_table[{2}][256] = {{'.format(cType, name, SLICES))
+    for table in crcTables(name):
+        lines.append('    {')
+        for start in range(0, 256, 8):
+            lines.append('        ' + ', '.join('0x{0:0{1}x}'.format(value, digits) for value in table[start:start + 8]) + ',')
+        lines.append('    },')
+    lines.append('};')
+    lines.append('')
+
+    # Slice-by-8: the CRC is folded into the first bytes of each 8 byte
+    # block, then every byte of the block is looked up in the table for
+    # its distance from the end of the block. Bytes are assembled one at a
+    # time so the loop is independent of host byte order and alignment.
+    lines.append('''/* Fold length bytes into a {0} that started from SERC_{1}_INIT. XOR the result with SERC_{1}_XOROUT to finish it. */
+static inline {2} serc_{0}_update({2} crc, const uint8_t* data, size_t length) {{
+    const {2} (*table)[256] = serc_{0}_table;
+    while (length >= 8) {{
+        uint32_t low = ((uint32_t)data[0] | ((uint32_t)data[1] << 8) | ((uint32_t)data[2] << 16) | ((uint32_t)data[3] << 24)) ^ crc;
+        uint32_t high = (uint32_t)data[4] | ((uint32_t)data[5] << 8) | ((uint32_t)data[6] << 16) | ((uint32_t)data[7] << 24);
+        crc = table[7][low & 0xff] ^ table[6][(low >> 8) & 0xff] ^ table[5][(low >> 16) & 0xff] ^ table[4][low >> 24] ^
+              table[3][high & 0xff] ^ table[2][(high >> 8) & 0xff] ^ table[1][(high >> 16) & 0xff] ^ table[0][high >> 24];
+        data += 8;
+        length -= 8;
+    }}
+    while (length > 0) {{
+        crc = ({2})((crc >> 8) ^ table[0][(crc ^ *data) & 0xff]);
+        data++;
+        length--;
+    }}
+    return crc;
+}}
+#endif
+'''.format(name, upper, cType))
+    return '\n'.join(lines)
@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import hashlib
+
+class SerCSectionCache(object):
+    """
+    An on-disk cache of the rendered sections of each structure, keyed by a
+    hash of the structure's normalized JSON and the versions of the SerC
+    types it uses. The cache directory is kept under maxBytes by evicting
+    the least recently used entries.
+    """
+    # Bump this whenever a change to the generator changes its output so
+    # that stale cache entries are never spliced into new output
+    FORMAT_VERSION = 15
+
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, directory, maxBytes=DEFAULT_MAX_BYTES, verbose=False, log=None):
+        super().__init__()
+        self._directory = directory
+        self._maxBytes = maxBytes
+        self._verbose = verbose
+        self._log = log if log is not None else sys.stderr
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self._directory, exist_ok=True)
+
+    def key(self, node, structure, options=None):
+        """
+        Compute the cache key for a structure from its raw JSON node, the
+        types it uses and any generator options that change its output
+        """
+        hasher = hashlib.sha256()
+        hasher.update(str(self.FORMAT_VERSION).encode())
+        hasher.update(json.dumps(node, sort_keys=True, separators=(',', ':')).encode())
+        hasher.update(json.dumps(structure.getTypeVersions(), separators=(',', ':')).encode())
+        if options:
+            hasher.update(json.dumps(options, sort_keys=True, separators=(',', ':')).encode())
+        return hasher.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self._directory, key + '.json')
+
+    def get(self, key, typeName=None):
+        """Return the cached sections for key, or None if they are not cached"""
+        path = self._path(key)
+        try:
+            with open(path, 'r') as cacheFile:
+                sections = json.load(cacheFile)
+        except (OSError, ValueError):
+            self.misses += 1
+            self._report('miss', typeName, key)
+            return None
+
+        # Mark the entry as recently used for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        self._report('hit', typeName, key)
+        return sections
+
+    def put(self, key, sections):
+        """Store the rendered sections for key"""
+        path = self._path(key)
+        tmpPath = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(tmpPath, 'w') as cacheFile:
+            json.dump(sections, cacheFile)
+        os.replace(tmpPath, path)
+
+    def prune(self):
+        """
+        Evict the least recently used entries until the cache directory
+        holds no more than maxBytes. Returns the number of entries evicted.
+        """
+        entries = []
+        totalBytes = 0
+        for entry in os.scandir(self._directory):
+            if not entry.name.endswith('.json') or not entry.is_file():
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            totalBytes += stat.st_size
+
+        evicted = 0
+        entries.sort()
+        for mtime, size, path in entries:
+            if totalBytes <= self._maxBytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            totalBytes -= size
+            evicted += 1
+        return evicted
+
+    def _report(self, result, typeName, key):
+        if self._verbose:
+            self._log.write('serc cache {0}: {1} ({2})\n'.format(result, typeName, key[:12]))
+
+    def formatStats(self):
+        return 'serc cache: {0} hits, {1} misses'.format(self.hits, self.misses)
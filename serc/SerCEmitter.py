@@ -0,0 +1,40 @@
+class SerCEmitter(object):
+    """
+    Collects fragments of generated code and hands them to a sink in large
+    chunks. The sink can be anything with a .write() method (an open file,
+    io.StringIO, sys.stdout) or None to just keep everything in memory.
+    charsEmitted counts the characters written, which is not the size in
+    bytes of the encoded output if a spec has non-ASCII comments or names.
+    """
+    DEFAULT_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, sink=None, chunkSize=DEFAULT_CHUNK_SIZE):
+        super().__init__()
+        self._sink = sink
+        self._chunkSize = chunkSize
+        self._chunks = []
+        self._pending = 0
+        self.charsEmitted = 0
+
+    def write(self, text):
+        """Queue a fragment of text, flushing to the sink once a chunk is full"""
+        self._chunks.append(text)
+        self._pending += len(text)
+        self.charsEmitted += len(text)
+        if self._sink is not None and self._pending >= self._chunkSize:
+            self.flush()
+
+    def line(self, text=''):
+        """Queue a single line of text, the same as print() would produce"""
+        self.write(text + '\n')
+
+    def flush(self):
+        """Write everything queued so far to the sink as a single chunk"""
+        if self._sink is not None and self._chunks:
+            self._sink.write(''.join(self._chunks))
+            self._chunks = []
+            self._pending = 0
+
+    def getvalue(self):
+        """Return everything that is queued but has not been written to the sink"""
+        return ''.join(self._chunks)
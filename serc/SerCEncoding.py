@@ -0,0 +1,59 @@
+"""
+Sizes of the compact wire encodings. A varint takes one byte per seven
+bits of its value, so small values take a byte where the fixed encoding
+takes the full width of the type. Signed values are zigzag encoded first,
+and delta encoded vectors store the zigzagged difference to the previous
+element, which can need one more bit than the elements themselves.
+"""
+import struct
+
+# The longest varint, for a full 64 bit value
+MAX_VARINT_BYTES = 10
+
+def getEncodedSizes(record, encoding):
+    """
+    Return the (fixed, minimum, maximum) bytes of one value of an integer
+    member, or of one element of an integer vector, when it is written
+    with encoding
+    """
+    structFormat = record.structFormat if record.kind == 'scalar' else record.element.structFormat
+    fixed = struct.calcsize('<' + structFormat)
+    bits = fixed * 8
+    if encoding == 'fixed':
+        return fixed, fixed, fixed
+    if encoding == 'delta':
+        bits += 1
+    return fixed, 1, min((bits + 6) // 7, MAX_VARINT_BYTES)
+
+def formatEncodingReport(structures):
+    """
+    Format a table of the bytes each integer member takes per value in
+    each encoding it supports, and the total for the integer members of
+    each structure with the encodings it is generated with
+    """
+    lines = ['{0:40} {1:>8} {2:>8} {3:>6} {4:>8} {5:>8}'.format(
+        'member', 'per', 'encoding', 'fixed', 'varint', 'delta')]
+    for structure in structures.values():
+        totals = [0, 0, 0]
+        for record in structure.getRecords():
+            encodings = record.member.getEncodings()
+            if 'varint' not in encodings:
+                continue
+            columns = []
+            for encoding in ('varint', 'delta'):
+                if encoding in encodings:
+                    fixed, minimum, maximum = getEncodedSizes(record, encoding)
+                    columns.append('{0}-{1}'.format(minimum, maximum))
+                else:
+                    columns.append('-')
+            lines.append('{0:40} {1:>8} {2:>8} {3:>6} {4:>8} {5:>8}'.format(
+                '{0}.{1}'.format(structure.typeName, record.name),
+                'value' if record.kind == 'scalar' else 'element',
+                record.encoding, getEncodedSizes(record, 'fixed')[0], columns[0], columns[1]))
+            if record.kind == 'scalar':
+                for index, size in enumerate(getEncodedSizes(record, record.encoding)):
+                    totals[index] += size
+        if any(totals):
+            lines.append('{0:40} integer members take {1}-{2} bytes, against {3} fixed'.format(
+                structure.typeName, totals[1], totals[2], totals[0]))
+    return '\n'.join(lines)
@@ -0,0 +1,108 @@
+"""
+The dependency graph between the structures of a spec. A structure
+depends on every structure it nests by value, which must be defined before
+it, and on the element structures of its vectors, which are only used
+through a pointer and so only need to be defined somewhere in the output.
+"""
+from serc.SerCExceptions import SerCParseError
+
+def getDependencies(structure):
+    """
+    Return a (type name, nested) pair for each structure that structure
+    refers to, in member order. nested is True for structures nested by
+    value and False for the element types of vectors.
+    """
+    dependencies = []
+    for record in structure.getRecords():
+        if record.kind == 'struct':
+            dependencies.append((record.structTypeName, True))
+            continue
+        element = record.element
+        while element is not None:
+            if element.kind == 'struct':
+                dependencies.append((element.structTypeName, False))
+            element = element.element
+    return dependencies
+
+class SerCDependencyGraph(object):
+    """
+    The dependencies between a dictionary of type name to SerCStructure.
+    Every structure that is referred to must be in the dictionary.
+    """
+    def __init__(self, structures):
+        super().__init__()
+        self._structures = structures
+        self._edges = {}
+        for typeName, structure in structures.items():
+            edges = getDependencies(structure)
+            for dependency, nested in edges:
+                if dependency not in structures:
+                    raise SerCParseError('Structure "{0}" refers to the unknown structure "{1}"'.format(typeName, dependency))
+            self._edges[typeName] = edges
+
+    def getDependencies(self, typeName):
+        """The (type name, nested) dependencies of one structure"""
+        return self._edges[typeName]
+
+    def reachable(self, roots):
+        """Return the set of structures that the structures named in roots depend on, including the roots"""
+        for root in roots:
+            if root not in self._structures:
+                raise SerCParseError('Unknown root structure: ' + root)
+        seen = set(roots)
+        pending = list(roots)
+        while pending:
+            for dependency, nested in self._edges[pending.pop()]:
+                if dependency not in seen:
+                    seen.add(dependency)
+                    pending.append(dependency)
+        return seen
+
+    def order(self, typeNames=None):
+        """
+        Return the names of the structures in typeNames, or of every
+        structure, in an order where each is defined after the structures
+        it nests. Vector element types also come first unless they are
+        part of a cycle, which is allowed since vectors are pointers.
+        Otherwise the spec order is kept. Raises a SerCParseError naming
+        the structures if any of them nest each other by value.
+        """
+        if typeNames is None:
+            typeNames = list(self._structures)
+        else:
+            typeNames = [typeName for typeName in self._structures if typeName in typeNames]
+        preferred = self._postorder(typeNames, nestedOnly=False)
+        return self._postorder(preferred, nestedOnly=True)
+
+    def _postorder(self, typeNames, nestedOnly):
+        """
+        Depth first postorder over the structures starting from each of
+        typeNames in turn. Cycles are skipped over, unless nestedOnly is
+        set, in which case only nested edges are followed and a cycle is an
+        error.
+        """
+        order = []
+        state = {}
+        for root in typeNames:
+            if root in state:
+                continue
+            state[root] = 'visiting'
+            stack = [(root, iter(self._edges[root]))]
+            while stack:
+                typeName, edges = stack[-1]
+                for dependency, nested in edges:
+                    if nestedOnly and not nested:
+                        continue
+                    if dependency not in state:
+                        state[dependency] = 'visiting'
+                        stack.append((dependency, iter(self._edges[dependency])))
+                        break
+                    if nestedOnly and state[dependency] == 'visiting':
+                        path = [name for name, _ in stack]
+                        cycle = path[path.index(dependency):] + [dependency]
+                        raise SerCParseError('Structures cannot contain themselves: ' + ' -> '.join(cycle))
+                else:
+                    stack.pop()
+                    state[typeName] = 'done'
+                    order.append(typeName)
+        return order
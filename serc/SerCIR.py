@@ -0,0 +1,109 @@
+"""
+The compiled intermediate representation that sits between parsing and
+emission. Parsing produces SerCType member objects; compiling a structure
+turns them into compact SerCMemberRecords whose C type strings, sizes and
+wire offsets are computed exactly once, so that every backend reads them
+instead of re-deriving the same strings for each section.
+"""
+
+class SerCTypeDescriptor(object):
+    """
+    The facts about a type that do not depend on the member using it. There
+    is one interned descriptor for each distinct (type_name, args), shared
+    by every member of that type.
+
+    kind is one of:
+        scalar - a fixed width number with a struct format character
+        vector - a variable length list stored behind a pointer
+        struct - a nested structure, see structTypeName
+        opaque - any other fixed size type
+    """
+    __slots__ = ('typeClass', 'kind', 'cType', 'size', 'alignment', 'structFormat', 'swapSize',
+                 'fixedSize', 'requiredHeaders', 'usedTypes', 'structTypeName', 'element')
+
+    def __init__(self, typeObject):
+        self.typeClass = type(typeObject)
+        self.cType = typeObject.formatCType()
+        self.structFormat = typeObject.getStructFormat()
+        self.swapSize = typeObject.getSwapSize()
+        self.alignment = typeObject.getAlignment()
+        self.fixedSize = typeObject.isFixedSize()
+        self.requiredHeaders = frozenset(typeObject.getRequiredHeaders())
+        self.usedTypes = tuple(typeObject.getUsedTypes())
+        self.structTypeName = typeObject.getStructTypeName() if hasattr(typeObject, 'getStructTypeName') else None
+        self.element = typeObject.getElementType().getDescriptor() if hasattr(typeObject, 'getElementType') else None
+
+        # The size of a vector depends on its member's list_length
+        self.size = typeObject.formatSize() if self.fixedSize else None
+
+        if not self.fixedSize:
+            self.kind = 'vector'
+        elif self.structFormat is not None:
+            self.kind = 'scalar'
+        elif self.structTypeName is not None:
+            self.kind = 'struct'
+        else:
+            self.kind = 'opaque'
+
+class SerCMemberRecord(object):
+    """
+    A compiled member of a structure. size is the C expression for its
+    serialized size with the fixed encoding, and offset is the C
+    expression for its offset on the wire, or None when a vector or a
+    compact encoding before it makes the offset variable. encoding is its
+    wire encoding, see SerCType.getEncodings.
+    member is the parsed SerCType, for the member specific code it emits.
+    """
+    __slots__ = ('name', 'member', 'descriptor', 'kind', 'cType', 'size', 'fixedSize', 'alignment',
+                 'encoding', 'offset', 'listLength', 'structFormat', 'structTypeName', 'element')
+
+    def __init__(self, member, offset, size=None, encoding='fixed'):
+        descriptor = member.getDescriptor()
+        self.name = member.name
+        self.member = member
+        self.descriptor = descriptor
+        self.kind = descriptor.kind
+        self.cType = descriptor.cType
+        self.fixedSize = descriptor.fixedSize
+        if size is not None:
+            self.size = size
+        else:
+            self.size = descriptor.size if descriptor.fixedSize else member.formatSize()
+        self.alignment = descriptor.alignment
+        self.encoding = encoding
+        self.offset = offset
+        self.listLength = getattr(member, 'listLength', None)
+        self.structFormat = descriptor.structFormat
+        self.structTypeName = descriptor.structTypeName
+        self.element = descriptor.element
+
+def compileMembers(members, structSize=None, compact=False):
+    """
+    Compile a list of parsed members into member records with their wire
+    offsets. structSize is an optional function from a nested structure's
+    type name to the C expression for its serialized size, for when that
+    is not the sizeof its in-memory structure. If compact is set, members
+    that do not set an encoding use their type's compact encoding.
+    """
+    records = []
+    offsetTerms = []
+    for member in members:
+        offset = None
+        if offsetTerms is not None:
+            offset = ' + '.join(offsetTerms) if offsetTerms else '0'
+        size = None
+        if structSize is not None and member.getDescriptor().kind == 'struct':
+            size = structSize(member.getDescriptor().structTypeName)
+        encoding = member.encoding
+        if encoding is None:
+            encoding = member.getCompactEncoding() if compact else 'fixed'
+        record = SerCMemberRecord(member, offset, size, encoding)
+        records.append(record)
+        if offsetTerms is not None:
+            if record.fixedSize and encoding == 'fixed':
+                offsetTerms.append(record.size)
+            else:
+                # Everything after a vector or a compact member has a
+                # variable offset
+                offsetTerms = None
+    return records
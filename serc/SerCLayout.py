@@ -0,0 +1,116 @@
+"""
+Natural alignment layouts. A structure with layout "aligned" declares its
+members in decreasing order of alignment, without __attribute__((packed)),
+so that every member is naturally aligned with as little padding as
+possible. The wire format keeps the declaration order of the spec.
+
+Sizes and alignments here are nominal LP64 values, which is what the
+ordering and the report are based on. The C compiler still lays out the
+structure itself, and the generated code never assumes it matches.
+"""
+
+# The alignment assumed for members whose alignment cannot be known from
+# their type alone, which puts nested structures first
+MAX_ALIGNMENT = 8
+
+def orderByAlignment(records):
+    """
+    Return the member records in decreasing order of alignment, keeping
+    the declaration order between members of equal alignment
+    """
+    return sorted(records, key=lambda record: -(record.alignment or MAX_ALIGNMENT))
+
+def layoutFields(fields):
+    """
+    Lay out (size, alignment) fields in order as a C compiler would.
+    Returns the (size, alignment, padding) of the resulting structure,
+    where padding counts both interior and tail padding bytes.
+    """
+    offset = 0
+    padding = 0
+    alignment = 1
+    for fieldSize, fieldAlignment in fields:
+        gap = -offset % fieldAlignment
+        padding += gap
+        offset += gap + fieldSize
+        alignment = max(alignment, fieldAlignment)
+    tail = -offset % alignment
+    return offset + tail, alignment, padding + tail
+
+class SerCStructureLayout(object):
+    """
+    The in-memory size of a structure in each possible layout, in bytes.
+    packedSize is its size with __attribute__((packed)), declaredSize and
+    declaredPadding are for its natural layout in spec order, and
+    optimizedSize and optimizedPadding are for its natural layout in
+    decreasing order of alignment.
+    """
+    def __init__(self, structure, packedSize, declared, optimized):
+        super().__init__()
+        self.typeName = structure.typeName
+        self.layout = structure.layout
+        self.packedSize = packedSize
+        self.declaredSize, self.declaredAlignment, self.declaredPadding = declared
+        self.optimizedSize, self.optimizedAlignment, self.optimizedPadding = optimized
+
+    def getSize(self):
+        """The (size, alignment) of this structure in the layout it is generated with"""
+        if self.layout == 'aligned':
+            return self.optimizedSize, self.optimizedAlignment
+        return self.packedSize, 1
+
+    def getBytesSaved(self):
+        """The bytes saved by reordering, compared to a natural layout in spec order"""
+        return self.declaredSize - self.optimizedSize
+
+def computeLayouts(structures):
+    """
+    Compute the SerCStructureLayout of every structure in a dictionary of
+    type name to SerCStructure. Structures that nest a structure missing
+    from the dictionary, or that have a member whose alignment cannot be
+    known, like a third party type, are left out.
+    """
+    layouts = {}
+    for typeName, structure in structures.items():
+        fields = []
+        for record in structure.getRecords():
+            if record.kind == 'struct':
+                nested = layouts.get(record.structTypeName)
+                if nested is None:
+                    break
+                fields.append(nested.getSize())
+            elif record.alignment is None:
+                break
+            else:
+                fields.append((record.alignment, record.alignment))
+        else:
+            packedSize = sum(fieldSize for fieldSize, fieldAlignment in fields)
+            declared = layoutFields(fields)
+            optimized = layoutFields(field for record, field in sorted(zip(structure.getRecords(), fields),
+                                                                      key=lambda pair: -(pair[0].alignment or MAX_ALIGNMENT)))
+            layouts[typeName] = SerCStructureLayout(structure, packedSize, declared, optimized)
+    return layouts
+
+def formatLayoutReport(structures):
+    """
+    Format a table of the size and padding of each structure in each
+    layout. Structures that computeLayouts leaves out are n/a.
+    """
+    lines = ['{0:32} {1:>8} {2:>8} {3:>14} {4:>14} {5:>6}'.format(
+        'structure', 'layout', 'packed', 'spec order', 'reordered', 'saved')]
+    totalSaved = 0
+    layouts = computeLayouts(structures)
+    for typeName, structure in structures.items():
+        layout = layouts.get(typeName)
+        if layout is None:
+            lines.append('{0:32} {1:>8} {2:>8} {3:>14} {4:>14} {5:>6}'.format(typeName, structure.layout, 'n/a', 'n/a', 'n/a', 'n/a'))
+            continue
+        lines.append('{0:32} {1:>8} {2:>8} {3:>14} {4:>14} {5:>6}'.format(
+            layout.typeName, layout.layout, layout.packedSize,
+            '{0} ({1} pad)'.format(layout.declaredSize, layout.declaredPadding),
+            '{0} ({1} pad)'.format(layout.optimizedSize, layout.optimizedPadding),
+            layout.getBytesSaved()))
+        totalSaved += layout.getBytesSaved()
+    lines.append('')
+    lines.append('Reordering saves {0} bytes over all structures, compared to natural layouts in spec order'.format(totalSaved))
+    return '\n'.join(lines)
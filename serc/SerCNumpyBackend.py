@@ -0,0 +1,116 @@
+import os
+from serc.SerCExceptions import SerCError, SerCParseError
+
+# numpy is optional, it is only needed to use this backend
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# numpy type codes for each Python struct format character
+_NUMPY_FORMATS = {
+    'b': 'i1', 'B': 'u1',
+    'h': 'i2', 'H': 'u2',
+    'i': 'i4', 'I': 'u4',
+    'q': 'i8', 'Q': 'u8',
+    'f': 'f4', 'd': 'f8',
+}
+
+def _requireNumpy():
+    if np is None:
+        raise SerCError('The numpy backend requires numpy to be installed')
+
+class SerCNumpyBackend(object):
+    """
+    Derives a packed (align=False) numpy structured dtype for every fixed
+    size SerCStructure, matching the __attribute__((packed)) layout of the
+    generated C structs. Nested struct members become sub-dtypes. Structures
+    with vector or compact members have no fixed layout and get no dtype.
+    """
+    def __init__(self, structures, byteOrder=None):
+        """
+        byteOrder is a numpy byte order character that overrides the
+        byte_order of every structure
+        """
+        super().__init__()
+        _requireNumpy()
+        self._structures = structures
+        self._byteOrder = byteOrder
+        self._dtypes = {}
+
+    def getDtypes(self):
+        """Return a dictionary of type name to dtype for every fixed size structure"""
+        dtypes = {}
+        for typeName in self._structures:
+            dtype = self.getDtype(typeName, required=False)
+            if dtype is not None:
+                dtypes[typeName] = dtype
+        return dtypes
+
+    def getDtype(self, typeName, required=True, _visiting=None):
+        """
+        Return the dtype for the structure typeName. If the structure is
+        not fixed size this raises a SerCParseError, or returns None if
+        required is False.
+        """
+        if typeName in self._dtypes:
+            return self._dtypes[typeName]
+        if typeName not in self._structures:
+            raise SerCParseError('Unknown structure: ' + typeName)
+
+        visiting = _visiting if _visiting is not None else set()
+        if typeName in visiting:
+            raise SerCParseError('Structure "{0}" contains itself'.format(typeName))
+        visiting.add(typeName)
+
+        structure = self._structures[typeName]
+        byteOrder = self._byteOrder if self._byteOrder is not None else structure.getStructByteOrder()
+        fields = []
+        for record in structure.getRecords():
+            if record.kind == 'scalar' and record.encoding == 'fixed':
+                fields.append((record.name, byteOrder + _NUMPY_FORMATS[record.structFormat]))
+            elif record.kind == 'struct':
+                subDtype = self.getDtype(record.structTypeName, required, visiting)
+                if subDtype is None:
+                    return None
+                fields.append((record.name, subDtype))
+            elif required:
+                raise SerCParseError('Structure "{0}" is not fixed size, member "{1}" has no fixed layout'.format(typeName, record.name))
+            else:
+                return None
+
+        visiting.discard(typeName)
+        dtype = np.dtype(fields, align=False)
+        self._dtypes[typeName] = dtype
+        return dtype
+
+def _checkItemsize(dtype):
+    """Records with no members take no bytes, so there is no telling how many a buffer holds"""
+    if dtype.itemsize == 0:
+        raise SerCError('Cannot read records of a dtype with no size: {0}'.format(dtype))
+
+def fromBuffer(buffer, dtype, count=-1, offset=0):
+    """
+    View a buffer of packed records as a structured array without copying.
+    Trailing bytes that do not make up a whole record are ignored.
+    """
+    _requireNumpy()
+    _checkItemsize(dtype)
+    if count < 0:
+        count = (len(memoryview(buffer).cast('B')) - offset) // dtype.itemsize
+    return np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+
+def readCaptureFile(path, dtype, offset=0, mode='r'):
+    """
+    Memory map a capture file of back to back packed records as a
+    structured array. Nothing is read until it is accessed, so column wise
+    operations over files larger than memory are still vectorized. Trailing
+    bytes that do not make up a whole record are ignored, and a file without
+    a whole record is an empty array, since empty files cannot be mapped.
+    """
+    _requireNumpy()
+    _checkItemsize(dtype)
+    count = max(os.path.getsize(path) - offset, 0) // dtype.itemsize
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=(count,))
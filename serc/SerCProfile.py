@@ -0,0 +1,67 @@
+class SerCHooks(object):
+    """
+    The instrumentation interface of the generator. Pass an instance to
+    JsonToCSerializer to be called back as it runs. Every callback does
+    nothing by default, so subclasses only override what they need. When no
+    hooks are given the generator does not time anything at all.
+    """
+    def onPhase(self, name, wallTime):
+        """A phase like json.load, parse or emit.declaration took wallTime seconds"""
+        pass
+
+    def onMember(self, typeClass, wallTime):
+        """A member of SerC type typeClass was parsed in wallTime seconds"""
+        pass
+
+    def onStructure(self, structure):
+        """A structure finished parsing"""
+        pass
+
+    def onEmit(self, characterCount):
+        """characterCount characters of generated code were written to the sink"""
+        pass
+
+class SerCProfiler(SerCHooks):
+    """
+    Hooks that total up the wall time and call count of every phase and
+    SerC type, along with the number of structures, members and characters
+    emitted, and format them into a report.
+    """
+    def __init__(self):
+        super().__init__()
+        self.phases = {}
+        self.types = {}
+        self.structureCount = 0
+        self.memberCount = 0
+        self.charactersEmitted = 0
+
+    def onPhase(self, name, wallTime):
+        totals = self.phases.setdefault(name, [0.0, 0])
+        totals[0] += wallTime
+        totals[1] += 1
+
+    def onMember(self, typeClass, wallTime):
+        totals = self.types.setdefault(typeClass.__name__, [0.0, 0])
+        totals[0] += wallTime
+        totals[1] += 1
+
+    def onStructure(self, structure):
+        self.structureCount += 1
+        self.memberCount += len(structure.getMembers())
+
+    def onEmit(self, characterCount):
+        self.charactersEmitted += characterCount
+
+    def _formatTable(self, title, totals):
+        lines = ['{0:32} {1:>12} {2:>10}'.format(title, 'wall time', 'calls')]
+        for name, (wallTime, calls) in sorted(totals.items(), key=lambda item: -item[1][0]):
+            lines.append('{0:32} {1:11.6f}s {2:10}'.format(name, wallTime, calls))
+        return lines
+
+    def formatReport(self):
+        lines = self._formatTable('phase', self.phases)
+        lines.append('')
+        lines.extend(self._formatTable('member type (parse)', self.types))
+        lines.append('')
+        lines.append('{0} structures, {1} members, {2} characters emitted'.format(self.structureCount, self.memberCount, self.charactersEmitted))
+        return '\n'.join(lines)
@@ -0,0 +1,599 @@
+import re
+import struct
+import keyword
+from serc.SerCExceptions import SerCParseError
+from serc.SerCEmitter import SerCEmitter
+
+_MODULE_HEADER = '''# Generated by serc. Do not edit.
+import struct
+import functools
+from collections import namedtuple
+
+@functools.lru_cache(maxsize=256)
+def _vector_struct(fmt, count):
+    """A precompiled struct.Struct for count elements of fmt"""
+    return struct.Struct('{0}{1}{2}'.format(fmt[0], count, fmt[1:]))
+'''
+
+# Varint helpers matching the C serc_varint support code, only emitted for
+# modules with compact members
+_VARINT_HELPERS = '''
+_MASK64 = (1 << 64) - 1
+
+def _read_varint(buffer, offset):
+    """Decode a LEB128 varint at offset, returning (value, end offset)"""
+    byte = buffer[offset]
+    if byte < 0x80:
+        return byte, offset + 1
+    result = byte & 0x7f
+    shift = 7
+    while True:
+        offset += 1
+        byte = buffer[offset]
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result & _MASK64, offset + 1
+        shift += 7
+        if shift >= 70:
+            raise ValueError('varint is longer than 10 bytes')
+
+def _write_varint(buffer, offset, value):
+    if value < 0x80:
+        buffer[offset] = value
+        return offset + 1
+    while value >= 0x80:
+        buffer[offset] = (value & 0x7f) | 0x80
+        value >>= 7
+        offset += 1
+    buffer[offset] = value
+    return offset + 1
+
+def _varint_size(value):
+    return (value.bit_length() + 6) // 7 or 1
+
+def _zigzag(value):
+    return ((value << 1) ^ (value >> 63)) & _MASK64
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+def _to_int(payload, bits, signed):
+    """The integer of bits a varint payload holds, raising ValueError if it does not fit"""
+    if signed:
+        value = _unzigzag(payload)
+        if not -(1 << (bits - 1)) <= value < (1 << (bits - 1)):
+            raise ValueError('varint does not fit in {0} bits'.format(bits))
+        return value
+    if payload >> bits:
+        raise ValueError('varint does not fit in {0} bits'.format(bits))
+    return payload
+
+def _read_int(buffer, offset, bits, signed):
+    payload, offset = _read_varint(buffer, offset)
+    return _to_int(payload, bits, signed), offset
+
+def _read_ints(buffer, offset, count, bits, signed):
+    values = []
+    for _ in range(count):
+        payload, offset = _read_varint(buffer, offset)
+        values.append(_to_int(payload, bits, signed))
+    return tuple(values), offset
+
+def _write_ints(buffer, offset, values, signed):
+    for value in values:
+        offset = _write_varint(buffer, offset, _zigzag(value) if signed else value)
+    return offset
+
+def _ints_size(values, signed):
+    return sum(_varint_size(_zigzag(value) if signed else value) for value in values)
+
+def _delta_payloads(values):
+    """The zigzagged differences between successive values, wrapping at 64 bits like the C encoder"""
+    previous = 0
+    for value in values:
+        delta = (value - previous) & _MASK64
+        yield _zigzag(delta - (1 << 64) if delta >> 63 else delta)
+        previous = value
+
+def _read_deltas(buffer, offset, count, bits, signed):
+    values = []
+    previous = 0
+    mask = (1 << bits) - 1
+    for _ in range(count):
+        payload, offset = _read_varint(buffer, offset)
+        previous = (previous + _unzigzag(payload)) & _MASK64
+        value = previous & mask
+        if signed and value >> (bits - 1):
+            value -= 1 << bits
+        values.append(value)
+    return tuple(values), offset
+
+def _write_deltas(buffer, offset, values):
+    for payload in _delta_payloads(values):
+        offset = _write_varint(buffer, offset, payload)
+    return offset
+
+def _deltas_size(values):
+    return sum(_varint_size(payload) for payload in _delta_payloads(values))
+'''
+
+# Frame envelopes matching the C serc_frame support code, only emitted for
+# modules with structures that have an envelope
+_FRAME_HELPERS = '''
+import zlib
+
+FRAME_MAGIC = 0xc5
+FRAME_CRC16 = 0x16
+FRAME_CRC32 = 0x32
+FRAME_HEADER = struct.Struct('<BBHI')
+
+def _crc16_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x8408 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+_CRC16_TABLE = _crc16_table()
+
+def crc16(data):
+    """The CRC-16/X-25 of data"""
+    crc = 0xffff
+    table = _CRC16_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xff]
+    return crc ^ 0xffff
+
+# zlib.crc32 is CRC-32/ISO-HDLC, the same CRC as the C code
+_FRAME_CRCS = {FRAME_CRC16: (crc16, struct.Struct('<H')), FRAME_CRC32: (zlib.crc32, struct.Struct('<I'))}
+
+def pack_frame(crc_kind, type_id, payload):
+    """Wrap a serialized payload in a frame with a FRAME_CRC16 or FRAME_CRC32 CRC"""
+    crc_function, crc_struct = _FRAME_CRCS[crc_kind]
+    frame = bytearray(FRAME_HEADER.pack(FRAME_MAGIC, crc_kind, type_id, len(payload)))
+    frame += payload
+    frame += crc_struct.pack(crc_function(frame))
+    return bytes(frame)
+
+def check_frame(buffer, offset=0, max_payload=None):
+    """
+    Check for a frame at offset. Returns (size, type_id, payload) for a
+    complete valid frame, (0, None, None) if more bytes are needed, or
+    (-1, None, None) if it is not a frame.
+    """
+    available = len(buffer) - offset
+    if available < 2:
+        return (0 if available == 0 or buffer[offset] == FRAME_MAGIC else -1), None, None
+    crc = _FRAME_CRCS.get(buffer[offset + 1])
+    if buffer[offset] != FRAME_MAGIC or crc is None:
+        return -1, None, None
+    if available < FRAME_HEADER.size:
+        return 0, None, None
+    _, _, type_id, length = FRAME_HEADER.unpack_from(buffer, offset)
+    if max_payload is not None and length > max_payload:
+        return -1, None, None
+    crc_function, crc_struct = crc
+    end = offset + FRAME_HEADER.size + length
+    if len(buffer) < end + crc_struct.size:
+        return 0, None, None
+    if crc_function(bytes(buffer[offset:end])) != crc_struct.unpack_from(buffer, end)[0]:
+        return -1, None, None
+    return end + crc_struct.size - offset, type_id, bytes(buffer[offset + FRAME_HEADER.size:end])
+
+class FrameDecoder(object):
+    """
+    Splits a byte stream into frames like serc_frame_decoder. Bytes that
+    are not part of a valid frame are skipped, and counted in skipped,
+    until the next valid frame. Payloads over max_payload bytes are
+    treated as corrupt, so a corrupt length is not waited on.
+    """
+    def __init__(self, max_payload=1 << 20):
+        self.max_payload = max_payload
+        self.skipped = 0
+        self._buffer = bytearray()
+        self._start = 0
+
+    def feed(self, data):
+        """Add bytes of the stream"""
+        if self._start:
+            del self._buffer[:self._start]
+            self._start = 0
+        self._buffer += data
+
+    def __iter__(self):
+        """Yield the (type_id, payload) of each valid frame fed so far"""
+        buffer = self._buffer
+        while True:
+            magic = buffer.find(FRAME_MAGIC, self._start)
+            if magic < 0:
+                self.skipped += len(buffer) - self._start
+                self._start = len(buffer)
+                return
+            self.skipped += magic - self._start
+            self._start = magic
+            size, type_id, payload = check_frame(buffer, magic, self.max_payload)
+            if size == 0:
+                return
+            if size < 0:
+                self._start += 1
+                self.skipped += 1
+                continue
+            self._start += size
+            yield type_id, payload
+
+    def records(self):
+        """Yield each valid frame of a type in FRAME_TYPES, decoded"""
+        for type_id, payload in self:
+            cls = FRAME_TYPES.get(type_id)
+            if cls is not None:
+                yield cls.unpack_from(payload)
+'''
+
+_THIS_MEMBER = re.compile(r'this->(\w+)')
+
+def _intArguments(record):
+    """The bit width and signedness arguments of the varint helpers for an integer or integer vector record"""
+    structFormat = record.structFormat if record.kind == 'scalar' else record.element.structFormat
+    return struct.calcsize('<' + structFormat) * 8, structFormat.islower()
+
+# Names that members cannot have in Python as they are, besides keywords:
+# the arguments and locals of the generated codec methods, and the
+# attributes of the generated classes, which a field would shadow
+_RESERVED_NAMES = frozenset([
+    'buffer', 'offset', 'cls', 'self',
+    'decode_from', 'unpack_from', 'encode_into', 'pack', 'encoded_size', 'iter_unpack',
+    'pack_frame', 'unpack_frame', 'STRUCT', 'SIZE', 'TYPE_ID', 'FRAME_CRC', 'count', 'index',
+])
+
+def _pythonName(name):
+    """
+    The Python name of a member. Members named after Python keywords, like
+    in or class, or after the codec's own names get a trailing _.
+    """
+    if keyword.iskeyword(name) or name in _RESERVED_NAMES:
+        return name + '_'
+    return name
+
+def _formatLength(listLength, prefix):
+    """
+    Translate a C list_length expression like "this->rxCount" into Python,
+    reading members from prefix (a local variable, or "self.")
+    """
+    return _THIS_MEMBER.sub(lambda match: prefix + _pythonName(match.group(1)), str(listLength))
+
+class SerCPythonBackend(object):
+    """
+    Generates a Python module with an encode/decode class for each parsed
+    SerCStructure. Every run of fixed width members is decoded by one
+    precompiled struct.Struct, so records are unpacked without any per
+    field dispatch. Each class is a namedtuple (and so has empty
+    __slots__) with:
+
+        decode_from(buffer, offset=0) -> (record, end offset)
+        unpack_from(buffer, offset=0) -> record
+        encode_into(self, buffer, offset=0) -> end offset
+        pack(self) -> bytes
+        encoded_size(self) -> int
+
+    Members named after Python keywords or any of these names get a
+    trailing _, so a member "in" is the field "in_".
+
+    Fixed size structures also have a SIZE and an iter_unpack(buffer)
+    classmethod for bulk decoding. When the structures nested in them have
+    the same byte order, their members are decoded in line by a single
+    struct.Struct, which is the STRUCT class attribute.
+    """
+    def __init__(self, structures, byteOrder=None):
+        """
+        byteOrder is a struct module byte order character that overrides
+        the byte_order of every structure
+        """
+        super().__init__()
+        self._structures = structures
+        self._byteOrder = byteOrder
+
+    def _getByteOrder(self, structure):
+        if self._byteOrder is not None:
+            return self._byteOrder
+        return structure.getStructByteOrder()
+
+    def emit(self, sink):
+        """Write the generated Python module to sink. Returns the characters written."""
+        out = SerCEmitter(sink)
+        out.line(_MODULE_HEADER)
+        if any(structure.isCompact() for structure in self._structures.values()):
+            out.line(_VARINT_HELPERS)
+        framed = [structure for structure in self._structures.values() if structure.envelope != 'none']
+        if framed:
+            out.line(_FRAME_HELPERS)
+        for structure in self._structures.values():
+            self.formatCodec(structure, out)
+        if framed:
+            out.line('# The class of each type ID, for FrameDecoder.records')
+            out.line('FRAME_TYPES = {{{0}}}'.format(', '.join('{0}.TYPE_ID: {0}'.format(structure.typeName) for structure in framed)))
+        out.flush()
+        return out.charsEmitted
+
+    def compile(self):
+        """Generate the module and load it, returning its namespace as a dictionary"""
+        out = SerCEmitter()
+        self.emit(out)
+        namespace = {'__name__': 'serc_generated_codecs'}
+        exec(compile(out.getvalue(), '<serc generated codecs>', 'exec'), namespace)
+        return namespace
+
+    def _segments(self, structure, byteOrder):
+        """
+        Split the compiled members of a structure into segments. Each run of
+        adjacent scalar members becomes one ('fixed', [records], format)
+        segment. Vectors, nested structures and members with a compact
+        encoding get a segment each.
+        """
+        segments = []
+        for record in structure.getRecords():
+            if record.encoding != 'fixed':
+                segments.append(('compact', [record], None))
+            elif record.kind == 'scalar':
+                if segments and segments[-1][0] == 'fixed':
+                    segments[-1][1].append(record)
+                    segments[-1][2].append(record.structFormat)
+                else:
+                    segments.append(('fixed', [record], [record.structFormat]))
+            elif record.kind in ('vector', 'struct'):
+                segments.append((record.kind, [record], None))
+            else:
+                raise SerCParseError('The Python backend does not support the type of member "{0}" in "{1}"'.format(record.name, structure.typeName))
+        return [(kind, members, byteOrder + ''.join(formats) if formats else None) for kind, members, formats in segments]
+
+    def formatCodec(self, structure, out):
+        """Write the encode/decode class for a single structure"""
+        byteOrder = self._getByteOrder(structure)
+        segments = self._segments(structure, byteOrder)
+        names = [_pythonName(record.name) for record in structure.getRecords()]
+        for record in structure.getRecords():
+            if record.name.startswith('_'):
+                raise SerCParseError('The Python backend cannot name member "{0}" of "{1}", namedtuple fields cannot start with _'.format(record.name, structure.typeName))
+        if len(set(names)) != len(names):
+            duplicate = next(name for name in names if names.count(name) > 1)
+            raise SerCParseError('Two members of "{0}" are both named "{1}" in Python, where keywords get a trailing _'.format(structure.typeName, duplicate))
+        out.line('class {0}(namedtuple({0!r}, {1!r})):'.format(structure.typeName, names))
+        out.line('    __slots__ = ()')
+
+        structFormat = self._flatFormat(structure, byteOrder)
+        if structFormat is not None:
+            self._formatFixedCodec(structure, byteOrder + structFormat, out)
+        else:
+            self._formatVariableCodec(segments, byteOrder, out)
+            if structure.isFixedSize():
+                self._formatFixedSize(structure, out)
+
+        out.line()
+        out.line('    @classmethod')
+        out.line('    def unpack_from(cls, buffer, offset=0):')
+        out.line('        return cls.decode_from(buffer, offset)[0]')
+        out.line()
+        out.line('    def pack(self):')
+        out.line('        buffer = bytearray(self.encoded_size())')
+        out.line('        self.encode_into(buffer)')
+        out.line('        return bytes(buffer)')
+        if structure.envelope != 'none':
+            self._formatFrameCodec(structure, out)
+        out.line()
+        out.line()
+
+    def _formatFrameCodec(self, structure, out):
+        """Write the frame envelope methods of a structure with an envelope"""
+        out.line()
+        out.line('    TYPE_ID = 0x{0:04x}'.format(structure.typeId))
+        out.line('    FRAME_CRC = FRAME_{0}'.format(structure.envelope.upper()))
+        out.line()
+        out.line('    def pack_frame(self):')
+        out.line('        return pack_frame(self.FRAME_CRC, self.TYPE_ID, self.pack())')
+        out.line()
+        out.line('    @classmethod')
+        out.line('    def unpack_frame(cls, buffer, offset=0):')
+        out.line('        size, type_id, payload = check_frame(buffer, offset)')
+        out.line('        if size <= 0 or type_id != cls.TYPE_ID or buffer[offset + 1] != cls.FRAME_CRC:')
+        out.line('            raise ValueError({0!r})'.format('Not a valid {0} frame'.format(structure.typeName)))
+        out.line('        record, end = cls.decode_from(payload)')
+        out.line('        if end != len(payload):')
+        out.line('            raise ValueError({0!r})'.format('The {0} frame has trailing bytes'.format(structure.typeName)))
+        out.line('        return record')
+
+    def _flatFormat(self, structure, byteOrder):
+        """
+        The struct format, without a byte order, of every member of a
+        structure with the members of its nested structures in line. None
+        if it has a member that is not a fixed width value, or a nested
+        structure in a byte order other than byteOrder. A byteOrder of None
+        matches every byte order, for the size.
+        """
+        formats = []
+        for record in structure.getRecords():
+            if record.encoding != 'fixed':
+                return None
+            if record.kind == 'scalar':
+                formats.append(record.structFormat)
+            elif record.kind == 'struct' and record.structTypeName in self._structures:
+                nested = self._structures[record.structTypeName]
+                if byteOrder is not None and self._getByteOrder(nested) != byteOrder:
+                    return None
+                nestedFormat = self._flatFormat(nested, byteOrder)
+                if nestedFormat is None:
+                    return None
+                formats.append(nestedFormat)
+            else:
+                return None
+        return ''.join(formats)
+
+    def _formatFlatValues(self, structure, start=0):
+        """
+        The Python expressions that build each member of a structure out of
+        the flat tuple _values from _values[start], and the index after them
+        """
+        values = []
+        for record in structure.getRecords():
+            if record.kind == 'struct':
+                nestedValues, start = self._formatFlatValues(self._structures[record.structTypeName], start)
+                values.append('{0}({1})'.format(record.structTypeName, ', '.join(nestedValues)))
+            else:
+                values.append('_values[{0}]'.format(start))
+                start += 1
+        return values, start
+
+    def _formatFlatFields(self, structure, prefix):
+        """The Python expressions of every value of a structure in prefix, in struct format order"""
+        fields = []
+        for record in structure.getRecords():
+            if record.kind == 'struct':
+                fields.extend(self._formatFlatFields(self._structures[record.structTypeName], '{0}{1}.'.format(prefix, _pythonName(record.name))))
+            else:
+                fields.append(prefix + _pythonName(record.name))
+        return fields
+
+    def _formatFixedCodec(self, structure, structFormat, out):
+        size = struct.calcsize(structFormat)
+        nested = any(record.kind == 'struct' for record in structure.getRecords())
+        out.line('    STRUCT = struct.Struct({0!r})'.format(structFormat))
+        out.line('    SIZE = {0}'.format(size))
+        out.line()
+        out.line('    @classmethod')
+        out.line('    def decode_from(cls, buffer, offset=0):')
+        if nested:
+            # The nested structures are rebuilt from the one flat tuple
+            values = ', '.join(self._formatFlatValues(structure)[0])
+            out.line('        _values = cls.STRUCT.unpack_from(buffer, offset)')
+            out.line('        return cls({0}), offset + {1}'.format(values, size))
+        else:
+            out.line('        return cls._make(cls.STRUCT.unpack_from(buffer, offset)), offset + {0}'.format(size))
+        out.line()
+        out.line('    @classmethod')
+        out.line('    def iter_unpack(cls, buffer):')
+        if nested:
+            out.line('        return (cls({0}) for _values in cls.STRUCT.iter_unpack(buffer))'.format(values))
+        else:
+            out.line('        return map(cls._make, cls.STRUCT.iter_unpack(buffer))')
+        out.line()
+        out.line('    def encode_into(self, buffer, offset=0):')
+        if nested:
+            out.line('        self.STRUCT.pack_into(buffer, offset, {0})'.format(', '.join(self._formatFlatFields(structure, 'self.'))))
+        else:
+            out.line('        self.STRUCT.pack_into(buffer, offset, *self)')
+        out.line('        return offset + {0}'.format(size))
+        out.line()
+        out.line('    def encoded_size(self):')
+        out.line('        return {0}'.format(size))
+
+    def _formatFixedSize(self, structure, out):
+        """
+        SIZE and iter_unpack for a fixed size structure that nests one in
+        another byte order, so it cannot be decoded by a single STRUCT
+        """
+        size = struct.calcsize('<' + self._flatFormat(structure, None))
+        out.line()
+        out.line('    SIZE = {0}'.format(size))
+        out.line()
+        out.line('    @classmethod')
+        out.line('    def iter_unpack(cls, buffer):')
+        out.line('        if len(buffer) % {0}:'.format(size))
+        out.line('            raise struct.error({0!r})'.format('iter_unpack requires a buffer of a multiple of {0} bytes'.format(size)))
+        out.line('        return (cls.unpack_from(buffer, offset) for offset in range(0, len(buffer), {0}))'.format(size))
+
+    def _formatVariableCodec(self, segments, byteOrder, out):
+        for index, (kind, members, structFormat) in enumerate(segments):
+            if kind == 'fixed':
+                out.line('    _S{0} = struct.Struct({1!r})'.format(index, structFormat))
+        out.line()
+
+        # Decoder
+        out.line('    @classmethod')
+        out.line('    def decode_from(cls, buffer, offset=0):')
+        for index, (kind, members, structFormat) in enumerate(segments):
+            member = members[0]
+            if kind == 'fixed':
+                targets = ', '.join(_pythonName(m.name) for m in members) + (',' if len(members) == 1 else '')
+                out.line('        {0} = cls._S{1}.unpack_from(buffer, offset)'.format(targets, index))
+                out.line('        offset += {0}'.format(struct.calcsize(structFormat)))
+            elif kind == 'struct':
+                out.line('        {0}, offset = {1}.decode_from(buffer, offset)'.format(_pythonName(member.name), member.structTypeName))
+            elif kind == 'compact':
+                bits, signed = _intArguments(member)
+                if member.kind == 'scalar':
+                    out.line('        {0}, offset = _read_int(buffer, offset, {1}, {2})'.format(_pythonName(member.name), bits, signed))
+                elif member.encoding == 'delta':
+                    out.line('        {0}, offset = _read_deltas(buffer, offset, {1}, {2}, {3})'.format(_pythonName(member.name), _formatLength(member.listLength, ''), bits, signed))
+                else:
+                    out.line('        {0}, offset = _read_ints(buffer, offset, {1}, {2}, {3})'.format(_pythonName(member.name), _formatLength(member.listLength, ''), bits, signed))
+            else:
+                length = _formatLength(member.listLength, '')
+                elementType = member.element
+                if elementType.structFormat is not None:
+                    out.line('        _vector = _vector_struct({0!r}, {1})'.format(byteOrder + elementType.structFormat, length))
+                    out.line('        {0} = _vector.unpack_from(buffer, offset)'.format(_pythonName(member.name)))
+                    out.line('        offset += _vector.size')
+                elif elementType.kind == 'struct':
+                    out.line('        {0} = []'.format(_pythonName(member.name)))
+                    out.line('        for _ in range({0}):'.format(length))
+                    out.line('            _item, offset = {0}.decode_from(buffer, offset)'.format(elementType.structTypeName))
+                    out.line('            {0}.append(_item)'.format(_pythonName(member.name)))
+                    out.line('        {0} = tuple({0})'.format(_pythonName(member.name)))
+                else:
+                    raise SerCParseError('The Python backend does not support vectors of vectors ("{0}")'.format(member.name))
+        out.line('        return cls({0}), offset'.format(', '.join(_pythonName(m.name) for kind, members, f in segments for m in members)))
+        out.line()
+
+        # Encoder
+        out.line('    def encode_into(self, buffer, offset=0):')
+        for index, (kind, members, structFormat) in enumerate(segments):
+            member = members[0]
+            if kind == 'fixed':
+                out.line('        self._S{0}.pack_into(buffer, offset, {1})'.format(index, ', '.join('self.' + _pythonName(m.name) for m in members)))
+                out.line('        offset += {0}'.format(struct.calcsize(structFormat)))
+            elif kind == 'struct':
+                out.line('        offset = self.{0}.encode_into(buffer, offset)'.format(_pythonName(member.name)))
+            elif kind == 'compact':
+                bits, signed = _intArguments(member)
+                if member.kind == 'scalar':
+                    value = '_zigzag(self.{0})'.format(_pythonName(member.name)) if signed else 'self.' + _pythonName(member.name)
+                    out.line('        offset = _write_varint(buffer, offset, {0})'.format(value))
+                elif member.encoding == 'delta':
+                    out.line('        offset = _write_deltas(buffer, offset, self.{0})'.format(_pythonName(member.name)))
+                else:
+                    out.line('        offset = _write_ints(buffer, offset, self.{0}, {1})'.format(_pythonName(member.name), signed))
+            else:
+                elementType = member.element
+                if elementType.structFormat is not None:
+                    out.line('        _vector = _vector_struct({0!r}, len(self.{1}))'.format(byteOrder + elementType.structFormat, _pythonName(member.name)))
+                    out.line('        _vector.pack_into(buffer, offset, *self.{0})'.format(_pythonName(member.name)))
+                    out.line('        offset += _vector.size')
+                else:
+                    out.line('        for _item in self.{0}:'.format(_pythonName(member.name)))
+                    out.line('            offset = _item.encode_into(buffer, offset)')
+        out.line('        return offset')
+        out.line()
+
+        # Size
+        terms = []
+        for kind, members, structFormat in segments:
+            member = members[0]
+            if kind == 'fixed':
+                terms.append(str(struct.calcsize(structFormat)))
+            elif kind == 'struct':
+                terms.append('self.{0}.encoded_size()'.format(_pythonName(member.name)))
+            elif kind == 'compact':
+                bits, signed = _intArguments(member)
+                if member.kind == 'scalar':
+                    value = '_zigzag(self.{0})'.format(_pythonName(member.name)) if signed else 'self.' + _pythonName(member.name)
+                    terms.append('_varint_size({0})'.format(value))
+                elif member.encoding == 'delta':
+                    terms.append('_deltas_size(self.{0})'.format(_pythonName(member.name)))
+                else:
+                    terms.append('_ints_size(self.{0}, {1})'.format(_pythonName(member.name), signed))
+            elif member.element.structFormat is not None:
+                terms.append('{0} * len(self.{1})'.format(struct.calcsize(byteOrder + member.element.structFormat), _pythonName(member.name)))
+            else:
+                terms.append('sum(_item.encoded_size() for _item in self.{0})'.format(_pythonName(member.name)))
+        out.line('    def encoded_size(self):')
+        out.line('        return {0}'.format(' + '.join(terms)))
@@ -0,0 +1,106 @@
+"""
+Split output, with one <type>.h and <type>.c pair per structure so that
+each structure is its own translation unit. The header holds everything
+that can be included from several translation units: the declaration, the
+size macros, the static inline helpers and views, and a prototype for
+every function. The source holds the function definitions. Files are only
+rewritten when their content changes, so their mtimes stay stable for make
+and ccache.
+"""
+import os
+import re
+from serc.SerCSupport import formatSupport
+
+# The sections that define non-inline functions, which go in the source file
+SOURCE_SECTIONS = ['allocate', 'constructor', 'new', 'serializer', 'batch']
+
+# The opening line of a function definition in the generated code
+_FUNCTION_DEFINITION = re.compile(r'^(?!static )(\w[^\n]*\))\s*\{$', re.MULTILINE)
+
+def formatPrototypes(text):
+    """Return a prototype for every non-static function defined in text"""
+    return ''.join(match.group(1) + ';\n' for match in _FUNCTION_DEFINITION.finditer(text))
+
+def formatGuard(typeName):
+    """The include guard macro of a structure's header"""
+    return 'SERC_{0}_H'.format(re.sub(r'\W', '_', typeName).upper())
+
+def formatHeader(structure, sections, dependencies):
+    """
+    Format the header of a structure from its rendered sections.
+    dependencies are the (type name, nested) pairs of the structures it
+    refers to. Nested structures are included first, since the
+    declaration needs them. Vector element structures are only included
+    after the declaration, so that vectors of each other work in either
+    include order.
+    """
+    guard = formatGuard(structure.typeName)
+    lines = ['#ifndef {0}'.format(guard), '#define {0}'.format(guard), '']
+    lines.extend('#include <{0}>'.format(header) for header in sorted(structure.getRequiredHeaders()))
+    nestedNames = [typeName for typeName, nested in dependencies if nested]
+    lines.extend('#include "{0}.h"'.format(typeName) for typeName in sorted(set(nestedNames), key=nestedNames.index))
+    lines.append('')
+    header = '\n'.join(lines) + '\n'
+
+    header += formatSupport(structure.getRequiredSupport())
+    header += sections['prototype'] + '\n'
+    header += sections['declaration']
+
+    # The size helpers and views need the complete element types
+    elementNames = set(typeName for typeName, nested in dependencies if not nested)
+    elementNames.difference_update(nestedNames + [structure.typeName])
+    if elementNames:
+        header += ''.join('#include "{0}.h"\n'.format(typeName) for typeName in sorted(elementNames)) + '\n'
+
+    header += sections['size']
+    header += formatPrototypes(''.join(sections[sectionName] for sectionName in SOURCE_SECTIONS)) + '\n'
+    header += sections['view']
+    header += '#endif\n'
+    return header
+
+def formatSource(structure, sections):
+    """Format the source file of a structure from its rendered sections"""
+    source = '#include "{0}.h"\n\n'.format(structure.typeName)
+    source += ''.join(sections[sectionName] for sectionName in SOURCE_SECTIONS)
+    return source
+
+def writeIfChanged(path, text):
+    """
+    Write text to path unless the file already holds exactly that text.
+    Returns True if the file was written.
+    """
+    try:
+        with open(path, 'r') as existingFile:
+            if existingFile.read() == text:
+                return False
+    except OSError:
+        pass
+    tmpPath = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(tmpPath, 'w') as outFile:
+        outFile.write(text)
+    os.replace(tmpPath, path)
+    return True
+
+def writeSplit(serializer, outputDir):
+    """
+    Write a .h and .c pair for every structure parsed by a
+    JsonToCSerializer into outputDir. Returns the list of paths that were
+    written and the list of paths that were already up to date.
+    """
+    os.makedirs(outputDir, exist_ok=True)
+    graph = serializer.getGraph()
+    written = []
+    unchanged = []
+    for structure in serializer.getStructures().values():
+        sections = serializer.renderStructure(structure)
+        files = [
+            ('.h', formatHeader(structure, sections, graph.getDependencies(structure.typeName))),
+            ('.c', formatSource(structure, sections)),
+        ]
+        for extension, text in files:
+            path = os.path.join(outputDir, structure.typeName + extension)
+            if writeIfChanged(path, text):
+                written.append(path)
+            else:
+                unchanged.append(path)
+    return written, unchanged
@@ -0,0 +1,126 @@
+"""
+An incremental reader for spec files. It yields the entries of the top
+level struct_list one at a time, reading the file in chunks, so that only
+the entry being decoded has to be held in memory.
+"""
+import json
+from serc.SerCExceptions import SerCParseError
+
+_WHITESPACE = ' \t\n\r'
+
+# The longest JSON token that can be cut off by the end of the buffer while
+# still being reported at its start, a \uXXXX escape. Strings can be any
+# length, and are recognized by their error message instead.
+_LONGEST_TOKEN = 6
+
+class _Reader(object):
+    """A buffer over a file that is refilled as values are decoded out of it"""
+    def __init__(self, fd, chunkSize):
+        super().__init__()
+        self._fd = fd
+        self._chunkSize = chunkSize
+        self._buffer = ''
+        self._position = 0
+        # How many characters of the file were dropped from the buffer
+        self._dropped = 0
+        self._eof = False
+
+    def _fill(self, minimum):
+        """Read until at least minimum characters are buffered past the position, or EOF"""
+        if self._position:
+            self._dropped += self._position
+            self._buffer = self._buffer[self._position:]
+            self._position = 0
+        while not self._eof and len(self._buffer) < minimum:
+            chunk = self._fd.read(max(self._chunkSize, minimum - len(self._buffer)))
+            if not chunk:
+                self._eof = True
+            self._buffer += chunk
+
+    def peek(self):
+        """Skip whitespace and return the next character, or '' at EOF"""
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in _WHITESPACE:
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if self._eof:
+                return ''
+            self._fill(1)
+
+    def expect(self, character):
+        """Consume the next character, which must be character"""
+        if self.peek() != character:
+            raise SerCParseError('Invalid spec: expected "{0}"'.format(character))
+        self._position += 1
+
+    def decode(self, decoder):
+        """
+        Decode the next JSON value. If the buffer ends partway through the
+        value, the buffer is doubled and decoding starts again, so a value
+        is decoded a logarithmic number of times in its size. JSON that is
+        invalid before the end of the buffer is reported straight away,
+        rather than after reading the rest of the file.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError as e:
+                if self._eof:
+                    raise SerCParseError('Invalid spec: truncated or malformed JSON, {0} at character {1}'.format(e.msg, self._dropped + e.pos))
+                if not self._isIncomplete(e):
+                    raise SerCParseError('Invalid spec: malformed JSON, {0} at character {1}'.format(e.msg, self._dropped + e.pos))
+                self._fill(2 * (len(self._buffer) - self._position) + self._chunkSize)
+                continue
+            # A number or literal near the end of the buffer might continue
+            # in the next chunk
+            if end > len(self._buffer) - _LONGEST_TOKEN and not self._eof:
+                self._fill(len(self._buffer) - self._position + self._chunkSize)
+                continue
+            self._position = end
+            return value
+
+    def _isIncomplete(self, error):
+        """True if a decoding error could be the end of the buffer cutting a value short"""
+        return error.msg.startswith('Unterminated string') or error.pos > len(self._buffer) - _LONGEST_TOKEN
+
+def iterStructList(fd, chunkSize=64 * 1024):
+    """
+    Yield each entry of the struct_list of the JSON spec read from fd, in
+    order. Any other top level keys are decoded and discarded.
+    """
+    reader = _Reader(fd, chunkSize)
+    decoder = json.JSONDecoder()
+    foundStructList = False
+
+    reader.expect('{')
+    if reader.peek() == '}':
+        reader.expect('}')
+    else:
+        while True:
+            key = reader.decode(decoder)
+            reader.expect(':')
+            if key == 'struct_list' and reader.peek() == '[':
+                foundStructList = True
+                reader.expect('[')
+                if reader.peek() == ']':
+                    reader.expect(']')
+                else:
+                    while True:
+                        yield reader.decode(decoder)
+                        if reader.peek() == ',':
+                            reader.expect(',')
+                        else:
+                            reader.expect(']')
+                            break
+            else:
+                reader.decode(decoder)
+            if reader.peek() == ',':
+                reader.expect(',')
+            else:
+                reader.expect('}')
+                break
+
+    if not foundStructList:
+        raise SerCParseError('Must must have a structure list')
@@ -0,0 +1,349 @@
+# Shared C support code that generated structures can depend on. Each
+# snippet is emitted once, after the headers, by any structure that lists
+# its name in getRequiredSupport(). Snippets that are expensive to build
+# are functions, which are called the first time they are needed.
+from serc.SerCCRC import formatCRCSupport
+
+SUPPORT_CODE = {}
+
+SUPPORT_CODE['arena'] = """#ifndef SERC_ARENA_DEFINED
+#define SERC_ARENA_DEFINED
+#define SERC_ALIGN_UP(value, align) (((value) + (align) - 1) & ~((size_t)(align) - 1))
+
+/*
+ * A bump allocator over a caller supplied region. Allocation is a pointer
+ * increment, and everything is released at once with serc_arena_reset.
+ */
+struct serc_arena {
+    uint8_t* base;
+    size_t size;
+    size_t used;
+};
+
+static inline void serc_arena_init(struct serc_arena* arena, void* region, size_t size) {
+    arena->base = region;
+    arena->size = size;
+    arena->used = 0;
+}
+
+static inline void serc_arena_reset(struct serc_arena* arena) {
+    arena->used = 0;
+}
+
+static inline void* serc_arena_alloc(struct serc_arena* arena, size_t size, size_t align) {
+    uintptr_t address = SERC_ALIGN_UP((uintptr_t)(arena->base + arena->used), align);
+    size_t start = address - (uintptr_t)arena->base;
+    if (start > arena->size || arena->size - start < size) {
+        return NULL;
+    }
+    arena->used = start + size;
+    return arena->base + start;
+}
+#endif
+"""
+
+SUPPORT_CODE['byteswap'] = """#ifndef SERC_BYTESWAP_DEFINED
+#define SERC_BYTESWAP_DEFINED
+#if defined(__BYTE_ORDER__) && __BYTE_ORDER__ == __ORDER_BIG_ENDIAN__
+#define SERC_HOST_BIG_ENDIAN 1
+#else
+#define SERC_HOST_BIG_ENDIAN 0
+#endif
+
+/* Compilers recognize these shift patterns and emit single bswap instructions */
+static inline uint16_t serc_bswap16(uint16_t value) {
+    return (uint16_t)((value >> 8) | (value << 8));
+}
+
+static inline uint32_t serc_bswap32(uint32_t value) {
+    return ((value & 0x000000ffu) << 24) | ((value & 0x0000ff00u) << 8) |
+           ((value & 0x00ff0000u) >> 8) | ((value & 0xff000000u) >> 24);
+}
+
+static inline uint64_t serc_bswap64(uint64_t value) {
+    return ((uint64_t)serc_bswap32((uint32_t)value) << 32) | serc_bswap32((uint32_t)(value >> 32));
+}
+
+/* Reverse the bytes of one value of size bytes at an unaligned address */
+static inline void serc_swap_in_place(void* data, size_t size) {
+    switch (size) {
+    case 2: { uint16_t value; memcpy(&value, data, 2); value = serc_bswap16(value); memcpy(data, &value, 2); break; }
+    case 4: { uint32_t value; memcpy(&value, data, 4); value = serc_bswap32(value); memcpy(data, &value, 4); break; }
+    case 8: { uint64_t value; memcpy(&value, data, 8); value = serc_bswap64(value); memcpy(data, &value, 8); break; }
+    default: break;
+    }
+}
+
+/*
+ * Reverse the bytes of count values of size bytes. size is a constant at
+ * every call site, so inlining picks one loop, which auto-vectorizes.
+ */
+static inline void serc_swap_array(void* data, size_t size, size_t count) {
+    uint8_t* bytes = data;
+    size_t i;
+    switch (size) {
+    case 2:
+        for (i = 0; i < count; i++) {
+            uint16_t value; memcpy(&value, bytes + i * 2, 2); value = serc_bswap16(value); memcpy(bytes + i * 2, &value, 2);
+        }
+        break;
+    case 4:
+        for (i = 0; i < count; i++) {
+            uint32_t value; memcpy(&value, bytes + i * 4, 4); value = serc_bswap32(value); memcpy(bytes + i * 4, &value, 4);
+        }
+        break;
+    case 8:
+        for (i = 0; i < count; i++) {
+            uint64_t value; memcpy(&value, bytes + i * 8, 8); value = serc_bswap64(value); memcpy(bytes + i * 8, &value, 8);
+        }
+        break;
+    default:
+        break;
+    }
+}
+#endif
+"""
+
+SUPPORT_CODE['varint'] = """#ifndef SERC_VARINT_DEFINED
+#define SERC_VARINT_DEFINED
+/*
+ * LEB128 varints: seven bits per byte, least significant first, with the
+ * top bit set on every byte but the last. Values under 128, the common
+ * case, take the single byte fast paths.
+ */
+static inline size_t serc_varint_size(uint64_t value) {
+    size_t size = 1;
+    while (value >= 0x80) {
+        value >>= 7;
+        size++;
+    }
+    return size;
+}
+
+static inline size_t serc_varint_encode(uint8_t* buffer, uint64_t value) {
+    size_t size = 0;
+    if (value < 0x80) {
+        buffer[0] = (uint8_t)value;
+        return 1;
+    }
+    while (value >= 0x80) {
+        buffer[size++] = (uint8_t)(value | 0x80);
+        value >>= 7;
+    }
+    buffer[size++] = (uint8_t)value;
+    return size;
+}
+
+/* Returns the number of bytes read, or 0 if the varint is truncated or too long */
+static inline size_t serc_varint_decode(const uint8_t* buffer, size_t length, uint64_t* value) {
+    uint64_t result = 0;
+    size_t size;
+    if (length > 0 && buffer[0] < 0x80) {
+        *value = buffer[0];
+        return 1;
+    }
+    for (size = 0; size < length && size < 10; size++) {
+        result |= (uint64_t)(buffer[size] & 0x7f) << (7 * size);
+        if (buffer[size] < 0x80) {
+            *value = result;
+            return size + 1;
+        }
+    }
+    return 0;
+}
+
+/* Zigzag maps signed values to unsigned ones so small magnitudes stay small: 0, -1, 1, -2 -> 0, 1, 2, 3 */
+static inline uint64_t serc_zigzag_encode(int64_t value) {
+    return ((uint64_t)value << 1) ^ (uint64_t)(value >> 63);
+}
+
+static inline int64_t serc_zigzag_decode(uint64_t value) {
+    return (int64_t)(value >> 1) ^ -(int64_t)(value & 1);
+}
+#endif
+"""
+
+SUPPORT_CODE['soa'] = """#ifndef SERC_SOA_DEFINED
+#define SERC_SOA_DEFINED
+/* The alignment of every structure of arrays column, a cache line, which suits every SIMD width up to AVX-512 */
+#define SERC_SOA_ALIGNMENT 64
+#endif
+"""
+
+SUPPORT_CODE['crc16'] = lambda: formatCRCSupport('crc16')
+SUPPORT_CODE['crc32'] = lambda: formatCRCSupport('crc32')
+
+SUPPORT_CODE['frame'] = """#ifndef SERC_FRAME_DEFINED
+#define SERC_FRAME_DEFINED
+/*
+ * A frame wraps one serialized structure in an envelope:
+ *
+ *   byte 0       SERC_FRAME_MAGIC
+ *   byte 1       the CRC, SERC_FRAME_CRC16 or SERC_FRAME_CRC32
+ *   bytes 2-3    the type ID of the structure
+ *   bytes 4-7    the payload length
+ *   payload
+ *   2 or 4 bytes the CRC of everything before it
+ *
+ * All multi-byte fields are little endian.
+ */
+#define SERC_FRAME_MAGIC 0xc5
+#define SERC_FRAME_CRC16 0x16
+#define SERC_FRAME_CRC32 0x32
+#define SERC_FRAME_HEADER_SIZE 8
+
+static inline void serc_store_le(uint8_t* buffer, uint32_t value, size_t size) {
+    for (size_t i = 0; i < size; i++) {
+        buffer[i] = (uint8_t)(value >> (8 * i));
+    }
+}
+
+static inline uint32_t serc_load_le(const uint8_t* buffer, size_t size) {
+    uint32_t value = 0;
+    for (size_t i = 0; i < size; i++) {
+        value |= (uint32_t)buffer[i] << (8 * i);
+    }
+    return value;
+}
+
+static inline size_t serc_frame_crc_size(uint8_t crc) {
+    switch (crc) {
+    case SERC_FRAME_CRC16: return SERC_CRC16_SIZE;
+    case SERC_FRAME_CRC32: return SERC_CRC32_SIZE;
+    default: return 0;
+    }
+}
+
+static inline void serc_frame_write_header(uint8_t* buffer, uint8_t crc, uint16_t type_id, uint32_t length) {
+    buffer[0] = SERC_FRAME_MAGIC;
+    buffer[1] = crc;
+    serc_store_le(&(buffer[2]), type_id, 2);
+    serc_store_le(&(buffer[4]), length, 4);
+}
+
+/*
+ * Check for a frame at the start of buffer. Returns the size of the
+ * frame if it is complete and valid, 0 if it could be a frame but more
+ * bytes are needed, or -1 if it is not a frame. Frames with payloads
+ * over max_payload are rejected, so a corrupt length is not waited on.
+ */
+static inline ssize_t serc_frame_check(const uint8_t* buffer, size_t length, size_t max_payload, uint16_t* type_id, size_t* payload_length) {
+    size_t crc_size;
+    size_t payload;
+    uint32_t crc;
+    if (length < 2) {
+        return length == 0 || buffer[0] == SERC_FRAME_MAGIC ? 0 : -1;
+    }
+    crc_size = serc_frame_crc_size(buffer[1]);
+    if (buffer[0] != SERC_FRAME_MAGIC || crc_size == 0) {
+        return -1;
+    }
+    if (length < SERC_FRAME_HEADER_SIZE) {
+        return 0;
+    }
+    payload = serc_load_le(&(buffer[4]), 4);
+    if (payload > max_payload) {
+        return -1;
+    }
+    if (length < SERC_FRAME_HEADER_SIZE + crc_size || length - SERC_FRAME_HEADER_SIZE - crc_size < payload) {
+        return 0;
+    }
+    if (crc_size == SERC_CRC16_SIZE) {
+        crc = serc_crc16_update(SERC_CRC16_INIT, buffer, SERC_FRAME_HEADER_SIZE + payload) ^ SERC_CRC16_XOROUT;
+    } else {
+        crc = serc_crc32_update(SERC_CRC32_INIT, buffer, SERC_FRAME_HEADER_SIZE + payload) ^ SERC_CRC32_XOROUT;
+    }
+    if (crc != serc_load_le(&(buffer[SERC_FRAME_HEADER_SIZE + payload]), crc_size)) {
+        return -1;
+    }
+    *type_id = (uint16_t)serc_load_le(&(buffer[2]), 2);
+    *payload_length = payload;
+    return SERC_FRAME_HEADER_SIZE + payload + crc_size;
+}
+
+/*
+ * A streaming frame decoder over a caller supplied buffer, which must be
+ * large enough for the largest frame. Bytes that are not part of a valid
+ * frame are skipped, and counted in skipped, until the next valid frame.
+ */
+struct serc_frame_decoder {
+    uint8_t* buffer;
+    size_t capacity;
+    size_t start;
+    size_t end;
+    size_t skipped;
+};
+
+static inline void serc_frame_decoder_init(struct serc_frame_decoder* decoder, void* buffer, size_t capacity) {
+    decoder->buffer = buffer;
+    decoder->capacity = capacity;
+    decoder->start = 0;
+    decoder->end = 0;
+    decoder->skipped = 0;
+}
+
+/*
+ * Add up to length bytes of the stream. Returns how many were taken,
+ * which is fewer when the buffer is full, in which case the rest should
+ * be fed again after frames have been taken with serc_frame_decoder_next.
+ */
+static inline size_t serc_frame_decoder_feed(struct serc_frame_decoder* decoder, const uint8_t* data, size_t length) {
+    if (decoder->start > 0) {
+        memmove(decoder->buffer, decoder->buffer + decoder->start, decoder->end - decoder->start);
+        decoder->end -= decoder->start;
+        decoder->start = 0;
+    }
+    if (length > decoder->capacity - decoder->end) {
+        length = decoder->capacity - decoder->end;
+    }
+    memcpy(decoder->buffer + decoder->end, data, length);
+    decoder->end += length;
+    return length;
+}
+
+/*
+ * Take the next valid frame. Returns 1 and sets its type ID and payload,
+ * which stays valid until the next feed, or returns 0 if more bytes are
+ * needed. After a corrupt frame the search resumes one byte after its
+ * start, so a valid frame inside or after it is still found.
+ */
+static inline int serc_frame_decoder_next(struct serc_frame_decoder* decoder, uint16_t* type_id, const uint8_t** payload, size_t* payload_length) {
+    size_t max_payload = decoder->capacity > SERC_FRAME_HEADER_SIZE + SERC_CRC32_SIZE ? decoder->capacity - SERC_FRAME_HEADER_SIZE - SERC_CRC32_SIZE : 0;
+    while (decoder->start < decoder->end) {
+        const uint8_t* magic = memchr(decoder->buffer + decoder->start, SERC_FRAME_MAGIC, decoder->end - decoder->start);
+        ssize_t size;
+        if (magic == NULL) {
+            decoder->skipped += decoder->end - decoder->start;
+            decoder->start = decoder->end;
+            return 0;
+        }
+        decoder->skipped += (size_t)(magic - (decoder->buffer + decoder->start));
+        decoder->start = (size_t)(magic - decoder->buffer);
+        size = serc_frame_check(magic, decoder->end - decoder->start, max_payload, type_id, payload_length);
+        if (size == 0) {
+            return 0;
+        }
+        if (size < 0) {
+            decoder->start++;
+            decoder->skipped++;
+            continue;
+        }
+        *payload = magic + SERC_FRAME_HEADER_SIZE;
+        decoder->start += (size_t)size;
+        return 1;
+    }
+    return 0;
+}
+#endif
+"""
+
+# The order support code is emitted in, so that snippets can build on
+# each other
+SUPPORT_ORDER = ['arena', 'byteswap', 'varint', 'soa', 'crc16', 'crc32', 'frame']
+
+def formatSupport(names):
+    """Return the support code for the set of snippet names, in order"""
+    for name in names:
+        if callable(SUPPORT_CODE[name]):
+            SUPPORT_CODE[name] = SUPPORT_CODE[name]()
+    return ''.join(SUPPORT_CODE[name] + '\n' for name in SUPPORT_ORDER if name in names)
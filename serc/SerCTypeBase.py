@@ -1,5 +1,9 @@
+import struct
+import importlib
 from abc import ABCMeta, abstractmethod
+from serc.SerCIR import SerCTypeDescriptor
 from serc.SerCExceptions import SerCTypeArgsError, SerCParseError
+from serc.SerCTypes import TYPE_MODULES, ENTRY_POINT_GROUP
 
 class SerCTypeMeta(ABCMeta):
     """
@@ -22,6 +26,34 @@ class SerCTypeMeta(ABCMeta):
             
         super().__init__(name, bases, dct)
 
+def _findEntryPoint(typeName):
+    """Find the entry point registering typeName, if any package provides one"""
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return None
+    entryPoints = entry_points()
+    if hasattr(entryPoints, 'select'):
+        entryPoints = entryPoints.select(group=ENTRY_POINT_GROUP)
+    else:
+        entryPoints = entryPoints.get(ENTRY_POINT_GROUP, [])
+    for entryPoint in entryPoints:
+        if entryPoint.name == typeName:
+            return entryPoint
+    return None
+
+# A prototype type object for each distinct type node that has been parsed.
+# See SerCType.parseTypeNode.
+_typePrototypes = {}
+
+def _typeNodeKey(typeNode):
+    """A hashable key for a type node, equal for equal nodes"""
+    if isinstance(typeNode, dict):
+        return tuple(sorted((key, _typeNodeKey(value)) for key, value in typeNode.items()))
+    if isinstance(typeNode, list):
+        return ('[',) + tuple(_typeNodeKey(value) for value in typeNode)
+    return typeNode
+
 class SerCMemberInitialValue(object):
     """Parses initial values of types and holds information about them"""
     def __init__(self, initStr, needsArgument, argumentType=None, argumentName=None):
@@ -60,33 +92,75 @@ class SerCType(metaclass=SerCTypeMeta):
     """
     The base class for all SerC types.
     """
+    # Bump this in a subclass whenever its generated code changes so that
+    # cached output that used it is regenerated
+    VERSION = 1
+
+    def lookupType(typeName):
+        """
+        Find the registered SerC type class for a type ID. Types register
+        themselves when their module is imported, so a type that is not
+        registered yet is loaded from the built in manifest or, failing
+        that, from a "serc.types" entry point. Returns None for unknown
+        types.
+        """
+        if typeName in SerCType.typeRegistry:
+            return SerCType.typeRegistry[typeName]
+
+        if typeName in TYPE_MODULES:
+            importlib.import_module(TYPE_MODULES[typeName])
+        else:
+            entryPoint = _findEntryPoint(typeName)
+            if entryPoint is not None:
+                entryPoint.load()
+        return SerCType.typeRegistry.get(typeName)
+
     def parseTypeNode(typeNode):
-        """Takes in a SerC type node and parses it into a SerC type class"""
+        """
+        Takes in a SerC type node and parses it into a SerC type class.
+        Each distinct type node is only constructed once, as a prototype.
+        Every member with that type gets a shallow copy of the prototype,
+        so they all share its interned SerCTypeDescriptor.
+        """
+        key = typeNode if isinstance(typeNode, str) else _typeNodeKey(typeNode)
+        prototype = _typePrototypes.get(key)
+        if prototype is None:
+            prototype = SerCType.constructTypeNode(typeNode)
+            prototype.getDescriptor()
+            _typePrototypes[key] = prototype
+        memberType = object.__new__(type(prototype))
+        memberType.__dict__.update(prototype.__dict__)
+        return memberType
+
+    def constructTypeNode(typeNode):
+        """Constructs a new SerC type object from a SerC type node"""
         memberType = None
 
         # The type can either be a simple string using the defaults or a
         # full type dictionary
         if isinstance(typeNode, str):
             # Simple type
-            if typeNode not in SerCType.typeRegistry:
+            typeClass = SerCType.lookupType(typeNode)
+            if typeClass is None:
                 raise SerCParseError('Unknown member type: ' + typeNode)
-            memberType = SerCType.typeRegistry[typeNode]()
+            memberType = typeClass()
         elif isinstance(typeNode, dict):
             # Full type dictionary
             if 'type_name' not in typeNode:
                 raise SerCParseError('Types must have a type name')
-            if typeNode['type_name'] not in SerCType.typeRegistry:
+            typeClass = SerCType.lookupType(typeNode['type_name'])
+            if typeClass is None:
                 raise SerCParseError('Unknown member type: ' + typeNode['type_name'])
             memberType = None
             if 'args' not in typeNode:
                 # No args given, use the defaults
-                memberType = SerCType.typeRegistry[typeNode['type_name']]()
+                memberType = typeClass()
             elif isinstance(typeNode['args'], list):
                 # There is an args list
-                memberType = SerCType.typeRegistry[typeNode['type_name']](*typeNode['args'])
+                memberType = typeClass(*typeNode['args'])
             elif isinstance(typeNode['args'], dict):
                 # There is a keyword arg dictionary
-                memberType = SerCType.typeRegistry[typeNode['type_name']](**typeNode['args'])
+                memberType = typeClass(**typeNode['args'])
             else:
                 # Error parsing the args list
                 raise SerCParseError('Unknown type args. Args must be a list or a dictionary')
@@ -107,11 +181,88 @@ class SerCType(metaclass=SerCTypeMeta):
     def formatCType(self): pass
 
     @abstractmethod
-    def formatConstructor(self): pass
+    def formatConstructor(self, out): pass
 
     @abstractmethod
     def formatSize(self): pass
 
+    # The interned descriptor of this type, shared by copies of a prototype
+    _descriptor = None
+
+    def getDescriptor(self):
+        """Return the SerCTypeDescriptor for this type, computing it the first time"""
+        if self._descriptor is None:
+            self._descriptor = SerCTypeDescriptor(self)
+        return self._descriptor
+
+    def isFixedSize(self):
+        """
+        Return True if this member's serialized bytes are stored inline in
+        the C structure, so adjacent fixed size members can be copied as one
+        contiguous block
+        """
+        return True
+
+    def getInitialValue(self):
+        """Return the C expression this member is initialized to by the constructor"""
+        return self._initValue.initStr
+
+    def getStructFormat(self):
+        """
+        Return the Python struct module format character for this type, or
+        None if it is not a fixed width scalar
+        """
+        return None
+
+    def getAlignment(self):
+        """
+        Return the natural alignment of this type in bytes on an LP64
+        target, or None if it cannot be known from the type alone. It is
+        only used to order members in aligned layouts and to estimate
+        padding, so the generated code stays correct if it is wrong.
+        """
+        structFormat = self.getStructFormat()
+        if structFormat is None:
+            return None
+        return struct.calcsize('<' + structFormat)
+
+    def getEncodings(self):
+        """
+        Return the wire encodings a member of this type can set with its
+        encoding option. fixed, the default, copies the value's bytes as
+        they are in memory. Types that support more format them with
+        formatCompactSerialize, formatCompactDeserialize and
+        formatCompactSize.
+        """
+        return ['fixed']
+
+    def getCompactEncoding(self):
+        """Return the encoding this type uses in structures with the compact encoding"""
+        return 'fixed'
+
+    def getSwapSize(self):
+        """
+        Return a C expression for the width of this type if its bytes must
+        be reversed to change byte order, or None if it has no byte order
+        """
+        return None
+
+    def formatSwap(self, out, pointer, indent='    '):
+        """
+        Write C code that reverses the byte order of this member, in place,
+        at pointer. The pointer does not need to be aligned.
+        """
+        swapSize = self.getSwapSize()
+        if swapSize is not None:
+            out.line('{0}serc_swap_in_place({1}, {2});'.format(indent, pointer, swapSize))
+
+    def getUsedTypes(self):
+        """
+        Return the SerC type classes this member is built from. Compound
+        types also include the types of their elements.
+        """
+        return [type(self)]
+
     def parse(self, node):
         """
         The parent default parse command that parses basic things common
@@ -134,13 +285,17 @@ class SerCType(metaclass=SerCTypeMeta):
                 raise SerCParseError('inline_comment must be strings')
             self.inlineComment = node['inline_comment']
 
-        self._initValue = SerCMemberInitialValue.parseInitialValue(node, self.formatCType(), self.name)
+        self.encoding = node.get('encoding')
+        if self.encoding is not None and self.encoding not in self.getEncodings():
+            raise SerCParseError('The encoding of "{0}" must be one of: {1}'.format(self.name, ', '.join(self.getEncodings())))
+
+        self._initValue = SerCMemberInitialValue.parseInitialValue(node, self.getDescriptor().cType, self.name)
 
-    def formatDeclaration(self):
+    def formatDeclaration(self, out):
         if self.longComment:
-           print('    /*\n     * {0}\n     */'.format(self.longComment))
+           out.line('    /*\n     * {0}\n     */'.format(self.longComment))
         line = '    {0} {1};'.format(self.formatCType(), self.name)
         if self.inlineComment:
             line += ' /* {0} */'.format(self.inlineComment)
-        print(line)
+        out.line(line)
     
@@ -1,9 +1,16 @@
-import os
-import glob
-modules = glob.glob(os.path.dirname(__file__)+"/*.py")
-__all__ = [ os.path.basename(f)[:-3] for f in modules]
-
-# Construct all of the types so that they get registered
-for name in __all__:
-    __import__('serc.SerCTypes.{0}'.format(name))
+# The static manifest of built in type IDs and the modules that define
+# them. Type modules are only imported the first time one of their types is
+# looked up, see SerCType.lookupType. Third party types are registered
+# through the "serc.types" entry point group instead.
+TYPE_MODULES = {
+    'int': 'serc.SerCTypes.intTypes',
+    'uint8_t': 'serc.SerCTypes.intTypes',
+    'float': 'serc.SerCTypes.floatTypes',
+    'double': 'serc.SerCTypes.floatTypes',
+    'vector': 'serc.SerCTypes.compoundTypes',
+    'struct': 'serc.SerCTypes.compoundTypes',
+}
 
+# The entry point group that third party packages register types under. The
+# entry point name is the type ID and loading it must define the type.
+ENTRY_POINT_GROUP = 'serc.types'
@@ -5,6 +5,9 @@ class SerCTypeVector(SerCType):
     """
     This class defines all C array lists where the lists are malloced. Like C++ vector
     """
+    # The constructor copies its vector argument since version 2
+    VERSION = 2
+
     def __init__(self, elementTypeNode='int'):
         super().__init__()
         self._elementType = SerCType.parseTypeNode(elementTypeNode)
@@ -26,6 +29,83 @@ class SerCTypeVector(SerCType):
         else:
             return []
 
+    # Vectors are stored as a pointer to their elements
+    POINTER_ALIGNMENT = 8
+
+    def isFixedSize(self):
+        return False
+
+    def getAlignment(self):
+        return self.POINTER_ALIGNMENT
+
+    def getEncodings(self):
+        # Vectors of integers can varint encode each element, or delta
+        # encode them, which is a zigzag varint of each element minus the
+        # previous one and suits slowly varying samples
+        if 'varint' in self._elementType.getEncodings():
+            return ['fixed', 'varint', 'delta']
+        return ['fixed']
+
+    def getCompactEncoding(self):
+        return 'delta' if 'delta' in self.getEncodings() else 'fixed'
+
+    def _formatElementLoop(self, out, encoding, formatElement):
+        """Write a loop over the elements, calling formatElement(out) for the body of each one"""
+        out.line('    {')
+        if encoding == 'delta':
+            out.line('        uint64_t previous = 0;')
+        out.line('        for (size_t i = 0; i < (size_t)({0}); i++) {{'.format(self.listLength))
+        formatElement(out)
+        out.line('        }')
+        out.line('    }')
+
+    def _formatElementPayload(self, encoding):
+        """The C expression for the varint payload of element i"""
+        element = 'this->{0}[i]'.format(self.name)
+        if encoding == 'delta':
+            return 'serc_zigzag_encode((int64_t)((uint64_t){0} - previous))'.format(element)
+        return self._elementType.formatVarintValue(element)
+
+    def formatCompactSerialize(self, out, encoding):
+        def formatElement(out):
+            out.line('            offset += serc_varint_encode(&(buffer[offset]), {0});'.format(self._formatElementPayload(encoding)))
+            if encoding == 'delta':
+                out.line('            previous = (uint64_t)this->{0}[i];'.format(self.name))
+        self._formatElementLoop(out, encoding, formatElement)
+
+    def formatCompactDeserialize(self, out, encoding):
+        def formatElement(out):
+            out.line('            uint64_t value;')
+            out.line('            size_t read = serc_varint_decode(&(buffer[offset]), length - offset, &value);')
+            if encoding == 'delta':
+                # Deltas wrap around, exactly undoing the encoder's subtraction
+                out.line('            if (read == 0) {')
+                out.line('                return -1;')
+                out.line('            }')
+                out.line('            previous += (uint64_t)serc_zigzag_decode(value);')
+                out.line('            this->{0}[i] = ({1})previous;'.format(self.name, self._elementType.formatCType()))
+            else:
+                out.line('            if ({0}) {{'.format(' || '.join(self._elementType.formatDecodeErrors('value'))))
+                out.line('                return -1;')
+                out.line('            }')
+                out.line('            this->{0}[i] = {1};'.format(self.name, self._elementType.formatFromVarint('value')))
+            out.line('            offset += read;')
+        self._formatElementLoop(out, encoding, formatElement)
+
+    def formatCompactSize(self, out, encoding):
+        def formatElement(out):
+            out.line('            size += serc_varint_size({0});'.format(self._formatElementPayload(encoding)))
+            if encoding == 'delta':
+                out.line('            previous = (uint64_t)this->{0}[i];'.format(self.name))
+        self._formatElementLoop(out, encoding, formatElement)
+
+    def getElementType(self):
+        """Return the SerC type of the elements of this vector"""
+        return self._elementType
+
+    def getUsedTypes(self):
+        return [type(self)] + self._elementType.getUsedTypes()
+
     def parse(self, node):
         super().parse(node)
         if 'list_length' not in node:
@@ -39,11 +119,23 @@ class SerCTypeVector(SerCType):
     def formatSize(self):
         return '({0} * {1})'.format(self._elementType.formatSize(), self.listLength)
 
-    def formatConstructor(self):
-        print('    this->{0} = malloc(sizeof({1}) * {2});'.format(self.name, self._elementType.formatCType(), self.listLength))
-        print('    if (this->{0} == NULL) {{'.format(self.name))
-        print('        return -1;')
-        print('    }')
+    def formatSwap(self, out, pointer, indent='    '):
+        """Swap every element in one bulk loop the C compiler can vectorize"""
+        swapSize = self._elementType.getSwapSize()
+        if swapSize is not None:
+            out.line('{0}serc_swap_array({1}, {2}, {3});'.format(indent, pointer, swapSize, self.listLength))
+
+    def formatConstructor(self, out):
+        out.line('    this->{0} = malloc(sizeof({1}) * {2});'.format(self.name, self._elementType.formatCType(), self.listLength))
+        out.line('    if (this->{0} == NULL) {{'.format(self.name))
+        out.line('        return -1;')
+        out.line('    }')
+        if self._initValue.needsArgument:
+            # The argument is copied, like <type>_new does in every allocation mode
+            argument = self._initValue.getArgument()[1]
+            out.line('    if ({0} != NULL) {{'.format(argument))
+            out.line('        memcpy(this->{0}, {1}, sizeof({2}) * {3});'.format(self.name, argument, self._elementType.formatCType(), self.listLength))
+            out.line('    }')
 
 
 class SerCTypeStructureStub(SerCType):
@@ -72,12 +164,16 @@ class SerCTypeStructureStub(SerCType):
         else:
             return []
 
+    def getStructTypeName(self):
+        """Return the type name of the structure this stub refers to"""
+        return self._structTypeName
+
     def formatCType(self):
         return 'struct {0}'.format(self._structTypeName)
 
     def formatSize(self):
         return 'sizeof({0})'.format(self.formatCType())
 
-    def formatConstructor(self):
-        print('    {1}_create(&(this->{0}));'.format(self.name, self._structTypeName))
+    def formatConstructor(self, out):
+        out.line('    this->{0} = {1};'.format(self.name, self._initValue.initStr))
 
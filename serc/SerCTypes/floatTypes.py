@@ -33,11 +33,17 @@ class SerCTypeFloat(SerCType):
     def formatCType(self):
         return self._width
 
+    def getStructFormat(self):
+        return 'f' if self._width == 'float' else 'd'
+
+    def getSwapSize(self):
+        return 'sizeof({0})'.format(self.formatCType())
+
     def formatSize(self):
         return 'sizeof({0})'.format(self.formatCType())
 
-    def formatConstructor(self):
-        print('    this->{0} = {1};'.format(self.name, self._initValue.initStr))
+    def formatConstructor(self, out):
+        out.line('    this->{0} = {1};'.format(self.name, self._initValue.initStr))
 
 class SerCTypeDouble(SerCTypeFloat):
     """A convinience class that is just the float type with the width bound to dobule"""
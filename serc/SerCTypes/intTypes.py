@@ -1,3 +1,4 @@
+import struct
 from serc.SerCTypeBase import SerCType, SerCMemberInitialValue
 from serc.SerCExceptions import SerCTypeArgsError, SerCParseError
 
@@ -7,6 +8,10 @@ class SerCTypeInt(SerCType):
     """
     VALID_WIDTHS = ['system', 'short', 'long', 8, 16, 32, 64]
 
+    # Python struct format characters for each width, using standard sizes.
+    # long is assumed to be 64 bits, as it is on LP64 targets.
+    STRUCT_FORMATS = {'system': 'i', 'short': 'h', 'long': 'q', 8: 'b', 16: 'h', 32: 'i', 64: 'q'}
+
     def __init__(self, signedness='signed', width='system'):
         super().__init__()
         # Parse the signedness
@@ -64,11 +69,85 @@ class SerCTypeInt(SerCType):
                 prefix = 'u'
             return '{0}int{1}_t'.format(prefix, self._width)
 
+    def getStructFormat(self):
+        structFormat = self.STRUCT_FORMATS[self._width]
+        if not self._isSigned:
+            structFormat = structFormat.upper()
+        return structFormat
+
+    def getSwapSize(self):
+        if self._width == 8:
+            return None
+        return 'sizeof({0})'.format(self.formatCType())
+
     def formatSize(self):
         return 'sizeof({0})'.format(self.formatCType())
 
-    def formatConstructor(self):
-        print('    this->{0} = {1};'.format(self.name, self._initValue.initStr))
+    def formatConstructor(self, out):
+        out.line('    this->{0} = {1};'.format(self.name, self._initValue.initStr))
+
+    def getEncodings(self):
+        # varint is LEB128, with signed values zigzag encoded first so
+        # that small negative numbers stay short
+        return ['fixed', 'varint']
+
+    def getCompactEncoding(self):
+        return 'varint'
+
+    def isSigned(self):
+        return self._isSigned
+
+    def getVarintBytes(self):
+        """The most bytes a varint of this type can take"""
+        bits = struct.calcsize('<' + self.getStructFormat()) * 8
+        return (bits + 6) // 7
+
+    def formatVarintValue(self, expression):
+        """The C expression for the uint64_t varint payload of a value of this type"""
+        if self._isSigned:
+            return 'serc_zigzag_encode((int64_t)({0}))'.format(expression)
+        return '(uint64_t)({0})'.format(expression)
+
+    def formatFromVarint(self, value):
+        """The C expression for the value of this type a varint payload decodes to"""
+        if self._isSigned:
+            return '({0})serc_zigzag_decode({1})'.format(self.formatCType(), value)
+        return '({0}){1}'.format(self.formatCType(), value)
+
+    def formatVarintOutOfRange(self, value):
+        """
+        A C condition that is true when a varint payload does not fit in
+        this type, or None for 64 bit types, which every payload fits
+        """
+        if struct.calcsize('<' + self.getStructFormat()) == 8:
+            return None
+        if self._isSigned:
+            return '(int64_t)({0})serc_zigzag_decode({1}) != serc_zigzag_decode({1})'.format(self.formatCType(), value)
+        return '(uint64_t)({0}){1} != {1}'.format(self.formatCType(), value)
+
+    def formatDecodeErrors(self, value):
+        """The C conditions under which decoding a varint into this type fails"""
+        errors = ['read == 0']
+        if self.formatVarintOutOfRange(value) is not None:
+            errors.append(self.formatVarintOutOfRange(value))
+        return errors
+
+    def formatCompactSerialize(self, out, encoding):
+        out.line('    offset += serc_varint_encode(&(buffer[offset]), {0});'.format(self.formatVarintValue('this->' + self.name)))
+
+    def formatCompactDeserialize(self, out, encoding):
+        out.line('    {')
+        out.line('        uint64_t value;')
+        out.line('        size_t read = serc_varint_decode(&(buffer[offset]), length - offset, &value);')
+        out.line('        if ({0}) {{'.format(' || '.join(self.formatDecodeErrors('value'))))
+        out.line('            return -1;')
+        out.line('        }')
+        out.line('        this->{0} = {1};'.format(self.name, self.formatFromVarint('value')))
+        out.line('        offset += read;')
+        out.line('    }')
+
+    def formatCompactSize(self, out, encoding):
+        out.line('    size += serc_varint_size({0});'.format(self.formatVarintValue('this->' + self.name)))
 
 class SerCTypeUint8(SerCTypeInt):
     """A simple binding of the Int type for uint8_t"""
@@ -0,0 +1,127 @@
+"""
+Watch mode. SerCWatcher keeps the SerC type registry, the parsed
+structures and their rendered sections resident, polls the spec files
+for changes and regenerates only what changed. A changed spec is loaded
+again, but only the struct_list entries whose JSON changed are parsed and
+rendered, and only the output files whose content changed are rewritten.
+"""
+import io
+import os
+import sys
+import json
+import time
+import serc
+from serc.SerCExceptions import SerCError
+from serc.SerCBatch import outputPathFor
+from serc.SerCSplit import writeIfChanged, writeSplit
+
+DEFAULT_INTERVAL = 0.2
+
+class SerCWarmSerializer(serc.JsonToCSerializer):
+    """
+    A JsonToCSerializer that reuses the structures and rendered sections of
+    struct_list entries that are unchanged since the last run. previous
+    maps the normalized JSON of each entry of the last run to its
+    [structure, sections]. warm is the same for this run, to pass as
+    previous to the next one.
+    """
+    def __init__(self, fd, previous, defaults=None, hooks=None, roots=None):
+        super().__init__(fd, None, None, defaults, hooks, roots)
+        self._previous = previous
+        self._entries = {}
+        self.warm = {}
+        self.parsedCount = 0
+
+    def parseStructure(self, structNode):
+        key = json.dumps(structNode, sort_keys=True, separators=(',', ':'))
+        entry = self._previous.get(key)
+        if entry is None:
+            entry = [super().parseStructure(structNode), None]
+            self.parsedCount += 1
+        self.warm[key] = entry
+        self._entries[id(entry[0])] = entry
+        return entry[0]
+
+    def renderStructure(self, structure):
+        entry = self._entries[id(structure)]
+        if entry[1] is None:
+            entry[1] = super().renderStructure(structure)
+        return entry[1]
+
+class SerCWatcher(object):
+    """
+    Regenerates each spec in specPaths whenever it changes. Each spec is
+    written to its outputPathFor(specPath, outputDir), or, if splitDir is
+    given, there must be a single spec, which is split into a .h/.c pair
+    per structure in splitDir. defaults and roots are as for
+    JsonToCSerializer. Progress and errors are written to log.
+    """
+    def __init__(self, specPaths, outputDir=None, splitDir=None, defaults=None, roots=None, log=None):
+        super().__init__()
+        if splitDir is not None and len(specPaths) != 1:
+            raise SerCError('Only a single spec can be watched with a split directory')
+        self._specPaths = specPaths
+        self._outputDir = outputDir
+        self._splitDir = splitDir
+        self._defaults = defaults
+        self._roots = roots
+        self._log = log if log is not None else sys.stderr
+        self._stats = {}
+        self._warm = {specPath: {} for specPath in specPaths}
+        if outputDir is not None:
+            os.makedirs(outputDir, exist_ok=True)
+
+    def _stat(self, specPath):
+        try:
+            stat = os.stat(specPath)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def poll(self):
+        """Regenerate every spec that changed since the last poll. Returns the paths that were regenerated."""
+        changed = []
+        for specPath in self._specPaths:
+            stat = self._stat(specPath)
+            if stat is None or stat == self._stats.get(specPath):
+                continue
+            self._stats[specPath] = stat
+            self.regenerate(specPath)
+            changed.append(specPath)
+        return changed
+
+    def regenerate(self, specPath):
+        """
+        Regenerate one spec, reusing the warm structures of its unchanged
+        entries. Errors are logged and the previous outputs are kept.
+        Returns True on success.
+        """
+        startTime = time.perf_counter()
+        try:
+            with open(specPath, 'r') as specFile:
+                serializer = SerCWarmSerializer(specFile, self._warm[specPath], self._defaults, roots=self._roots)
+                serializer.parseStructures()
+            if self._splitDir is not None:
+                written, unchanged = writeSplit(serializer, self._splitDir)
+            else:
+                out = io.StringIO()
+                serializer.emit(out)
+                outputPath = outputPathFor(specPath, self._outputDir)
+                written = [outputPath] if writeIfChanged(outputPath, out.getvalue()) else []
+        except (SerCError, OSError, ValueError, TypeError) as e:
+            self._log.write('serc watch: {0}: {1}: {2}\n'.format(specPath, type(e).__name__, e))
+            return False
+        self._warm[specPath] = serializer.warm
+        self._log.write('serc watch: {0}: parsed {1} of {2} structures, wrote {3} files in {4:.1f}ms\n'.format(
+            specPath, serializer.parsedCount, len(serializer.getStructures()), len(written), (time.perf_counter() - startTime) * 1000))
+        return True
+
+    def run(self, interval=DEFAULT_INTERVAL):
+        """Poll for changes every interval seconds until interrupted"""
+        self._log.write('serc watch: watching {0} spec files\n'.format(len(self._specPaths)))
+        try:
+            while True:
+                self.poll()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
@@ -1,17 +1,82 @@
-import json, itertools
+import json, itertools, sys, re, time
 from serc.SerCExceptions import SerCTypeArgsError, SerCParseError
 from serc.SerCTypeBase import SerCType
+from serc.SerCEmitter import SerCEmitter
+from serc.SerCIR import compileMembers
+from serc.SerCLayout import orderByAlignment
+from serc.SerCGraph import SerCDependencyGraph, getDependencies
+from serc.SerCStream import iterStructList
+from serc.SerCSupport import formatSupport
+from serc.SerCCRC import crc
 
-# Import all the types. This also registers all of the types
-import serc.SerCTypes
+# Types are registered lazily, the first time SerCType.lookupType sees them
+
+# The sections of generated code, in the order they are emitted
+SECTIONS = ['prototype', 'declaration', 'size', 'allocate', 'constructor', 'new', 'serializer', 'batch', 'view']
+
+# Matches member references like "this->rxCount" in list_length expressions
+_THIS_MEMBER = re.compile(r'this->(\w+)')
+
+# Matches member references with the fields of nested structures after
+# them, like "this->header.count"
+_THIS_MEMBER_FIELDS = re.compile(r'this->(\w+)((?:\.\w+)*)')
 
 def _formatArgument(arg):
     return (arg[0] + ' ' + arg[1])
 
+def _formatSwapFieldsMacro(typeName):
+    """The name of the compile time flag that is 1 when <type>_swap_fields has anything to swap"""
+    return '{0}_SWAP_FIELDS'.format(typeName.upper())
+
+def _formatSwapFieldsCall(out, typeName, pointer, indent='    '):
+    """
+    Swap the structure typeName that was copied as raw bytes to pointer,
+    compiled away when neither it nor anything nested in it needs swapping
+    """
+    out.line('#if {0}'.format(_formatSwapFieldsMacro(typeName)))
+    out.line('{0}{1}_swap_fields({2});'.format(indent, typeName, pointer))
+    out.line('#endif')
+
 class SerCStructure(object):
     """This holds all the data about a structure once it has been parsed"""
-    def __init__(self, node):
-        """Parse a JSON node into a new object of the SerCStructure class"""
+    # How <type>_new allocates a structure and its vectors. malloc makes a
+    # separate allocation for each, single puts them all in one malloced
+    # block and arena puts that block in a caller supplied serc_arena.
+    # Every mode copies the vector arguments of <type>_new.
+    ALLOCATION_MODES = ['malloc', 'single', 'arena']
+
+    # The byte order of multi-byte values on the wire, and the matching
+    # Python struct byte order character. host keeps the plain memcpy
+    # layout of the machine the code is compiled for.
+    BYTE_ORDERS = {'host': '=', 'little': '<', 'big': '>'}
+
+    # The in-memory layout of the structure. packed is byte for byte the
+    # wire format, so it is copied with a few large memcpys but every
+    # member access is unaligned. aligned reorders the members by
+    # alignment and drops __attribute__((packed)), so members are
+    # naturally aligned and each one is copied to and from the wire
+    # separately.
+    LAYOUTS = ['packed', 'aligned']
+
+    # The default wire encoding of the members. fixed copies every value
+    # as it is in memory. compact varint encodes integers and delta
+    # encodes integer vectors, which is smaller for small values but has
+    # to be encoded and decoded a member at a time. Members can override
+    # it with their own encoding option.
+    ENCODINGS = ['fixed', 'compact']
+
+    # The CRC of the frame envelope written by <type>_serialize_frame, or
+    # none for no frame functions. Frames carry the structure's type_id,
+    # which defaults to the CRC-16 of its type name.
+    ENVELOPES = ['none', 'crc16', 'crc32']
+
+    def __init__(self, node, defaults=None, hooks=None):
+        """
+        Parse a JSON node into a new object of the SerCStructure class.
+        defaults holds values for structure options that the node does not
+        set itself. hooks is an optional SerCHooks that is told how long
+        each member took to parse.
+        """
         super().__init__()
 
         # Do some error checking
@@ -27,91 +92,964 @@ class SerCStructure(object):
         self.typedefName = None
 
         for member in node['contents']:
-            self._members.append(self.parseMember(member))
+            if hooks is None:
+                self._members.append(self.parseMember(member))
+            else:
+                startTime = time.perf_counter()
+                memberType = self.parseMember(member)
+                hooks.onMember(type(memberType), time.perf_counter() - startTime)
+                self._members.append(memberType)
 
         if 'typedef_name' in node:
             if not isinstance(node['typedef_name'], str):
                 raise SerCParseError('Structure typedef names must be strings')
             self.typedefName = node['typedef_name']
 
+        defaults = defaults if defaults is not None else {}
+        self.allocation = self._parseOption(node, defaults, 'allocation', self.ALLOCATION_MODES, 'malloc')
+        self.byteOrder = self._parseOption(node, defaults, 'byte_order', list(self.BYTE_ORDERS), 'host')
+        self.layout = self._parseOption(node, defaults, 'layout', self.LAYOUTS, 'packed')
+        self.encoding = self._parseOption(node, defaults, 'encoding', self.ENCODINGS, 'fixed')
+        self.envelope = self._parseOption(node, defaults, 'envelope', self.ENVELOPES, 'none')
+        self.typeId = node.get('type_id', crc('crc16', self.typeName.encode('utf-8')))
+        if not isinstance(self.typeId, int) or isinstance(self.typeId, bool) or not 0 <= self.typeId <= 0xffff:
+            raise SerCParseError('The type_id of "{0}" must be an integer from 0 to 65535'.format(self.typeName))
+
+        # Compile the members once, so that every section formats from the
+        # same precomputed C types, sizes and offsets. Nested structures
+        # in an aligned structure are not their own wire format, so their
+        # serialized size comes from their size macro.
+        compact = self.encoding == 'compact'
+        if self.layout == 'aligned':
+            self._records = compileMembers(self._members, lambda typeName: '{0}_SERIALIZED_SIZE'.format(typeName.upper()), compact)
+        else:
+            self._records = compileMembers(self._members, compact=compact)
+        self._checkListLengths()
+
+        # Fixed size structures can also get a structure of arrays
+        # companion, <type>_soa, with one contiguous column per member. A
+        # default only applies to the structures that support it.
+        self.soa = self._parseOption(node, defaults, 'soa', [False, True], False)
+        if self.soa and not (self.isFixedSize() and self._records):
+            if 'soa' in node:
+                raise SerCParseError('Only fixed size structures with members can have a structure of arrays, which "{0}" is not'.format(self.typeName))
+            self.soa = False
+
+    def _checkListLengths(self):
+        """
+        Check that the list_length of every vector only refers to members
+        before it, which are the ones a deserializer has read by the time
+        it reaches the vector
+        """
+        earlier = set()
+        names = set(record.name for record in self._records)
+        for record in self._records:
+            if record.listLength is not None:
+                for name in _THIS_MEMBER.findall(str(record.listLength)):
+                    if name not in names:
+                        raise SerCParseError('The list_length of "{0}" in "{1}" refers to an unknown member "{2}"'.format(record.name, self.typeName, name))
+                    if name not in earlier:
+                        raise SerCParseError('The list_length of "{0}" in "{1}" refers to "{2}", which is not before it'.format(record.name, self.typeName, name))
+            earlier.add(record.name)
+
+    def _parseOption(self, node, defaults, name, validValues, default):
+        """Parse a structure option, falling back to defaults and then default"""
+        value = node.get(name, defaults.get(name, default))
+        if value not in validValues:
+            raise SerCParseError('Structure option {0} must be one of: {1}'.format(name, ', '.join(map(str, validValues))))
+        return value
+
+    def getMembers(self):
+        """Get the parsed member types of this structure, in declaration order"""
+        return self._members
+
+    def getRecords(self):
+        """Get the compiled SerCMemberRecords of this structure, in declaration order"""
+        return self._records
+
+    def getMemoryOrder(self):
+        """Get the compiled members in the order they are declared in the C structure"""
+        if self.layout == 'aligned':
+            return orderByAlignment(self._records)
+        return self._records
+
+    def hasWireLayout(self):
+        """True if an array of this structure in memory is byte for byte its wire format"""
+        return self.layout == 'packed' and self.isFixedSize()
+
     def getRequiredHeaders(self):
         """
         Get all the required headers for this structure, which is the
         union of all the required headers for the members plus
-        string.h for memcpy.
+        stddef.h for offsetof, stdint.h for the uint8_t buffers,
+        stdlib.h for malloc, string.h for memcpy, sys/types.h for ssize_t
+        and sys/uio.h for struct iovec.
         """
-        requiredHeaders = {'string.h'}
-        for member in self._members:
-            requiredHeaders = requiredHeaders.union(member.getRequiredHeaders())
+        requiredHeaders = {'stddef.h', 'stdint.h', 'stdlib.h', 'string.h', 'sys/types.h', 'sys/uio.h'}
+        for record in self._records:
+            requiredHeaders = requiredHeaders.union(record.descriptor.requiredHeaders)
         return requiredHeaders
 
-    def formatTypedef(self):
-        print('typedef struct {0} {1};'.format(self.typeName, self.typedefName))
+    def getRequiredSupport(self):
+        """Get the names of the shared support code snippets this structure uses"""
+        requiredSupport = set()
+        if self.allocation != 'malloc':
+            requiredSupport.add('arena')
+        if self.byteOrder != 'host':
+            requiredSupport.add('byteswap')
+        if self.isCompact():
+            requiredSupport.add('varint')
+        if self.soa:
+            requiredSupport.update(('arena', 'soa'))
+        if self.envelope != 'none':
+            # The frame decoder handles both CRCs
+            requiredSupport.update(('crc16', 'crc32', 'frame'))
+        return requiredSupport
 
-    def formatPrototype(self):
-        print('struct {0};'.format(self.typeName))
+    def getStructByteOrder(self):
+        """The Python struct byte order character for this structure's wire format"""
+        return self.BYTE_ORDERS[self.byteOrder]
 
-    def formatDeclaration(self):
-        print('struct {0} {{'.format(self.typeName))
-        for member in self._members:
-            member.formatDeclaration()
-        print('}__attribute__((packed));')
+    def formatSwapMacro(self):
+        """The name of the compile time flag that is 1 when wire and host byte order differ"""
+        return '{0}_BYTE_SWAP'.format(self.typeName.upper())
+
+    def _formatSwapBlock(self, out, formatSwaps):
+        """
+        Write the byte swapping code produced by formatSwaps(emitter) inside
+        an #if on this structure's swap flag, so that it compiles away
+        entirely when the host already uses the wire byte order
+        """
+        if self.byteOrder == 'host':
+            return
+        swaps = SerCEmitter()
+        formatSwaps(swaps)
+        if swaps.getvalue():
+            out.line('#if {0}'.format(self.formatSwapMacro()))
+            out.write(swaps.getvalue())
+            out.line('#endif')
+
+    def getTypeVersions(self):
+        """
+        Get the sorted list of (type ID, version) pairs for every SerC type
+        used by this structure's members
+        """
+        versions = set()
+        for record in self._records:
+            for typeClass in record.descriptor.usedTypes:
+                versions.add((typeClass.getTypeID().lower(), typeClass.VERSION))
+        return sorted(versions)
+
+    def formatTypedef(self, out):
+        out.line('typedef struct {0} {1};'.format(self.typeName, self.typedefName))
+
+    def formatPrototype(self, out):
+        out.line('struct {0};'.format(self.typeName))
+
+    def formatDeclaration(self, out):
+        out.line('struct {0} {{'.format(self.typeName))
+        for record in self.getMemoryOrder():
+            record.member.formatDeclaration(out)
+        if self.layout == 'packed':
+            out.line('}__attribute__((packed));')
+        else:
+            out.line('};')
 
         if self.typedefName:
-            self.formatTypedef()
+            self.formatTypedef(out)
 
-    def formatSize(self):
-        print('size_t {0}_size(struct {0}* this) {{'.format(self.typeName))
-        print('    return ({0});'.format(' + '.join(member.formatSize() for member in self._members)))
-        print('}')
+        if self.byteOrder != 'host':
+            hostMatches = '1' if self.byteOrder == 'big' else '0'
+            out.line('#define {0} (SERC_HOST_BIG_ENDIAN != {1})'.format(self.formatSwapMacro(), hostMatches))
+        if self.layout == 'packed' and not self.isCompact():
+            self._formatSwapFields(out)
 
-    def formatAllocate(self):
-        allocStr = """ssize_t {0}_allocate(struct {0}** block) {{
-    *block = malloc(sizeof(struct {0}));
-    if (*block == NULL) {{
-        return -1;
-    }}
-    return sizeof(struct {0});
-}}
-""".format(self.typeName)
-        print(allocStr)
+        if self.soa:
+            out.line()
+            self._formatSoADeclaration(out)
 
-    def formatConstructor(self):
+    def _formatSwapFields(self, out):
+        """
+        <type>_swap_fields, which converts a packed structure copied as
+        raw bytes between the host and wire byte order in place. Nested
+        structures swap their own members, in their own byte order, so a
+        structure or vector that copies this one only calls it under
+        <TYPE>_SWAP_FIELDS and never needs to know this one's options.
+        """
+        macro = _formatSwapFieldsMacro(self.typeName)
+        swaps = SerCEmitter()
+        nested = []
+        for record in self._records:
+            pointer = 'bytes + offsetof(struct {0}, {1})'.format(self.typeName, record.name)
+            if record.kind == 'struct':
+                nested.append((record.structTypeName, pointer))
+            elif record.kind != 'vector' and self.byteOrder != 'host':
+                record.member.formatSwap(swaps, pointer)
+        flags = [self.formatSwapMacro()] if swaps.getvalue() else []
+        flags.extend(_formatSwapFieldsMacro(typeName) for typeName, pointer in nested)
+        if not flags:
+            out.line('#define {0} 0'.format(macro))
+            return
+        out.line('#define {0} ({1})'.format(macro, ' || '.join(sorted(set(flags), key=flags.index))))
+        out.line('#if {0}'.format(macro))
+        out.line('static inline void {0}_swap_fields(void* image) {{'.format(self.typeName))
+        out.line('    uint8_t* bytes = image;')
+        self._formatSwapBlock(out, lambda block: block.write(swaps.getvalue()))
+        for typeName, pointer in nested:
+            _formatSwapFieldsCall(out, typeName, pointer)
+        out.line('}')
+        out.line('#endif')
+
+    def isCompact(self):
+        """True if any member uses an encoding other than fixed"""
+        return any(record.encoding != 'fixed' for record in self._records)
+
+    def isFixedSize(self):
+        """True if the serialized size of this structure is a compile time constant"""
+        return all(record.fixedSize for record in self._records) and not self.isCompact()
+
+    def formatSizeMacro(self, kind):
+        """The name of a size constant for this structure, e.g. POINT_FIXED_SIZE"""
+        return '{0}_{1}_SIZE'.format(self.typeName.upper(), kind)
+
+    def formatSize(self, out):
+        fixedMembers = [record for record in self._records if record.fixedSize and record.encoding == 'fixed']
+        vectorMembers = [record for record in self._records if not record.fixedSize and record.encoding == 'fixed']
+        compactMembers = [record for record in self._records if record.encoding != 'fixed']
+
+        # The constant part of the serialized size, which is all of it for
+        # fixed size structures
+        out.line('#define {0} ((size_t){1})'.format(self.formatSizeMacro('FIXED'), self._formatFixedSize([('fixed', fixedMembers)])))
+        if self.envelope != 'none':
+            # The bytes a frame adds around the serialized structure
+            out.line('#define {0}_TYPE_ID 0x{1:04x}'.format(self.typeName.upper(), self.typeId))
+            out.line('#define {0} (SERC_FRAME_HEADER_SIZE + SERC_{1}_SIZE)'.format(self.formatSizeMacro('ENVELOPE'), self.envelope.upper()))
+        if self.isFixedSize():
+            out.line('#define {0} {1}'.format(self.formatSizeMacro('SERIALIZED'), self.formatSizeMacro('FIXED')))
+        if self.hasWireLayout():
+            # The packed in-memory layout must be exactly the wire layout
+            out.line('_Static_assert(sizeof(struct {0}) == {1}, "struct {0} does not match its serialized size");'.format(self.typeName, self.formatSizeMacro('SERIALIZED')))
+            for record in self._records:
+                out.line('_Static_assert(offsetof(struct {0}, {1}) == ({2}), "struct {0} member {1} is not at its serialized offset");'.format(
+                    self.typeName, record.name, record.offset))
+
+        out.line('static inline size_t {0}_size(struct {0}* this) {{'.format(self.typeName))
+        if compactMembers:
+            # Compact members are sized by encoding each value's length
+            if vectorMembers:
+                out.line('    size_t size = {0} + ({1});'.format(self.formatSizeMacro('FIXED'), ' + '.join(record.size for record in vectorMembers)))
+            else:
+                out.line('    size_t size = {0};'.format(self.formatSizeMacro('FIXED')))
+            for record in compactMembers:
+                record.member.formatCompactSize(out, record.encoding)
+            out.line('    return size;')
+        elif vectorMembers:
+            out.line('    return {0} + ({1});'.format(self.formatSizeMacro('FIXED'), ' + '.join(record.size for record in vectorMembers)))
+        else:
+            out.line('    (void)this;')
+            out.line('    return {0};'.format(self.formatSizeMacro('SERIALIZED')))
+        out.line('}')
+
+    def formatAllocate(self, out):
+        if self.allocation == 'arena':
+            out.line('ssize_t {0}_allocate(struct serc_arena* arena, struct {0}** block) {{'.format(self.typeName))
+            out.line('    *block = serc_arena_alloc(arena, sizeof(struct {0}), _Alignof(struct {0}));'.format(self.typeName))
+        else:
+            out.line('ssize_t {0}_allocate(struct {0}** block) {{'.format(self.typeName))
+            out.line('    *block = malloc(sizeof(struct {0}));'.format(self.typeName))
+        out.line('    if (*block == NULL) {')
+        out.line('        return -1;')
+        out.line('    }')
+        out.line('    return sizeof(struct {0});'.format(self.typeName))
+        out.line('}')
+        out.line()
+
+    def formatConstructor(self, out):
         args = itertools.chain([('struct {0}*'.format(self.typeName), 'this')], itertools.chain.from_iterable(member.getRequiredArguments() for member in self._members))
         argsStr = map(_formatArgument, args)
-        print('int {0}_construct({1}) {{'.format(self.typeName, ', '.join(argsStr)))
+        out.line('int {0}_construct({1}) {{'.format(self.typeName, ', '.join(argsStr)))
         for member in self._members:
-            member.formatConstructor()
-        print('    return 0;')
-        print('}')
+            member.formatConstructor(out)
+        out.line('    return 0;')
+        out.line('}')
 
-    def formatNew(self):
-        args = itertools.chain([('struct {0}*'.format(self.typeName), 'this')], itertools.chain.from_iterable(member.getRequiredArguments() for member in self._members))
-        argsStr = map(_formatArgument, args)
+    def _formatNewArguments(self):
+        args = [('struct {0}**'.format(self.typeName), 'this_ptr')]
+        if self.allocation == 'arena':
+            args.insert(0, ('struct serc_arena*', 'arena'))
+        args.extend(itertools.chain.from_iterable(member.getRequiredArguments() for member in self._members))
+        return ', '.join(map(_formatArgument, args))
+
+    def formatNew(self, out):
+        if self.allocation != 'malloc':
+            self._formatSingleBlockNew(out)
+        else:
+            self._formatMallocNew(out)
+        if self.soa:
+            self._formatSoANew(out)
+
+    def _formatMallocNew(self, out):
+        """A <type>_new that allocates with <type>_allocate and then constructs"""
         rawArgs = itertools.chain.from_iterable(member.getRequiredArguments() for member in self._members)
-        constructorArgsStr = map(lambda arg: arg[1], rawArgs)
+        constructorArgsStr = ['*this_ptr'] + [arg[1] for arg in rawArgs]
         newStr = """ssize_t {0}_new({1}) {{
     ssize_t alloc_ret = {0}_allocate(this_ptr);
     if (alloc_ret < 0) {{
         return -1;
     }}
-    if ({0}_construct(*this_ptr, {2}) < 0) {{
+    if ({0}_construct({2}) < 0) {{
         return -1;
     }}
     return alloc_ret;
 }}
-""".format(self.typeName, ', '.join(argsStr), ', '.join(constructorArgsStr))
-        print(newStr)
+""".format(self.typeName, self._formatNewArguments(), ', '.join(constructorArgsStr))
+        out.line(newStr)
 
-    def formatSerializer(self):
-        print('int {0}_serialize(uint8_t* buffer, int max_length, struct {0}* this) {{'.format(self.typeName))
-        print('    size_t offset = 0;')
-        for member in self._members:
-            print('    memcpy(&(this->{0}), &(buffer[offset]), {1});'.format(member.name, member.formatSize()))
-            print('    offset += {0};'.format(member.formatSize()))
-            print()
-        print('    return 0;')
-        print('}')
+    def _formatInitialLength(self, member):
+        """
+        The list length of a vector member in terms of the constructor's
+        initial values, so it can be computed before anything is allocated
+        """
+        initialValues = {m.name: m.getInitialValue() for m in self._members}
+        def initialValue(match):
+            if match.group(1) not in initialValues:
+                raise SerCParseError('The list_length of "{0}" in "{1}" refers to an unknown member "{2}"'.format(member.name, self.typeName, match.group(1)))
+            return '({0})'.format(initialValues[match.group(1)])
+        return _THIS_MEMBER.sub(initialValue, str(member.listLength))
+
+    def _formatSingleBlockNew(self, out):
+        """
+        A <type>_new that computes the total size of the structure and all
+        of its vector payloads up front, then places them in one block
+        """
+        vectors = [record.member for record in self._records if not record.fixedSize]
+        out.line('ssize_t {0}_new({1}) {{'.format(self.typeName, self._formatNewArguments()))
+        out.line('    size_t total = sizeof(struct {0});'.format(self.typeName))
+        for member in vectors:
+            out.line('    size_t {0}_offset;'.format(member.name))
+        out.line('    uint8_t* block;')
+        out.line('    struct {0}* this;'.format(self.typeName))
+        out.line()
+        for member in vectors:
+            elementType = member.getDescriptor().element.cType
+            out.line('    total = SERC_ALIGN_UP(total, _Alignof({0}));'.format(elementType))
+            out.line('    {0}_offset = total;'.format(member.name))
+            out.line('    total += sizeof({0}) * ({1});'.format(elementType, self._formatInitialLength(member)))
+        out.line()
+        if self.allocation == 'arena':
+            out.line('    block = serc_arena_alloc(arena, total, _Alignof(max_align_t));')
+        else:
+            out.line('    block = malloc(total);')
+        out.line('    if (block == NULL) {')
+        out.line('        return -1;')
+        out.line('    }')
+        out.line('    this = (struct {0}*)block;'.format(self.typeName))
+        for member in vectors:
+            out.line('    this->{0} = ({1})(block + {0}_offset);'.format(member.name, member.getDescriptor().cType))
+            if member.getRequiredArguments():
+                # Vectors passed in as arguments are copied into the block
+                out.line('    if ({0} != NULL) {{'.format(member.getRequiredArguments()[0][1]))
+                out.line('        memcpy(this->{0}, {1}, sizeof({2}) * ({3}));'.format(member.name, member.getRequiredArguments()[0][1], member.getDescriptor().element.cType, self._formatInitialLength(member)))
+                out.line('    }')
+        for record in self._records:
+            if record.fixedSize:
+                record.member.formatConstructor(out)
+        out.line('    *this_ptr = this;')
+        out.line('    return total;')
+        out.line('}')
+        out.line()
+
+    def getMemberRuns(self):
+        """
+        Split the members into runs that can each be copied with a single
+        memcpy. Adjacent fixed size members are contiguous in the packed
+        structure and on the wire, so they are merged into one
+        ('fixed', [records]) run. Each vector gets its own ('vector', [record])
+        run, since its payload lives behind a pointer. Members of aligned
+        structures are not contiguous, so each gets a run of its own.
+        Members with a compact encoding get a ('compact', [record]) run,
+        which is encoded a value at a time.
+        """
+        runs = []
+        for record in self._records:
+            if record.encoding != 'fixed':
+                runs.append(('compact', [record]))
+            elif record.fixedSize:
+                if runs and runs[-1][0] == 'fixed' and self.layout == 'packed':
+                    runs[-1][1].append(record)
+                else:
+                    runs.append(('fixed', [record]))
+            else:
+                runs.append(('vector', [record]))
+        return runs
+
+    def _formatRunSize(self, members):
+        if len(members) == 1:
+            return members[0].size
+        return '({0})'.format(' + '.join(record.size for record in members))
+
+    def _formatFixedSize(self, runs):
+        """The constant size of every fixed run, or 0 if there are none"""
+        fixedMembers = [member for kind, members in runs if kind == 'fixed' for member in members]
+        return self._formatRunSize(fixedMembers) if fixedMembers else '0'
+
+    def _formatRunSwaps(self, out, members, target):
+        """
+        Swap the byte order of the members of a run after it has been
+        copied, either in the wire buffer at offset or in the structure
+        """
+        for record, pointer in self._iterRunPointers(members, target):
+            record.member.formatSwap(out, pointer)
+
+    def _iterRunPointers(self, members, target):
+        """Yield each member of a run with a pointer to it, in the wire buffer at offset or in the structure"""
+        runOffset = []
+        for record in members:
+            if target == 'buffer':
+                pointer = '&(buffer[offset{0}])'.format(''.join(' + ' + term for term in runOffset))
+            elif record.fixedSize:
+                pointer = '&(this->{0})'.format(record.name)
+            else:
+                pointer = 'this->{0}'.format(record.name)
+            yield record, pointer
+            runOffset.append(record.size)
+
+    def _formatNestedRunSwaps(self, out, members, target):
+        """
+        Swap the structures in a run that were copied as raw bytes, which
+        are nested structures in the packed layout and the elements of
+        vectors of structures in either layout
+        """
+        for record, pointer in self._iterRunPointers(members, target):
+            if record.kind == 'struct' and self.layout == 'packed':
+                _formatSwapFieldsCall(out, record.structTypeName, pointer)
+            elif record.kind == 'vector' and record.element is not None and record.element.kind == 'struct':
+                typeName = record.element.structTypeName
+                if target == 'buffer':
+                    element = '&(buffer[offset + i * sizeof(struct {0})])'.format(typeName)
+                else:
+                    element = '&(this->{0}[i])'.format(record.name)
+                out.line('#if {0}'.format(_formatSwapFieldsMacro(typeName)))
+                out.line('    for (size_t i = 0; i < (size_t)({0}); i++) {{'.format(record.listLength))
+                out.line('        {0}_swap_fields({1});'.format(typeName, element))
+                out.line('    }')
+                out.line('#endif')
+
+    def formatSerializer(self, out):
+        runs = self.getMemberRuns()
+
+        # Serialize into the buffer, checking that it is large enough once
+        out.line('ssize_t {0}_serialize(uint8_t* buffer, size_t max_length, struct {0}* this) {{'.format(self.typeName))
+        out.line('    size_t offset = 0;')
+        out.line('    if (max_length < {0}_size(this)) {{'.format(self.typeName))
+        out.line('        return -1;')
+        out.line('    }')
+        out.line()
+        self._formatSerializeRuns(out, runs)
+        out.line('    return offset;')
+        out.line('}')
+        out.line()
+
+        # Deserialize out of the buffer. The fixed part is checked up front,
+        # vector lengths are only known once the members before them are read.
+        # Compact members check each value as they decode it, and the fixed
+        # runs after them are checked again since they moved the offset.
+        # Without a fixed part there is nothing to check up front, and
+        # comparing the length to 0 would only trip -Wtype-limits.
+        out.line('ssize_t {0}_deserialize(const uint8_t* buffer, size_t length, struct {0}* this) {{'.format(self.typeName))
+        out.line('    size_t offset = 0;')
+        if self._formatFixedSize(runs) != '0':
+            out.line('    if (length < {0}) {{'.format(self.formatSizeMacro('FIXED')))
+            out.line('        return -1;')
+            out.line('    }')
+        out.line()
+        afterCompact = False
+        for index, (kind, members) in enumerate(runs):
+            runSize = self._formatRunSize(members)
+            if kind == 'compact':
+                members[0].member.formatCompactDeserialize(out, members[0].encoding)
+                out.line()
+                afterCompact = True
+                continue
+            if kind == 'fixed' and afterCompact:
+                out.line('    if (length - offset < {0}) {{'.format(runSize))
+                out.line('        return -1;')
+                out.line('    }')
+            if members[0].kind == 'struct' and self.layout == 'aligned':
+                out.line('    {0}_deserialize(&(buffer[offset]), length - offset, &(this->{1}));'.format(members[0].structTypeName, members[0].name))
+            elif kind == 'fixed':
+                out.line('    memcpy(&(this->{0}), &(buffer[offset]), {1});'.format(members[0].name, runSize))
+            else:
+                out.line('    if (length - offset < {0} + {1}) {{'.format(runSize, self._formatFixedSize(runs[index + 1:])))
+                out.line('        return -1;')
+                out.line('    }')
+                out.line('    memcpy(this->{0}, &(buffer[offset]), {1});'.format(members[0].name, runSize))
+            self._formatSwapBlock(out, lambda swaps: self._formatRunSwaps(swaps, members, 'this'))
+            self._formatNestedRunSwaps(out, members, 'this')
+            out.line('    offset += {0};'.format(runSize))
+            out.line()
+        out.line('    return offset;')
+        out.line('}')
+
+        if self.envelope != 'none':
+            out.line()
+            self._formatFrame(out)
+
+    def _formatSerializeRuns(self, out, runs, crcName=None):
+        """
+        Write each run into the buffer at offset. If crcName is given, the
+        CRC in crc is updated with each run as soon as it is written, while
+        it is still in cache, so framing takes no second pass.
+        """
+        for kind, members in runs:
+            runSize = self._formatRunSize(members)
+            if kind == 'compact':
+                if crcName is not None:
+                    out.line('    start = offset;')
+                members[0].member.formatCompactSerialize(out, members[0].encoding)
+                if crcName is not None:
+                    out.line('    crc = serc_{0}_update(crc, &(buffer[start]), offset - start);'.format(crcName))
+                out.line()
+                continue
+            if members[0].kind == 'struct' and self.layout == 'aligned':
+                out.line('    {0}_serialize(&(buffer[offset]), max_length - offset, &(this->{1}));'.format(members[0].structTypeName, members[0].name))
+            elif kind == 'fixed':
+                out.line('    memcpy(&(buffer[offset]), &(this->{0}), {1});'.format(members[0].name, runSize))
+            else:
+                out.line('    memcpy(&(buffer[offset]), this->{0}, {1});'.format(members[0].name, runSize))
+            self._formatSwapBlock(out, lambda swaps: self._formatRunSwaps(swaps, members, 'buffer'))
+            self._formatNestedRunSwaps(out, members, 'buffer')
+            if crcName is not None:
+                out.line('    crc = serc_{0}_update(crc, &(buffer[offset]), {1});'.format(crcName, runSize))
+            out.line('    offset += {0};'.format(runSize))
+            out.line()
+
+    def _formatFrame(self, out):
+        """
+        Serialize into and deserialize out of a frame envelope. See the
+        frame support code for the layout of a frame.
+        """
+        crcName = self.envelope
+        crcType = 'uint16_t' if crcName == 'crc16' else 'uint32_t'
+        crcMacro = 'SERC_{0}'.format(crcName.upper())
+        typeIdMacro = '{0}_TYPE_ID'.format(self.typeName.upper())
+        envelopeSize = self.formatSizeMacro('ENVELOPE')
+
+        out.line('ssize_t {0}_serialize_frame(uint8_t* buffer, size_t max_length, struct {0}* this) {{'.format(self.typeName))
+        out.line('    size_t length = {0}_size(this);'.format(self.typeName))
+        out.line('    size_t offset = SERC_FRAME_HEADER_SIZE;')
+        if self.isCompact():
+            out.line('    size_t start;')
+        out.line('    {0} crc;'.format(crcType))
+        out.line('    if (max_length < {0} || max_length - {0} < length || length > UINT32_MAX) {{'.format(envelopeSize))
+        out.line('        return -1;')
+        out.line('    }')
+        out.line()
+        out.line('    serc_frame_write_header(buffer, SERC_FRAME_{0}, {1}, (uint32_t)length);'.format(crcName.upper(), typeIdMacro))
+        out.line('    crc = serc_{0}_update({1}_INIT, buffer, SERC_FRAME_HEADER_SIZE);'.format(crcName, crcMacro))
+        out.line()
+        self._formatSerializeRuns(out, self.getMemberRuns(), crcName)
+        out.line('    serc_store_le(&(buffer[offset]), crc ^ {0}_XOROUT, {0}_SIZE);'.format(crcMacro))
+        out.line('    return offset + {0}_SIZE;'.format(crcMacro))
+        out.line('}')
+        out.line()
+
+        # The whole frame is checked before anything is deserialized
+        out.line('ssize_t {0}_deserialize_frame(const uint8_t* buffer, size_t length, struct {0}* this) {{'.format(self.typeName))
+        out.line('    uint16_t type_id;')
+        out.line('    size_t payload_length;')
+        out.line('    ssize_t frame_length = serc_frame_check(buffer, length, length, &type_id, &payload_length);')
+        out.line('    if (frame_length <= 0 || buffer[1] != SERC_FRAME_{0} || type_id != {1}) {{'.format(crcName.upper(), typeIdMacro))
+        out.line('        return -1;')
+        out.line('    }')
+        out.line('    if ({0}_deserialize(&(buffer[SERC_FRAME_HEADER_SIZE]), payload_length, this) != (ssize_t)payload_length) {{'.format(self.typeName))
+        out.line('        return -1;')
+        out.line('    }')
+        out.line('    return frame_length;')
+        out.line('}')
+
+    def _formatBulkSwaps(self, out, base):
+        """Swap the byte order of every member of count fixed size records at base"""
+        swaps = SerCEmitter()
+        for record in self._records:
+            offset = '' if record.offset == '0' else ' + ' + record.offset
+            record.member.formatSwap(swaps, '&({0}[i * {1}{2}])'.format(base, self.formatSizeMacro('SERIALIZED'), offset), '        ')
+        if swaps.getvalue():
+            out.line('    for (size_t i = 0; i < count; i++) {')
+            out.write(swaps.getvalue())
+            out.line('    }')
+
+    def _formatBulkNestedSwaps(self, out, base):
+        """Swap the structures nested in count fixed size records at base"""
+        for record in self._records:
+            if record.kind != 'struct':
+                continue
+            offset = '' if record.offset == '0' else ' + ' + record.offset
+            out.line('#if {0}'.format(_formatSwapFieldsMacro(record.structTypeName)))
+            out.line('    for (size_t i = 0; i < count; i++) {')
+            out.line('        {0}_swap_fields(&({1}[i * {2}{3}]));'.format(record.structTypeName, base, self.formatSizeMacro('SERIALIZED'), offset))
+            out.line('    }')
+            out.line('#endif')
+
+    def formatBatch(self, out):
+        """
+        Serialize and deserialize arrays of structures. Fixed size packed
+        structures have the same layout in memory as on the wire, so a whole
+        array is one bulk copy. Other structures loop over the single item
+        functions.
+        """
+        runs = self.getMemberRuns()
+
+        out.line('ssize_t {0}_serialize_many(uint8_t* buffer, size_t max_length, struct {0}* items, size_t count) {{'.format(self.typeName))
+        if self.hasWireLayout():
+            out.line('    if (count > max_length / {0}) {{'.format(self.formatSizeMacro('SERIALIZED')))
+            out.line('        return -1;')
+            out.line('    }')
+            out.line('    memcpy(buffer, items, count * {0});'.format(self.formatSizeMacro('SERIALIZED')))
+            self._formatSwapBlock(out, lambda swaps: self._formatBulkSwaps(swaps, 'buffer'))
+            self._formatBulkNestedSwaps(out, 'buffer')
+            out.line('    return count * {0};'.format(self.formatSizeMacro('SERIALIZED')))
+        else:
+            out.line('    size_t offset = 0;')
+            out.line('    for (size_t i = 0; i < count; i++) {')
+            out.line('        ssize_t written = {0}_serialize(&(buffer[offset]), max_length - offset, &(items[i]));'.format(self.typeName))
+            out.line('        if (written < 0) {')
+            out.line('            return -1;')
+            out.line('        }')
+            out.line('        offset += written;')
+            out.line('    }')
+            out.line('    return offset;')
+        out.line('}')
+        out.line()
+
+        out.line('ssize_t {0}_deserialize_many(const uint8_t* buffer, size_t length, struct {0}* items, size_t count) {{'.format(self.typeName))
+        if self.hasWireLayout():
+            out.line('    if (count > length / {0}) {{'.format(self.formatSizeMacro('SERIALIZED')))
+            out.line('        return -1;')
+            out.line('    }')
+            out.line('    memcpy(items, buffer, count * {0});'.format(self.formatSizeMacro('SERIALIZED')))
+            self._formatSwapBlock(out, lambda swaps: self._formatBulkSwaps(swaps, '((uint8_t*)items)'))
+            self._formatBulkNestedSwaps(out, '((uint8_t*)items)')
+            out.line('    return count * {0};'.format(self.formatSizeMacro('SERIALIZED')))
+        else:
+            out.line('    size_t offset = 0;')
+            out.line('    for (size_t i = 0; i < count; i++) {')
+            out.line('        ssize_t read = {0}_deserialize(&(buffer[offset]), length - offset, &(items[i]));'.format(self.typeName))
+            out.line('        if (read < 0) {')
+            out.line('            return -1;')
+            out.line('        }')
+            out.line('        offset += read;')
+            out.line('    }')
+            out.line('    return offset;')
+        out.line('}')
+        out.line()
+
+        if self.soa:
+            self._formatSoABatch(out)
+
+        # Scatter-gather: point iovecs straight at the structures and their
+        # vector payloads so writev can send them without a staging copy
+        out.line('ssize_t {0}_serialize_iov(struct {0}* items, size_t count, struct iovec* iov, size_t max_iov) {{'.format(self.typeName))
+        if self.layout == 'aligned' or self.isCompact():
+            # Aligned and compact items are never in their wire layout, so
+            # they cannot be sent in place
+            out.line('    (void)items;')
+            out.line('    (void)iov;')
+            out.line('    (void)max_iov;')
+            out.line('    return count == 0 ? 0 : -1;')
+            out.line('}')
+            return
+        # Items can only be sent in place when they, the structures nested
+        # in them and the elements of their vectors of structures are
+        # already in wire byte order
+        swapFlags = [self.formatSwapMacro()] if self.byteOrder != 'host' else []
+        for record in self._records:
+            if record.kind == 'struct':
+                swapFlags.append(_formatSwapFieldsMacro(record.structTypeName))
+            elif record.kind == 'vector' and record.element is not None and record.element.kind == 'struct':
+                swapFlags.append(_formatSwapFieldsMacro(record.element.structTypeName))
+        if swapFlags:
+            out.line('#if {0}'.format(' || '.join(sorted(set(swapFlags), key=swapFlags.index))))
+            out.line('    (void)items;')
+            out.line('    (void)iov;')
+            out.line('    (void)max_iov;')
+            out.line('    return count == 0 ? 0 : -1;')
+            out.line('#else')
+        if self.isFixedSize():
+            out.line('    if (count == 0) {')
+            out.line('        return 0;')
+            out.line('    }')
+            out.line('    if (max_iov < 1) {')
+            out.line('        return -1;')
+            out.line('    }')
+            out.line('    iov[0].iov_base = items;')
+            out.line('    iov[0].iov_len = count * {0};'.format(self.formatSizeMacro('SERIALIZED')))
+            out.line('    return 1;')
+        else:
+            out.line('    size_t used = 0;')
+            out.line('    if (count > max_iov / {0}) {{'.format(len(runs)))
+            out.line('        return -1;')
+            out.line('    }')
+            out.line('    for (size_t i = 0; i < count; i++) {')
+            out.line('        struct {0}* this = &(items[i]);'.format(self.typeName))
+            for kind, members in runs:
+                if kind == 'fixed':
+                    out.line('        iov[used].iov_base = &(this->{0});'.format(members[0].name))
+                else:
+                    out.line('        iov[used].iov_base = this->{0};'.format(members[0].name))
+                out.line('        iov[used].iov_len = {0};'.format(self._formatRunSize(members)))
+                out.line('        used++;')
+            out.line('    }')
+            out.line('    return used;')
+        if swapFlags:
+            out.line('#endif')
+        out.line('}')
+
+    def formatView(self, out):
+        """
+        Zero copy accessors that read members straight out of a serialized
+        buffer. Scalars are loaded with a constant size memcpy, which is
+        safe for unaligned data and compiles down to a single load. Vectors
+        and nested structures return a pointer into the buffer. Offsets are
+        unknown past the first compact member, so views stop there. They
+        also stop at a vector whose list_length reads a member nested more
+        than one structure deep, which has no view to read it through.
+        """
+        viewPrefix = '{0}_view_'.format(self.typeName)
+        structTypeNames = {record.name: record.structTypeName for record in self._records if record.kind == 'struct'}
+
+        def viewMember(match):
+            # Read a member from the buffer instead of from a struct, and a
+            # field of a nested structure through that structure's view
+            name, fields = match.group(1), match.group(2)
+            view = '{0}{1}(buffer)'.format(viewPrefix, name)
+            if fields:
+                view = '{0}_view_{1}({2})'.format(structTypeNames[name], fields[1:], view)
+            return view
+
+        def viewLength(member):
+            """The list length read from the buffer, or None if it cannot be"""
+            for name, fields in _THIS_MEMBER_FIELDS.findall(str(member.listLength)):
+                if fields and (name not in structTypeNames or fields.count('.') > 1):
+                    return None
+            return _THIS_MEMBER_FIELDS.sub(viewMember, str(member.listLength))
+
+        offsetTerms = []
+        for record in self._records:
+            if record.encoding != 'fixed':
+                return
+            member = record.member
+            offset = ' + '.join(offsetTerms) if offsetTerms else '0'
+            if record.kind == 'vector':
+                if viewLength(member) is None:
+                    return
+                elementType = record.element.cType
+                out.line('static inline const uint8_t* {0}{1}(const uint8_t* buffer, size_t* count) {{'.format(viewPrefix, member.name))
+                out.line('    *count = {0};'.format(viewLength(member)))
+                out.line('    return buffer + {0};'.format(offset))
+                out.line('}')
+                out.line()
+                out.line('static inline {0} {1}{2}_at(const uint8_t* buffer, size_t index) {{'.format(elementType, viewPrefix, member.name))
+                out.line('    {0} value;'.format(elementType))
+                out.line('    memcpy(&value, buffer + {0} + index * sizeof(value), sizeof(value));'.format(offset))
+                self._formatSwapBlock(out, lambda swaps: member.getElementType().formatSwap(swaps, '&value'))
+                if record.element.kind == 'struct':
+                    _formatSwapFieldsCall(out, record.element.structTypeName, '&value')
+                out.line('    return value;')
+                out.line('}')
+                offsetTerms.append('(sizeof({0}) * ({1}))'.format(elementType, viewLength(member)))
+            elif record.structFormat is None:
+                out.line('static inline const uint8_t* {0}{1}(const uint8_t* buffer) {{'.format(viewPrefix, member.name))
+                out.line('    return buffer + {0};'.format(offset))
+                out.line('}')
+                offsetTerms.append(record.size)
+            else:
+                out.line('static inline {0} {1}{2}(const uint8_t* buffer) {{'.format(record.cType, viewPrefix, member.name))
+                out.line('    {0} value;'.format(record.cType))
+                out.line('    memcpy(&value, buffer + {0}, sizeof(value));'.format(offset))
+                self._formatSwapBlock(out, lambda swaps: member.formatSwap(swaps, '&value'))
+                out.line('    return value;')
+                out.line('}')
+                offsetTerms.append(record.size)
+            out.line()
+
+        # The total serialized size, as read from the buffer
+        out.line('static inline size_t {0}size(const uint8_t* buffer) {{'.format(viewPrefix))
+        out.line('    (void)buffer;')
+        out.line('    return {0};'.format(' + '.join(offsetTerms) if offsetTerms else '0'))
+        out.line('}')
+
+        if self.soa:
+            out.line()
+            self._formatSoAAccessors(out)
+
+    def formatSoATypeName(self):
+        """The name of the structure of arrays companion of this structure"""
+        return '{0}_soa'.format(self.typeName)
+
+    def _formatSoADeclaration(self, out):
+        """
+        The structure of arrays companion. Each member gets a column of
+        capacity values, and count of them are in use.
+        """
+        out.line('/* {0} as a structure of arrays, with one column of up to capacity values per member */'.format(self.typeName))
+        out.line('struct {0} {{'.format(self.formatSoATypeName()))
+        out.line('    size_t capacity;')
+        out.line('    size_t count;')
+        for record in self._records:
+            out.line('    {0}* {1};'.format(record.cType, record.name))
+        out.line('};')
+
+    def _formatSoANew(self, out):
+        """
+        <type>_soa_new, which places the companion and all of its columns
+        in one block, with every column on its own SERC_SOA_ALIGNMENT boundary
+        """
+        soaName = self.formatSoATypeName()
+        args = [('struct {0}**'.format(soaName), 'this_ptr'), ('size_t', 'capacity')]
+        if self.allocation == 'arena':
+            args.insert(0, ('struct serc_arena*', 'arena'))
+        out.line('ssize_t {0}_new({1}) {{'.format(soaName, ', '.join(map(_formatArgument, args))))
+        out.line('    size_t total = SERC_ALIGN_UP(sizeof(struct {0}), SERC_SOA_ALIGNMENT);'.format(soaName))
+        for record in self._records:
+            out.line('    size_t {0}_offset;'.format(record.name))
+        out.line('    uint8_t* block;')
+        out.line('    struct {0}* this;'.format(soaName))
+        out.line()
+        # Every column is at most the size of the whole structure, which
+        # leaves headroom for the alignment padding
+        out.line('    if (capacity > SIZE_MAX / 2 / {0} / sizeof(struct {1})) {{'.format(len(self._records), self.typeName))
+        out.line('        return -1;')
+        out.line('    }')
+        for record in self._records:
+            out.line('    {0}_offset = total;'.format(record.name))
+            out.line('    total = SERC_ALIGN_UP(total + sizeof({0}) * capacity, SERC_SOA_ALIGNMENT);'.format(record.cType))
+        out.line()
+        if self.allocation == 'arena':
+            out.line('    block = serc_arena_alloc(arena, total, SERC_SOA_ALIGNMENT);')
+        else:
+            out.line('    block = aligned_alloc(SERC_SOA_ALIGNMENT, total);')
+        out.line('    if (block == NULL) {')
+        out.line('        return -1;')
+        out.line('    }')
+        out.line('    this = (struct {0}*)block;'.format(soaName))
+        out.line('    this->capacity = capacity;')
+        out.line('    this->count = 0;')
+        for record in self._records:
+            out.line('    this->{0} = ({1}*)(block + {0}_offset);'.format(record.name, record.cType))
+        out.line('    *this_ptr = this;')
+        out.line('    return total;')
+        out.line('}')
+        out.line()
+
+    def _formatSoABatch(self, out):
+        """
+        Convert between the companion and count back to back structures in
+        the wire format. Each column is gathered from or scattered to its
+        offset in every record in turn, so the columns are read and written
+        sequentially.
+        """
+        soaName = self.formatSoATypeName()
+        recordSize = self.formatSizeMacro('SERIALIZED')
+
+        out.line('ssize_t {0}_from_wire(struct {0}* this, const uint8_t* buffer, size_t length, size_t count) {{'.format(soaName))
+        out.line('    if (count > this->capacity || count > length / {0}) {{'.format(recordSize))
+        out.line('        return -1;')
+        out.line('    }')
+        for record in self._records:
+            wire = '&(buffer[i * {0} + {1}])'.format(recordSize, record.offset)
+            out.line('    for (size_t i = 0; i < count; i++) {')
+            if record.kind == 'struct' and self.layout == 'aligned':
+                out.line('        {0}_deserialize({1}, {2}, &(this->{3}[i]));'.format(record.structTypeName, wire, record.size, record.name))
+            else:
+                out.line('        memcpy(&(this->{0}[i]), {1}, {2});'.format(record.name, wire, record.size))
+                if record.kind == 'struct':
+                    _formatSwapFieldsCall(out, record.structTypeName, '&(this->{0}[i])'.format(record.name), '        ')
+            out.line('    }')
+            if record.descriptor.swapSize is not None:
+                self._formatSwapBlock(out, lambda swaps: swaps.line('    serc_swap_array(this->{0}, {1}, count);'.format(record.name, record.descriptor.swapSize)))
+        out.line('    this->count = count;')
+        out.line('    return count * {0};'.format(recordSize))
+        out.line('}')
+        out.line()
+
+        out.line('ssize_t {0}_to_wire(const struct {0}* this, uint8_t* buffer, size_t max_length) {{'.format(soaName))
+        out.line('    size_t count = this->count;')
+        out.line('    if (count > max_length / {0}) {{'.format(recordSize))
+        out.line('        return -1;')
+        out.line('    }')
+        for record in self._records:
+            wire = '&(buffer[i * {0} + {1}])'.format(recordSize, record.offset)
+            out.line('    for (size_t i = 0; i < count; i++) {')
+            if record.kind == 'struct' and self.layout == 'aligned':
+                out.line('        {0}_serialize({1}, {2}, &(this->{3}[i]));'.format(record.structTypeName, wire, record.size, record.name))
+            else:
+                out.line('        memcpy({0}, &(this->{1}[i]), {2});'.format(wire, record.name, record.size))
+                self._formatSwapBlock(out, lambda swaps: record.member.formatSwap(swaps, wire, '        '))
+                if record.kind == 'struct':
+                    _formatSwapFieldsCall(out, record.structTypeName, wire, '        ')
+            out.line('    }')
+        out.line('    return count * {0};'.format(recordSize))
+        out.line('}')
+        out.line()
+
+    def _formatSoAAccessors(self, out):
+        """
+        Column accessors, which tell the compiler the columns are aligned
+        so loops over them vectorize, and row accessors that copy one
+        structure in or out
+        """
+        soaName = self.formatSoATypeName()
+        for record in self._records:
+            out.line('static inline {0}* {1}_{2}(const struct {1}* this) {{'.format(record.cType, soaName, record.name))
+            out.line('    return __builtin_assume_aligned(this->{0}, SERC_SOA_ALIGNMENT);'.format(record.name))
+            out.line('}')
+            out.line()
+
+        out.line('static inline void {0}_get(const struct {0}* this, size_t index, struct {1}* item) {{'.format(soaName, self.typeName))
+        for record in self._records:
+            out.line('    item->{0} = this->{0}[index];'.format(record.name))
+        out.line('}')
+        out.line()
+        out.line('static inline void {0}_set(struct {0}* this, size_t index, const struct {1}* item) {{'.format(soaName, self.typeName))
+        for record in self._records:
+            out.line('    this->{0}[index] = item->{0};'.format(record.name))
+        out.line('}')
+
+    def renderSections(self, hooks=None):
+        """
+        Render every section of generated code for this structure in a
+        single pass. Returns a dictionary of section name to the text for
+        that section, in the order given by SECTIONS. If hooks is given it
+        is told how long each section took to render.
+        """
+        sections = {}
+        for sectionName, formatFunction in self.sectionFormatters():
+            out = SerCEmitter()
+            if hooks is None:
+                formatFunction(out)
+            else:
+                startTime = time.perf_counter()
+                formatFunction(out)
+                hooks.onPhase('emit.' + sectionName, time.perf_counter() - startTime)
+            if sectionName != 'prototype':
+                out.line()
+            sections[sectionName] = out.getvalue()
+        return sections
+
+    def sectionFormatters(self):
+        """The format function for each section, in emission order"""
+        return [
+            ('prototype', self.formatPrototype),
+            ('declaration', self.formatDeclaration),
+            ('size', self.formatSize),
+            ('allocate', self.formatAllocate),
+            ('constructor', self.formatConstructor),
+            ('new', self.formatNew),
+            ('serializer', self.formatSerializer),
+            ('batch', self.formatBatch),
+            ('view', self.formatView),
+        ]
 
     def parseMember(self, node):
         """ Parse a given member variable of a struct in parsed JSON """
@@ -130,17 +1068,60 @@ class JsonToCSerializer(object):
     a .read() method) to JSON formated text containing a description of the
     C structure to create basic serializer/deserializer and basic
     constructor/destructor for.
+
+    The generated code is written to out, which can be anything with a
+    .write() method. It defaults to stdout. If a SerCSectionCache is given,
+    structures whose spec has not changed are spliced in from the cache
+    instead of being rendered again. defaults holds structure options,
+    like allocation, for structures that do not set them in the spec.
+    hooks is an optional SerCHooks that is called back with the time
+    taken by each phase of generation. If roots is a list of type names,
+    only those structures and the structures they depend on are generated.
     """
-    def __init__(self, fd):
+    # How many characters of each section stream() keeps in memory before
+    # spilling it to a temporary file
+    STREAM_SPOOL_SIZE = 1024 * 1024
+
+    def __init__(self, fd, out=None, cache=None, defaults=None, hooks=None, roots=None):
         super().__init__()
         self._fd = fd
+        self._out = out
+        self._cache = cache
+        self._defaults = defaults if defaults is not None else {}
+        self._hooks = hooks
+        self._roots = roots
+        self._graph = None
         self._structures = {}
+        self._cacheKeys = {}
         self._parsedJson = None
 
+    def getStructures(self):
+        """
+        Get the parsed structures, keyed by type name, in the order they
+        are generated in. This is the spec order, except that structures
+        come after the structures they depend on.
+        """
+        return self._structures
+
+    def getGraph(self):
+        """Get the SerCDependencyGraph of the parsed structures"""
+        return self._graph
+
     def parse(self):
-        """Parse the file into internal state"""
+        """Parse the file into internal state and emit the generated code"""
+        self.parseStructures()
+        self.emit(self._out if self._out is not None else sys.stdout)
+
+    def parseStructures(self):
+        """Parse the file into internal state without generating any code"""
         # Parse the raw JSON
-        self._parsedJson = json.load(self._fd)
+        startTime = time.perf_counter()
+        try:
+            self._parsedJson = json.load(self._fd)
+        except ValueError as e:
+            raise SerCParseError('Invalid spec: malformed JSON, {0}'.format(e))
+        if self._hooks is not None:
+            self._hooks.onPhase('json.load', time.perf_counter() - startTime)
 
         # Get out the list of structures and parse each one in turn
         if 'struct_list' not in self._parsedJson or not isinstance(self._parsedJson['struct_list'], list):
@@ -148,56 +1129,269 @@ class JsonToCSerializer(object):
         
         # Parse each structure in order
         for structNode in self._parsedJson['struct_list']:
-            newStruct = SerCStructure(structNode)
+            startTime = time.perf_counter()
+            newStruct = self.parseStructure(structNode)
+            if newStruct.typeName in self._structures:
+                raise SerCParseError('Structure "{0}" is defined more than once'.format(newStruct.typeName))
             self._structures[newStruct.typeName] = newStruct
+            if self._cache is not None:
+                self._cacheKeys[newStruct.typeName] = self._cache.key(structNode, newStruct, self._defaults)
+            if self._hooks is not None:
+                self._hooks.onPhase('parse', time.perf_counter() - startTime)
+                self._hooks.onStructure(newStruct)
+
+        # Put structures after the ones they depend on, dropping the ones
+        # the roots do not need
+        startTime = time.perf_counter()
+        self._graph = SerCDependencyGraph(self._structures)
+        typeNames = self._graph.reachable(self._roots) if self._roots is not None else None
+        self._structures = {typeName: self._structures[typeName] for typeName in self._graph.order(typeNames)}
+        layouts = {typeName: (structure.layout, structure.isFixedSize(), structure.isCompact(), structure.byteOrder) for typeName, structure in self._structures.items()}
+        typeIds = {}
+        for structure in self._structures.values():
+            self._checkNesting(structure, layouts)
+            self._checkTypeId(structure, typeIds)
+        if self._hooks is not None:
+            self._hooks.onPhase('graph', time.perf_counter() - startTime)
+
+    def _checkNesting(self, structure, layouts, deferred=None):
+        """
+        Check that the structures nested in a structure can be copied the
+        way its layout copies them. layouts maps the type name of each
+        structure to its layout, whether it is fixed size, whether it is
+        compact and its byte order. Packed structures copy nested ones as
+        raw bytes, which is only their wire format if they are packed and
+        fixed size, and swap them with <type>_swap_fields. Aligned
+        structures serialize nested ones by their fixed size. Vectors copy
+        their elements as raw bytes in either layout. Nested structures
+        keep their own byte order, so one in the host byte order would
+        make a structure with a wire byte order depend on the host.
+        Vector elements that are not in layouts yet are appended to
+        deferred as (type name, byte order, member name, element type
+        name), to be checked with _checkElement once they are.
+        """
+        for record in structure.getRecords():
+            if record.kind == 'vector' and record.element is not None and record.element.structTypeName is not None:
+                if record.element.structTypeName in layouts:
+                    self._checkElement(structure.typeName, structure.byteOrder, record.name, record.element.structTypeName, layouts)
+                elif deferred is not None:
+                    deferred.append((structure.typeName, structure.byteOrder, record.name, record.element.structTypeName))
+                continue
+            if record.kind != 'struct' or record.structTypeName not in layouts:
+                continue
+            layout, fixedSize, compact, byteOrder = layouts[record.structTypeName]
+            if structure.byteOrder != 'host' and byteOrder == 'host':
+                raise SerCParseError('Structure "{0}" has the {1} byte order, so it cannot contain "{2}", which has the host byte order. Give "{2}" a byte order too'.format(
+                    structure.typeName, structure.byteOrder, record.structTypeName))
+            if structure.layout == 'packed' and layout != 'packed':
+                raise SerCParseError('Packed structure "{0}" cannot contain "{1}", which has the {2} layout'.format(structure.typeName, record.structTypeName, layout))
+            if structure.layout == 'packed' and compact:
+                raise SerCParseError('Packed structure "{0}" cannot contain "{1}", which has a compact encoding'.format(structure.typeName, record.structTypeName))
+            if structure.layout == 'packed' and not fixedSize:
+                raise SerCParseError('Packed structure "{0}" cannot contain "{1}", which is not fixed size'.format(structure.typeName, record.structTypeName))
+            if structure.layout == 'aligned' and not fixedSize:
+                raise SerCParseError('Aligned structure "{0}" cannot contain "{1}", which is not fixed size'.format(structure.typeName, record.structTypeName))
+
+    def _checkElement(self, typeName, structByteOrder, memberName, elementTypeName, layouts):
+        """
+        Check that the structure elementTypeName can be a vector element of
+        typeName, which has the byte order structByteOrder. Elements are
+        copied as raw bytes and swapped with <type>_swap_fields.
+        """
+        layout, fixedSize, compact, byteOrder = layouts[elementTypeName]
+        if layout != 'packed' or compact:
+            raise SerCParseError('Vector "{0}" of "{1}" cannot hold "{2}", vector elements are copied as raw bytes so they must be packed and not compact'.format(
+                memberName, typeName, elementTypeName))
+        if structByteOrder != 'host' and byteOrder == 'host':
+            raise SerCParseError('Vector "{0}" of "{1}", which has the {2} byte order, cannot hold "{3}", which has the host byte order. Give "{3}" a byte order too'.format(
+                memberName, typeName, structByteOrder, elementTypeName))
+
+    def _checkTypeId(self, structure, typeIds):
+        """
+        Check that a structure with an envelope has a type ID that no
+        earlier one has. typeIds maps the type IDs seen so far to their
+        type names, and is updated.
+        """
+        if structure.envelope == 'none':
+            return
+        if structure.typeId in typeIds:
+            raise SerCParseError('Structures "{0}" and "{1}" have the same type_id 0x{2:04x}, set a different type_id on one of them'.format(
+                typeIds[structure.typeId], structure.typeName, structure.typeId))
+        typeIds[structure.typeId] = structure.typeName
+
+    def stream(self, sink):
+        """
+        Parse and emit the spec one structure at a time, for specs too
+        large to hold in memory. Each struct_list entry is read
+        incrementally, parsed, rendered into a spooled temporary file per
+        section and then dropped, so memory use scales with the largest
+        structure rather than the whole spec. A structure that nests one
+        later in the spec is held back until that one has been rendered.
+        The output is the same as parse() when every structure comes after
+        the structures it refers to. Otherwise the same code is written in
+        a different order, since parse() also moves vector element
+        structures first and orders vector cycles by its own traversal,
+        while streaming keeps them in spec order.
+        Nothing is kept for getStructures(), and roots are not supported.
+        Returns the number of characters written to sink.
+        """
+        # Only streaming needs temporary files
+        import tempfile
+
+        if self._roots is not None:
+            raise SerCParseError('Roots cannot be used when streaming, since the whole spec is needed to find what they depend on')
+
+        sectionSinks = {sectionName: tempfile.SpooledTemporaryFile(self.STREAM_SPOOL_SIZE, mode='w+') for sectionName in SECTIONS}
+        try:
+            requiredHeaders, requiredSupport = self._streamSections(sectionSinks)
 
-        # Format and print the required headers
+            startTime = time.perf_counter()
+            out = SerCEmitter(sink)
+            out.write(''.join('#include <{0}>\n'.format(header) for header in sorted(requiredHeaders)) + '\n')
+            if requiredSupport:
+                out.write(formatSupport(requiredSupport))
+            for sectionName in SECTIONS:
+                sectionSink = sectionSinks[sectionName]
+                sectionSink.seek(0)
+                for chunk in iter(lambda: sectionSink.read(SerCEmitter.DEFAULT_CHUNK_SIZE), ''):
+                    out.write(chunk)
+                out.write('\n')
+            out.flush()
+        finally:
+            for sectionSink in sectionSinks.values():
+                sectionSink.close()
+
+        if self._cache is not None:
+            self._cache.prune()
+        if self._hooks is not None:
+            self._hooks.onPhase('emit', time.perf_counter() - startTime)
+            self._hooks.onEmit(out.charsEmitted)
+        return out.charsEmitted
+
+    def _streamSections(self, sectionSinks):
+        """
+        Render every structure of the spec into the section sinks as it is
+        read. Returns the headers and support code that they need.
+        """
+        requiredHeaders = set()
+        requiredSupport = set()
+        layouts = {}
+        typeIds = {}
+        referenced = set()
+        deferredElements = []
+        # Structures held back until the structures they nest are rendered,
+        # keyed by type name, and the held back names waiting on each name
+        pending = {}
+        waiting = {}
+
+        for structNode in iterStructList(self._fd):
+            startTime = time.perf_counter()
+            structure = self.parseStructure(structNode)
+            if structure.typeName in layouts or structure.typeName in pending:
+                raise SerCParseError('Structure "{0}" is defined more than once'.format(structure.typeName))
+            if self._hooks is not None:
+                self._hooks.onPhase('parse', time.perf_counter() - startTime)
+                self._hooks.onStructure(structure)
+
+            dependencies = getDependencies(structure)
+            referenced.update(typeName for typeName, nested in dependencies)
+            missing = set(typeName for typeName, nested in dependencies if nested and typeName not in layouts)
+            if missing:
+                pending[structure.typeName] = (structure, structNode, missing)
+                for typeName in missing:
+                    waiting.setdefault(typeName, []).append(structure.typeName)
+                continue
+
+            ready = [(structure, structNode)]
+            while ready:
+                structure, structNode = ready.pop(0)
+                self._checkNesting(structure, layouts, deferredElements)
+                self._checkTypeId(structure, typeIds)
+                if self._cache is not None:
+                    self._cacheKeys[structure.typeName] = self._cache.key(structNode, structure, self._defaults)
+                sections = self.renderStructure(structure)
+                self._cacheKeys.pop(structure.typeName, None)
+                for sectionName in SECTIONS:
+                    sectionSinks[sectionName].write(sections[sectionName])
+                requiredHeaders.update(structure.getRequiredHeaders())
+                requiredSupport.update(structure.getRequiredSupport())
+                layouts[structure.typeName] = (structure.layout, structure.isFixedSize(), structure.isCompact(), structure.byteOrder)
+
+                # Release the structures that were only waiting on this one
+                for typeName in waiting.pop(structure.typeName, []):
+                    heldStructure, heldNode, heldMissing = pending[typeName]
+                    heldMissing.discard(structure.typeName)
+                    if not heldMissing:
+                        del pending[typeName]
+                        ready.append((heldStructure, heldNode))
+
+        if pending:
+            typeName, (structure, structNode, missing) = next(iter(pending.items()))
+            if missing.isdisjoint(pending):
+                raise SerCParseError('Structure "{0}" refers to the unknown structure "{1}"'.format(typeName, sorted(missing)[0]))
+            raise SerCParseError('Structures cannot contain themselves: ' + ', '.join(sorted(pending)))
+        unknown = referenced.difference(layouts)
+        if unknown:
+            raise SerCParseError('Unknown structures are referred to: ' + ', '.join(sorted(unknown)))
+        for typeName, structByteOrder, memberName, elementTypeName in deferredElements:
+            self._checkElement(typeName, structByteOrder, memberName, elementTypeName, layouts)
+        return requiredHeaders, requiredSupport
+
+    def emit(self, sink):
+        """
+        Write the generated code for every parsed structure to sink, which
+        can be anything with a .write() method. Returns the number of
+        characters written.
+        """
+        startTime = time.perf_counter()
+        out = SerCEmitter(sink)
+        for chunk in self.iterChunks():
+            out.write(chunk)
+        out.flush()
+        if self._hooks is not None:
+            self._hooks.onPhase('emit', time.perf_counter() - startTime)
+            self._hooks.onEmit(out.charsEmitted)
+        return out.charsEmitted
+
+    def iterChunks(self):
+        """
+        A generator over the generated code. Each structure is rendered
+        exactly once, then each section of the output is yielded as one
+        large chunk.
+        """
+        # Format the required headers
         requiredHeaders = set()
-        for structName in self._structures:
-            requiredHeaders = requiredHeaders.union(self._structures[structName].getRequiredHeaders())
-        for header in requiredHeaders:
-            print('#include <{0}>'.format(header))
-        print()
-
-        # Print out structure prototypes
-        for structName in self._structures:
-            self._structures[structName].formatPrototype()
-        print()
-
-        # Print out their definitions
-        for structName in self._structures:
-            self._structures[structName].formatDeclaration()
-            print()
-        print()
-
-        # Print out their length functions
-        for structName in self._structures:
-            self._structures[structName].formatSize()
-            print()
-        print()
-
-        # Print out their allocators
-        for structName in self._structures:
-            self._structures[structName].formatAllocate()
-            print()
-        print()
-
-        # Print out their constructors
-        for structName in self._structures:
-            self._structures[structName].formatConstructor()
-            print()
-        print()
-
-        # Print out their new functions
-        for structName in self._structures:
-            self._structures[structName].formatNew()
-            print()
-        print()
-
-        # Print out their serializers
-        for structName in self._structures:
-            self._structures[structName].formatSerializer()
-            print()
-        print()
+        for structure in self._structures.values():
+            requiredHeaders = requiredHeaders.union(structure.getRequiredHeaders())
+        yield ''.join('#include <{0}>\n'.format(header) for header in sorted(requiredHeaders)) + '\n'
+
+        # Shared support code used by any of the structures
+        requiredSupport = set()
+        for structure in self._structures.values():
+            requiredSupport = requiredSupport.union(structure.getRequiredSupport())
+        if requiredSupport:
+            yield formatSupport(requiredSupport)
+
+        # Render every structure in one pass, then yield each section in turn
+        rendered = [self.renderStructure(structure) for structure in self._structures.values()]
+        for sectionName in SECTIONS:
+            yield ''.join(sections[sectionName] for sections in rendered) + '\n'
+
+        if self._cache is not None:
+            self._cache.prune()
+
+    def parseStructure(self, structNode):
+        """Parse one entry of the struct_list into a SerCStructure"""
+        return SerCStructure(structNode, self._defaults, self._hooks)
 
+    def renderStructure(self, structure):
+        """Render a structure's sections, going through the cache if there is one"""
+        if self._cache is None:
+            return structure.renderSections(self._hooks)
 
+        key = self._cacheKeys[structure.typeName]
+        sections = self._cache.get(key, structure.typeName)
+        if sections is None:
+            sections = structure.renderSections(self._hooks)
+            self._cache.put(key, sections)
+        return sections
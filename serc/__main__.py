@@ -1,11 +1,216 @@
+import os
 import serc
+import sys
+import time
 import argparse
+from serc.SerCExceptions import SerCError, SerCParseError
+from serc.SerCBatch import SerCSpecResult, expandSpecPaths, generateSpecs, formatCacheStats, formatSummary
+
+# The cache, backends and profilers are imported where they are used, so
+# that a plain run only pays for importing what it needs
 
 parser = argparse.ArgumentParser()
-parser.add_argument('specfile', type=argparse.FileType('r'))
+parser.add_argument('specfile', nargs='+',
+                    help='Spec files to generate. Directories and glob patterns are expanded to their .json files')
+# Output files are only opened once the arguments have been validated, so
+# that a rejected command line never truncates an existing file
+parser.add_argument('-o', '--output',
+                    help='Where to write the generated C code for a single spec. Defaults to stdout')
+parser.add_argument('--split-dir',
+                    help='Write a <type>.h and <type>.c pair per structure of a single spec into this directory, only rewriting files that changed')
+parser.add_argument('--stream', action='store_true',
+                    help='Read and generate a single spec one structure at a time, so memory use scales with the largest structure. Structures only come after the vector element structures they refer to if they do so in the spec')
+parser.add_argument('--watch', action='store_true',
+                    help='Keep running, and regenerate the specs into --output-dir or --split-dir whenever they change')
+parser.add_argument('--watch-interval', type=float, default=0.2,
+                    help='How often --watch checks the specs for changes, in seconds')
+parser.add_argument('--python-output',
+                    help='Also write a Python module of struct based encode/decode classes for a single spec')
+parser.add_argument('--output-dir',
+                    help='Write one <spec>.c file per spec into this directory. Defaults to next to each spec when given several specs')
+parser.add_argument('-j', '--jobs', type=int, default=1,
+                    help='Generate this many spec files in parallel worker processes')
+parser.add_argument('--summary', action='store_true',
+                    help='Print the wall time taken by each spec, and the files written with --split-dir, to stderr')
+parser.add_argument('--allocation', choices=serc.SerCStructure.ALLOCATION_MODES,
+                    help='How <type>_new allocates structures that do not set allocation in the spec. Every mode copies the vectors passed to <type>_new into the new structure, and NULL leaves them uninitialized')
+parser.add_argument('--byte-order', choices=sorted(serc.SerCStructure.BYTE_ORDERS),
+                    help='The wire byte order of structures that do not set byte_order in the spec')
+parser.add_argument('--roots', type=lambda value: [name for name in value.split(',') if name],
+                    help='Comma separated type names. Only generate these structures and the structures they depend on')
+parser.add_argument('--layout', choices=serc.SerCStructure.LAYOUTS,
+                    help='The in-memory layout of structures that do not set layout in the spec')
+parser.add_argument('--layout-report', action='store_true',
+                    help='Print the size and padding of each structure in each layout to stderr')
+parser.add_argument('--soa', action='store_true',
+                    help='Also generate a structure of arrays companion, <type>_soa, for every fixed size structure')
+parser.add_argument('--envelope', choices=serc.SerCStructure.ENVELOPES,
+                    help='The CRC of the frame envelope of structures that do not set envelope in the spec')
+parser.add_argument('--encoding', choices=serc.SerCStructure.ENCODINGS,
+                    help='The wire encoding of structures that do not set encoding in the spec')
+parser.add_argument('--encoding-report', action='store_true',
+                    help='Print the bytes each integer member takes per value in each encoding to stderr')
+parser.add_argument('--profile', action='store_true',
+                    help='Print the time taken by each phase and member type to stderr')
+parser.add_argument('--profile-output',
+                    help='Dump cProfile statistics for the whole run to this file, for use with pstats')
+parser.add_argument('--cache-dir',
+                    help='Cache rendered structures in this directory and only regenerate the ones that changed')
+parser.add_argument('--cache-size', type=int,
+                    help='The maximum size of the cache directory in bytes. Defaults to 64MiB')
+parser.add_argument('--cache-stats', action='store_true',
+                    help='Print cache hits and misses to stderr. With several specs, only the totals are printed')
+
+def getDefaults(args):
+    """Collect the structure option defaults given on the command line"""
+    defaults = {}
+    if args.allocation is not None:
+        defaults['allocation'] = args.allocation
+    if args.byte_order is not None:
+        defaults['byte_order'] = args.byte_order
+    if args.layout is not None:
+        defaults['layout'] = args.layout
+    if args.soa:
+        defaults['soa'] = True
+    if args.envelope is not None:
+        defaults['envelope'] = args.envelope
+    if args.encoding is not None:
+        defaults['encoding'] = args.encoding
+    return defaults
+
+def openOutput(path):
+    """
+    Open an output file for writing, or stdout for no path or -. Files are
+    written to a temporary file next to them, which closeOutput moves over
+    the file only once everything has been written, so that a spec that
+    fails to generate never truncates an existing output.
+    """
+    if path is None or path == '-':
+        return sys.stdout
+    try:
+        return open('{0}.{1}.tmp'.format(path, os.getpid()), 'w')
+    except OSError as e:
+        parser.error("can't open '{0}': {1}".format(path, e.strerror))
+
+def closeOutput(output, path, succeeded):
+    """Close an output opened by openOutput, replacing path with it if succeeded"""
+    if output is None or output is sys.stdout:
+        return
+    output.close()
+    if succeeded:
+        os.replace(output.name, path)
+    else:
+        os.remove(output.name)
+
+def generateSingle(args, specPath):
+    """Generate one spec into the --output stream"""
+    if args.stream and (args.split_dir is not None or args.python_output is not None or args.layout_report or args.encoding_report or args.roots is not None):
+        parser.error('--stream cannot be used with --split-dir, --python-output, --layout-report, --encoding-report or --roots')
+    startTime = time.perf_counter()
+    output = openOutput(args.output) if args.split_dir is None else None
+    pythonOutput = openOutput(args.python_output) if args.python_output is not None else None
+    succeeded = False
+    try:
+        serializer, cache = generateSingleInto(args, specPath, output)
+        if args.python_output is not None:
+            from serc.SerCPythonBackend import SerCPythonBackend
+            SerCPythonBackend(serializer.getStructures()).emit(pythonOutput)
+        succeeded = True
+    finally:
+        closeOutput(output, args.output, succeeded)
+        closeOutput(pythonOutput, args.python_output, succeeded)
+    if cache is not None and args.cache_stats:
+        sys.stderr.write(cache.formatStats() + '\n')
+    if args.summary:
+        wallTime = time.perf_counter() - startTime
+        sys.stderr.write(formatSummary([SerCSpecResult(specPath, args.output, wallTime)], wallTime) + '\n')
+
+def generateSingleInto(args, specPath, output):
+    """Parse a spec and generate it into output, printing any reports. Returns the serializer and cache."""
+    cache = None
+    if args.cache_dir is not None:
+        from serc.SerCCache import SerCSectionCache
+        cacheSize = args.cache_size if args.cache_size is not None else SerCSectionCache.DEFAULT_MAX_BYTES
+        cache = SerCSectionCache(args.cache_dir, cacheSize, verbose=args.cache_stats)
+    profiler = None
+    if args.profile:
+        from serc.SerCProfile import SerCProfiler
+        profiler = SerCProfiler()
+    with open(specPath, 'r') as specFile:
+        serializer = serc.JsonToCSerializer(specFile, output, cache, getDefaults(args), profiler, args.roots)
+        if args.stream:
+            serializer.stream(output)
+        elif args.split_dir is None:
+            serializer.parse()
+        else:
+            from serc.SerCSplit import writeSplit
+            serializer.parseStructures()
+            written, unchanged = writeSplit(serializer, args.split_dir)
+            if cache is not None:
+                cache.prune()
+            if args.summary:
+                sys.stderr.write('serc: wrote {0} files, {1} unchanged\n'.format(len(written), len(unchanged)))
+    if profiler is not None:
+        sys.stderr.write(profiler.formatReport() + '\n')
+    if args.layout_report:
+        from serc.SerCLayout import formatLayoutReport
+        sys.stderr.write(formatLayoutReport(serializer.getStructures()) + '\n')
+    if args.encoding_report:
+        from serc.SerCEncoding import formatEncodingReport
+        sys.stderr.write(formatEncodingReport(serializer.getStructures()) + '\n')
+    return serializer, cache
 
 if __name__ == '__main__':
     args = parser.parse_args()
-    if args.specfile is not None:
-        serializer = serc.JsonToCSerializer(args.specfile)
-        serializer.parse()
+    try:
+        specPaths = expandSpecPaths(args.specfile)
+    except SerCParseError as e:
+        parser.error(str(e))
+
+    profile = None
+    if args.profile_output is not None:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+
+    if args.watch:
+        if args.output is not None or args.python_output is not None or args.stream:
+            parser.error('--watch writes to --output-dir or --split-dir, and cannot be used with --output, --python-output or --stream')
+        from serc.SerCWatch import SerCWatcher
+        try:
+            watcher = SerCWatcher(specPaths, args.output_dir, args.split_dir, getDefaults(args), args.roots)
+        except SerCError as e:
+            parser.error(str(e))
+        watcher.run(args.watch_interval)
+    elif len(specPaths) == 1 and args.output_dir is None:
+        try:
+            generateSingle(args, specPaths[0])
+        except (SerCError, OSError) as e:
+            sys.stderr.write('serc: {0}: {1}\n'.format(specPaths[0], e))
+            sys.exit(1)
+    else:
+        if args.profile:
+            parser.error('--profile can only be used with a single spec. Use --summary for per spec times')
+        if args.layout_report or args.encoding_report or args.stream:
+            parser.error('--layout-report, --encoding-report and --stream can only be used with a single spec')
+        if args.output is not None or args.python_output is not None or args.split_dir is not None:
+            parser.error('--output, --python-output and --split-dir can only be used with a single spec. Use --output-dir instead')
+        startTime = time.perf_counter()
+        try:
+            results = generateSpecs(specPaths, args.output_dir, args.jobs, args.cache_dir, args.cache_size, getDefaults(args), args.roots)
+        except SerCParseError as e:
+            results = getattr(e, 'results', None)
+            if args.cache_stats and results is not None:
+                sys.stderr.write(formatCacheStats(results) + '\n')
+            if args.summary and results is not None:
+                sys.stderr.write(formatSummary(results, time.perf_counter() - startTime) + '\n')
+            sys.stderr.write(str(e) + '\n')
+            sys.exit(1)
+        if args.cache_stats:
+            sys.stderr.write(formatCacheStats(results) + '\n')
+        if args.summary:
+            sys.stderr.write(formatSummary(results, time.perf_counter() - startTime) + '\n')
+
+    if profile is not None:
+        profile.disable()
+        profile.dump_stats(args.profile_output)
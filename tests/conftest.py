@@ -0,0 +1,44 @@
+import shutil
+import subprocess
+
+import pytest
+
+# Included ahead of every test harness, for printf and reading hex from stdin
+HARNESS_HEADER = '''#include <stdio.h>
+#include <string.h>
+
+static void print_hex(const uint8_t* buffer, ssize_t length) {
+    for (ssize_t i = 0; i < length; i++) {
+        printf("%02x", buffer[i]);
+    }
+    printf("\\n");
+}
+
+static size_t read_hex(uint8_t* buffer, size_t max_length) {
+    size_t length = 0;
+    unsigned int byte;
+    while (length < max_length && scanf("%2x", &byte) == 1) {
+        buffer[length++] = (uint8_t)byte;
+    }
+    return length;
+}
+'''
+
+@pytest.fixture
+def runC(tmp_path):
+    """
+    Returns a function that compiles generated C code with a main function
+    and runs it, returning its stdout. flags are extra compiler flags.
+    Tests using it are skipped when there is no C compiler.
+    """
+    compiler = shutil.which('cc') or shutil.which('gcc')
+    if compiler is None:
+        pytest.skip('no C compiler')
+
+    def run(code, main, stdin='', flags=()):
+        source = tmp_path / 'harness.c'
+        source.write_text(code + '\n' + HARNESS_HEADER + '\n' + main)
+        binary = tmp_path / 'harness'
+        subprocess.run([compiler, '-std=c11', '-Wall', '-Werror', '-Wno-unused-function'] + list(flags) + ['-o', str(binary), str(source)], check=True)
+        return subprocess.run([str(binary)], input=stdin, capture_output=True, text=True, check=True).stdout
+    return run
@@ -0,0 +1,23 @@
+"""Helpers shared by the tests for generating code from spec dictionaries"""
+import io
+import json
+
+import serc
+from serc.SerCEmitter import SerCEmitter
+from serc.SerCPythonBackend import SerCPythonBackend
+
+def parseSpec(spec, defaults=None, cache=None):
+    """Parse a spec dictionary, returning the serializer and the generated C code"""
+    out = SerCEmitter()
+    serializer = serc.JsonToCSerializer(io.StringIO(json.dumps(spec)), out, cache, defaults)
+    serializer.parse()
+    return serializer, out.getvalue()
+
+def generateC(spec, defaults=None):
+    """The C code generated for a spec dictionary"""
+    return parseSpec(spec, defaults)[1]
+
+def generatePython(spec, defaults=None):
+    """Load the Python codecs generated for a spec dictionary, returning their namespace"""
+    serializer, _ = parseSpec(spec, defaults)
+    return SerCPythonBackend(serializer.getStructures()).compile()
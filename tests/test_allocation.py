@@ -0,0 +1,48 @@
+import pytest
+
+from helpers import generateC
+
+def samplesSpec(allocation):
+    return {'struct_list': [{'type_name': 'samples', 'allocation': allocation, 'contents': [
+        {'name': 'count', 'type': 'uint8_t'},
+        {'name': 'values', 'type': {'type_name': 'vector', 'args': ['double']}, 'list_length': 'this->count'},
+        {'name': 'scale', 'type': 'double'},
+    ]}]}
+
+# Prints the values of a structure made by samples_new, after the caller's
+# array has been changed, then checks that NULL leaves the vector alone
+HARNESS = '''
+#ifdef ARENA
+static uint8_t region[4096];
+static struct serc_arena arena;
+#define NEW(this_ptr, ...) samples_new(&arena, this_ptr, __VA_ARGS__)
+#else
+#define NEW(this_ptr, ...) samples_new(this_ptr, __VA_ARGS__)
+#endif
+
+int main(void) {
+#ifdef ARENA
+    serc_arena_init(&arena, region, sizeof(region));
+#endif
+    double values[3] = {1.5, -2.0, 4.0};
+    struct samples* this;
+    if (NEW(&this, 3, values, 0.5) < 0) {
+        return 1;
+    }
+    values[0] = 99.0;
+    printf("%u %g %g %g %g\\n", this->count, this->values[0], this->values[1], this->values[2], this->scale);
+
+    struct samples* empty;
+    if (NEW(&empty, 2, NULL, 1.0) < 0 || empty->values == NULL) {
+        return 1;
+    }
+    printf("ok\\n");
+    return 0;
+}
+'''
+
+@pytest.mark.parametrize('allocation', ['malloc', 'single', 'arena'])
+def test_new_copies_vectors(runC, allocation):
+    prefix = '#define ARENA\n' if allocation == 'arena' else ''
+    output = runC(prefix + generateC(samplesSpec(allocation)), HARNESS)
+    assert output.split('\n')[:2] == ['3 1.5 -2 4 0.5', 'ok']
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from serc.SerCBatch import expandSpecPaths, generateSpecs, formatCacheStats, formatSummary
+from serc.SerCExceptions import SerCParseError
+from helpers import generateC
+
+def pointSpec(typeName):
+    return {'struct_list': [{'type_name': typeName, 'contents': [{'name': 'x', 'type': 'int'}, {'name': 'y', 'type': 'double'}]}]}
+
+def writeSpecs(directory, specs):
+    paths = []
+    for name, spec in specs.items():
+        path = directory / (name + '.json')
+        path.write_text(json.dumps(spec))
+        paths.append(str(path))
+    return paths
+
+def test_expand_spec_paths(tmp_path):
+    paths = writeSpecs(tmp_path, {'a': pointSpec('a'), 'b': pointSpec('b')})
+    (tmp_path / 'notes.txt').write_text('')
+    assert expandSpecPaths([str(tmp_path)]) == paths
+    assert expandSpecPaths([str(tmp_path / '*.json'), paths[0]]) == paths
+    with pytest.raises(SerCParseError):
+        expandSpecPaths([str(tmp_path / 'missing*.json')])
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_generate_specs(tmp_path, jobs):
+    specs = {'a': pointSpec('a'), 'b': pointSpec('b'), 'c': pointSpec('c')}
+    paths = writeSpecs(tmp_path, specs)
+    results = generateSpecs(paths, str(tmp_path / 'out'), jobs, cacheDir=str(tmp_path / 'cache'))
+    assert [result.specPath for result in results] == paths
+    for name, spec in specs.items():
+        assert (tmp_path / 'out' / (name + '.c')).read_text() == generateC(spec)
+    assert formatSummary(results, 1.0).endswith('total for 3 spec files')
+
+def test_failures_are_collected(tmp_path):
+    paths = writeSpecs(tmp_path, {'a': pointSpec('a'), 'b': {'struct_list': [{'type_name': 'b', 'contents': [{'name': 'x', 'type': 'nope'}]}]}})
+    (tmp_path / 'out').mkdir()
+    (tmp_path / 'out' / 'b.c').write_text('previous')
+    with pytest.raises(SerCParseError, match='1 of 2') as error:
+        generateSpecs(paths, str(tmp_path / 'out'))
+    assert [result.error is None for result in error.value.results] == [True, False]
+    # A failed spec leaves its previous output alone
+    assert (tmp_path / 'out' / 'b.c').read_text() == 'previous'
+    assert 'FAILED' in formatSummary(error.value.results, 1.0)
+
+def test_output_names_must_be_unique(tmp_path):
+    (tmp_path / 'one').mkdir()
+    (tmp_path / 'two').mkdir()
+    paths = writeSpecs(tmp_path / 'one', {'a': pointSpec('a')}) + writeSpecs(tmp_path / 'two', {'a': pointSpec('a')})
+    with pytest.raises(SerCParseError, match='same output file'):
+        generateSpecs(paths, str(tmp_path / 'out'))
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_cache_stats_are_returned(tmp_path, jobs):
+    paths = writeSpecs(tmp_path, {'a': pointSpec('a'), 'b': pointSpec('b')})
+    results = generateSpecs(paths, str(tmp_path / 'out'), jobs)
+    assert [(result.cacheHits, result.cacheMisses) for result in results] == [(None, None), (None, None)]
+    generateSpecs(paths, str(tmp_path / 'out'), jobs, cacheDir=str(tmp_path / 'cache'))
+    results = generateSpecs(paths, str(tmp_path / 'out'), jobs, cacheDir=str(tmp_path / 'cache'))
+    assert [(result.cacheHits, result.cacheMisses) for result in results] == [(1, 0), (1, 0)]
+    assert formatCacheStats(results) == 'serc cache: 2 hits, 0 misses'
@@ -0,0 +1,15 @@
+from serc.SerCBench import compareResults
+
+def results(**metrics):
+    return {'metrics': metrics}
+
+def test_compare_flags_metrics_over_the_threshold():
+    baseline = results(parse=1.0, emit=2.0, compile=4.0)
+    current = results(parse=1.09, emit=2.5, compile=3.0)
+    assert compareResults(baseline, current, threshold=0.1) == [('emit', 2.0, 2.5, 0.25)]
+    assert [metric for metric, *times in compareResults(baseline, current, threshold=0.05)] == ['emit', 'parse']
+
+def test_compare_skips_metrics_missing_from_either_run():
+    baseline = results(parse=1.0, removed=1.0, zero=0.0)
+    current = results(parse=1.0, zero=5.0, added=100.0)
+    assert compareResults(baseline, current) == []
@@ -0,0 +1,59 @@
+import os
+
+from serc.SerCCache import SerCSectionCache
+from helpers import parseSpec
+
+def pointSpec(zType='int'):
+    return {'struct_list': [
+        {'type_name': 'point', 'contents': [{'name': 'x', 'type': 'int'}, {'name': 'z', 'type': zType}]},
+        {'type_name': 'line', 'contents': [
+            {'name': 'a', 'type': {'type_name': 'struct', 'args': ['point']}},
+            {'name': 'b', 'type': {'type_name': 'struct', 'args': ['point']}},
+        ]},
+    ]}
+
+def test_cached_output_is_unchanged(tmp_path):
+    expected = parseSpec(pointSpec())[1]
+    cache = SerCSectionCache(str(tmp_path))
+    assert parseSpec(pointSpec(), cache=cache)[1] == expected
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert parseSpec(pointSpec(), cache=cache)[1] == expected
+    assert (cache.hits, cache.misses) == (2, 2)
+
+def test_only_changed_structures_miss(tmp_path):
+    cache = SerCSectionCache(str(tmp_path))
+    parseSpec(pointSpec(), cache=cache)
+    cache = SerCSectionCache(str(tmp_path))
+    output = parseSpec(pointSpec('double'), cache=cache)[1]
+    assert output == parseSpec(pointSpec('double'))[1]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_options_are_part_of_the_key(tmp_path):
+    cache = SerCSectionCache(str(tmp_path))
+    parseSpec(pointSpec(), cache=cache)
+    output = parseSpec(pointSpec(), defaults={'layout': 'aligned'}, cache=cache)[1]
+    assert output == parseSpec(pointSpec(), defaults={'layout': 'aligned'})[1]
+    assert cache.hits == 0
+
+def test_corrupt_entries_miss(tmp_path):
+    cache = SerCSectionCache(str(tmp_path))
+    parseSpec(pointSpec(), cache=cache)
+    for name in os.listdir(str(tmp_path)):
+        (tmp_path / name).write_text('{')
+    cache = SerCSectionCache(str(tmp_path))
+    assert parseSpec(pointSpec(), cache=cache)[1] == parseSpec(pointSpec())[1]
+    assert cache.hits == 0
+
+def test_prune_evicts_least_recently_used(tmp_path):
+    cache = SerCSectionCache(str(tmp_path))
+    for index, name in enumerate(['old', 'middle', 'new']):
+        cache.put(name, {'section': 'x' * 100})
+        os.utime(str(tmp_path / (name + '.json')), (1000 + index, 1000 + index))
+    # Reading an entry makes it the most recently used
+    assert cache.get('old') is not None
+
+    entrySize = os.path.getsize(str(tmp_path / 'old.json'))
+    cache = SerCSectionCache(str(tmp_path), maxBytes=2 * entrySize)
+    assert cache.prune() == 1
+    assert sorted(os.listdir(str(tmp_path))) == ['new.json', 'old.json']
+    assert cache.prune() == 0
@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import subprocess
+
+from helpers import generateC
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SPEC = {'struct_list': [{'type_name': 'point', 'contents': [{'name': 'x', 'type': 'int'}, {'name': 'y', 'type': 'double'}]}]}
+
+def runSerc(*args):
+    return subprocess.run([sys.executable, '-m', 'serc'] + [str(arg) for arg in args], cwd=REPO_ROOT, capture_output=True, text=True)
+
+def test_single_spec_output(tmp_path):
+    spec = tmp_path / 'point.json'
+    spec.write_text(json.dumps(SPEC))
+    output = tmp_path / 'point.c'
+    result = runSerc(spec, '-o', output, '--summary')
+    assert result.returncode == 0
+    assert output.read_text() == generateC(SPEC)
+    assert 'total for 1 spec files' in result.stderr
+    assert sorted(os.listdir(str(tmp_path))) == ['point.c', 'point.json']
+
+def test_failed_spec_keeps_previous_outputs(tmp_path):
+    spec = tmp_path / 'bad.json'
+    spec.write_text(json.dumps({'struct_list': [{'type_name': 'bad', 'contents': [{'name': 'x', 'type': 'nope'}]}]}))
+    output = tmp_path / 'keep.c'
+    output.write_text('previous')
+    pythonOutput = tmp_path / 'keep.py'
+    pythonOutput.write_text('previous')
+    result = runSerc(spec, '-o', output, '--python-output', pythonOutput)
+    assert result.returncode == 1
+    assert 'Traceback' not in result.stderr
+    assert 'nope' in result.stderr
+    assert output.read_text() == 'previous'
+    assert pythonOutput.read_text() == 'previous'
+    assert sorted(os.listdir(str(tmp_path))) == ['bad.json', 'keep.c', 'keep.py']
+
+def test_malformed_json_is_reported(tmp_path):
+    spec = tmp_path / 'bad.json'
+    spec.write_text('{"struct_list": [')
+    result = runSerc(spec)
+    assert result.returncode == 1
+    assert 'malformed JSON' in result.stderr
+    assert 'Traceback' not in result.stderr
+
+def test_cache_stats_for_several_specs(tmp_path):
+    for name in ('a', 'b'):
+        spec = {'struct_list': [dict(SPEC['struct_list'][0], type_name=name)]}
+        (tmp_path / (name + '.json')).write_text(json.dumps(spec))
+    args = [tmp_path / 'a.json', tmp_path / 'b.json', '--output-dir', tmp_path / 'out', '--cache-dir', tmp_path / 'cache', '--cache-stats']
+    assert 'serc cache: 0 hits, 2 misses' in runSerc(*args).stderr
+    assert 'serc cache: 2 hits, 0 misses' in runSerc(*args).stderr
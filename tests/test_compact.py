@@ -0,0 +1,123 @@
+import pytest
+
+from serc.SerCEncoding import getEncodedSizes
+from helpers import parseSpec, generateC, generatePython
+
+def intType(sign, bits):
+    return {'type_name': 'int', 'args': [sign, bits]}
+
+SPEC = {'struct_list': [{'type_name': 'sample', 'encoding': 'compact', 'byte_order': 'big', 'contents': [
+    {'name': 'id', 'type': intType('unsigned', 32)},
+    {'name': 'temp', 'type': intType('signed', 16)},
+    {'name': 'scale', 'type': 'double'},
+    {'name': 'count', 'type': intType('unsigned', 16)},
+    {'name': 'values', 'type': {'type_name': 'vector', 'args': [intType('signed', 32)]}, 'list_length': 'this->count'},
+    {'name': 'raw', 'type': {'type_name': 'vector', 'args': ['uint8_t']}, 'list_length': 'this->count', 'encoding': 'fixed'},
+    {'name': 'big', 'type': intType('signed', 64)},
+    {'name': 'flags', 'type': {'type_name': 'vector', 'args': [intType('unsigned', 64)]}, 'list_length': 'this->count', 'encoding': 'varint'},
+    {'name': 'tail', 'type': intType('unsigned', 32), 'encoding': 'fixed'},
+]}]}
+
+HARNESS = '''
+int main(void) {
+    int32_t values[5] = {100, 101, -5, 2147483647, -2147483647 - 1};
+    uint8_t raw[5] = {1, 2, 3, 4, 5};
+    uint64_t flags[5] = {0, 127, 128, 300, 0xffffffffffffffffull};
+    struct sample value = {70000, -3, 1.5, 5, values, raw, -1234567890123ll, flags, 0xdeadbeef};
+    uint8_t buffer[256];
+    ssize_t length = sample_serialize(buffer, sizeof(buffer), &value);
+    if (length != (ssize_t)sample_size(&value)) {
+        return 1;
+    }
+    print_hex(buffer, length);
+
+    /* Every truncation of the encoding is rejected */
+    int32_t decodedValues[5];
+    uint8_t decodedRaw[5];
+    uint64_t decodedFlags[5];
+    struct sample decoded = {.values = decodedValues, .raw = decodedRaw, .flags = decodedFlags};
+    for (ssize_t truncated = 0; truncated < length; truncated++) {
+        if (sample_deserialize(buffer, truncated, &decoded) >= 0) {
+            return 1;
+        }
+    }
+
+    length = (ssize_t)read_hex(buffer, sizeof(buffer));
+    if (sample_deserialize(buffer, length, &decoded) != length) {
+        return 1;
+    }
+    printf("%u %d %lld %d %d %llu %x\\n", (unsigned)decoded.id, decoded.temp, (long long)decoded.big,
+           decodedValues[3], decodedValues[4], (unsigned long long)decodedFlags[4], (unsigned)decoded.tail);
+    return 0;
+}
+'''
+
+def makeSample(codecs):
+    return codecs['sample'](70000, -3, 1.5, 5, (100, 101, -5, 2147483647, -2147483648), (1, 2, 3, 4, 5),
+                            -1234567890123, (0, 127, 128, 300, 0xffffffffffffffff), 0xdeadbeef)
+
+def test_c_and_python_agree(runC):
+    codecs = generatePython(SPEC)
+    expected = makeSample(codecs)
+    written, decoded = runC(generateC(SPEC), HARNESS, stdin=expected.pack().hex()).split('\n')[:2]
+    assert bytes.fromhex(written) == expected.pack()
+    assert decoded == '70000 -3 -1234567890123 2147483647 -2147483648 18446744073709551615 deadbeef'
+
+def test_python_encoding():
+    codecs = generatePython(SPEC)
+    value = makeSample(codecs)
+    encoded = value.pack()
+    assert codecs['sample'].unpack_from(encoded) == value
+    assert len(encoded) == value.encoded_size()
+    # 70000 is a three byte varint, and -3 zigzags to 5
+    assert encoded.startswith(bytes([0xf0, 0xa2, 0x04, 0x05]))
+
+@pytest.mark.parametrize('value, encoded', [(0, b'\x00'), (-1, b'\x01'), (1, b'\x02'), (-64, b'\x7f'), (64, b'\x80\x01')])
+def test_zigzag(value, encoded):
+    codecs = generatePython({'struct_list': [{'type_name': 'one', 'encoding': 'compact', 'contents': [
+        {'name': 'v', 'type': intType('signed', 32)}]}]})
+    assert codecs['one'](value).pack() == encoded
+    assert codecs['one'].unpack_from(encoded).v == value
+
+def test_delta_wraps_around():
+    codecs = generatePython(SPEC)
+    value = makeSample(codecs)
+    # The jump from the largest to the smallest 32 bit value still decodes
+    assert codecs['sample'].unpack_from(value.pack()).values == value.values
+
+def test_python_rejects_values_that_do_not_fit():
+    codecs = generatePython({'struct_list': [{'type_name': 'one', 'encoding': 'compact', 'contents': [
+        {'name': 'v', 'type': intType('unsigned', 16)}]}]})
+    with pytest.raises(ValueError):
+        codecs['one'].unpack_from(b'\x80\x80\x04')
+
+def test_encoded_sizes():
+    serializer, _ = parseSpec(SPEC)
+    records = {record.name: record for record in serializer.getStructures()['sample'].getRecords()}
+    assert getEncodedSizes(records['id'], 'varint') == (4, 1, 5)
+    assert getEncodedSizes(records['values'], 'delta') == (4, 1, 5)
+    assert getEncodedSizes(records['big'], 'varint') == (8, 1, 10)
+    assert getEncodedSizes(records['tail'], 'fixed') == (4, 4, 4)
+
+def test_all_compact_structures_compile_with_extra_warnings(runC):
+    # Without a fixed part there is no up front length check to warn about
+    spec = {'struct_list': [{'type_name': 'counts', 'encoding': 'compact', 'contents': [
+        {'name': 'id', 'type': intType('unsigned', 32)},
+        {'name': 'count', 'type': intType('unsigned', 16)},
+        {'name': 'values', 'type': {'type_name': 'vector', 'args': [intType('signed', 32)]}, 'list_length': 'this->count'},
+    ]}]}
+    expected = generatePython(spec)['counts'](300, 2, (-1, 70000))
+    output = runC(generateC(spec), '''
+int main(void) {
+    uint8_t buffer[64];
+    int32_t values[2];
+    struct counts decoded = {.values = values};
+    size_t length = read_hex(buffer, sizeof(buffer));
+    if (counts_deserialize(buffer, 0, &decoded) >= 0 || counts_deserialize(buffer, length, &decoded) != (ssize_t)length) {
+        return 1;
+    }
+    printf("%u %d %d\\n", (unsigned)decoded.id, values[0], values[1]);
+    return 0;
+}
+''', stdin=expected.pack().hex(), flags=['-Wextra'])
+    assert output == '300 -1 70000\n'
@@ -0,0 +1,51 @@
+import zlib
+
+import pytest
+
+from serc.SerCCRC import crc, crcTables, SLICES
+from helpers import generateC, generatePython
+
+CHECK_INPUT = b'123456789'
+
+# The standard check values, the CRC of CHECK_INPUT
+CHECK_VALUES = {'crc16': 0x906e, 'crc32': 0xcbf43926}
+
+@pytest.mark.parametrize('name', sorted(CHECK_VALUES))
+def test_check_values(name):
+    assert crc(name, CHECK_INPUT) == CHECK_VALUES[name]
+
+def test_crc32_matches_zlib():
+    data = bytes(range(256)) * 3
+    assert crc('crc32', data) == zlib.crc32(data)
+
+def test_slice_tables():
+    tables = crcTables('crc32')
+    assert len(tables) == SLICES
+    assert all(len(table) == 256 for table in tables)
+    assert tables[0][1] == 0x77073096
+
+def test_generated_crcs(runC):
+    spec = {'struct_list': [{'type_name': 'point', 'envelope': 'crc16', 'contents': [{'name': 'x', 'type': 'int'}]},
+                            {'type_name': 'line', 'envelope': 'crc32', 'contents': [{'name': 'x', 'type': 'int'}]}]}
+    data = bytes((i * 7 + 3) & 0xff for i in range(1000))
+    output = runC(generateC(spec), '''
+int main(void) {
+    uint8_t data[1000];
+    for (int i = 0; i < 1000; i++) {
+        data[i] = (uint8_t)(i * 7 + 3);
+    }
+    printf("%04x %08x\\n", (unsigned)(serc_crc16_update(SERC_CRC16_INIT, (const uint8_t*)"123456789", 9) ^ SERC_CRC16_XOROUT),
+           (unsigned)(serc_crc32_update(SERC_CRC32_INIT, (const uint8_t*)"123456789", 9) ^ SERC_CRC32_XOROUT));
+    /* Odd lengths exercise both the sliced loop and the byte at a time tail */
+    printf("%04x %08x\\n", (unsigned)(serc_crc16_update(SERC_CRC16_INIT, data, 999) ^ SERC_CRC16_XOROUT),
+           (unsigned)(serc_crc32_update(SERC_CRC32_INIT, data, 999) ^ SERC_CRC32_XOROUT));
+    return 0;
+}
+''')
+    check, long = output.split('\n')[:2]
+    assert check == '906e cbf43926'
+    assert long == '{0:04x} {1:08x}'.format(crc('crc16', data[:999]), crc('crc32', data[:999]))
+
+def test_python_crc16():
+    codecs = generatePython({'struct_list': [{'type_name': 'point', 'envelope': 'crc16', 'contents': [{'name': 'x', 'type': 'int'}]}]})
+    assert codecs['crc16'](CHECK_INPUT) == CHECK_VALUES['crc16']
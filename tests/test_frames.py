@@ -0,0 +1,113 @@
+import pytest
+
+from serc.SerCCRC import crc
+from serc.SerCExceptions import SerCParseError
+from helpers import generateC, generatePython
+
+SPEC = {'struct_list': [
+    {'type_name': 'point', 'envelope': 'crc32', 'contents': [
+        {'name': 'x', 'type': 'float'},
+        {'name': 'y', 'type': 'float'},
+        {'name': 'id', 'type': {'type_name': 'int', 'args': ['unsigned', 32]}},
+    ]},
+    {'type_name': 'sample', 'envelope': 'crc16', 'encoding': 'compact', 'type_id': 7, 'byte_order': 'big', 'contents': [
+        {'name': 'id', 'type': {'type_name': 'int', 'args': ['unsigned', 32]}},
+        {'name': 'count', 'type': {'type_name': 'int', 'args': ['unsigned', 16]}},
+        {'name': 'values', 'type': {'type_name': 'vector', 'args': [{'type_name': 'int', 'args': ['signed', 32]}]}, 'list_length': 'this->count'},
+    ]},
+]}
+
+# Writes a stream of frames with garbage, a corrupt frame and a truncated
+# one between them, then decodes the stream in small chunks
+HARNESS = '''
+int main(void) {
+    uint8_t stream[1024];
+    size_t length = 0;
+    struct point p = {1.5f, -2.5f, 42};
+    int32_t values[3] = {10, 12, -100};
+    struct sample s = {300, 3, values};
+
+    stream[length++] = 0xc5;
+    stream[length++] = 0x99;
+    stream[length++] = 0x00;
+    length += point_serialize_frame(stream + length, sizeof(stream) - length, &p);
+    size_t corrupt = length;
+    length += sample_serialize_frame(stream + length, sizeof(stream) - length, &s);
+    stream[corrupt + 10] ^= 0x40;
+    length += sample_serialize_frame(stream + length, sizeof(stream) - length, &s);
+    length = length + 5;
+    length += point_serialize_frame(stream + length, sizeof(stream) - length, &p);
+    print_hex(stream, length);
+
+    uint8_t window[64];
+    struct serc_frame_decoder decoder;
+    serc_frame_decoder_init(&decoder, window, sizeof(window));
+    size_t fed = 0;
+    while (fed < length) {
+        size_t chunk = length - fed < 5 ? length - fed : 5;
+        fed += serc_frame_decoder_feed(&decoder, stream + fed, chunk);
+        uint16_t type_id;
+        const uint8_t* payload;
+        size_t payload_length;
+        while (serc_frame_decoder_next(&decoder, &type_id, &payload, &payload_length)) {
+            if (type_id == POINT_TYPE_ID) {
+                struct point q;
+                if (point_deserialize(payload, payload_length, &q) != (ssize_t)payload_length) {
+                    return 1;
+                }
+                printf("point %u\\n", (unsigned)q.id);
+            }
+            else if (type_id == SAMPLE_TYPE_ID) {
+                int32_t decoded[3];
+                struct sample t = {.values = decoded};
+                if (sample_deserialize(payload, payload_length, &t) != (ssize_t)payload_length) {
+                    return 1;
+                }
+                printf("sample %u %d\\n", (unsigned)t.id, decoded[2]);
+            }
+        }
+    }
+    printf("skipped %zu\\n", decoder.skipped);
+    return 0;
+}
+'''
+
+def test_type_ids():
+    codecs = generatePython(SPEC)
+    assert codecs['point'].TYPE_ID == crc('crc16', b'point')
+    assert codecs['sample'].TYPE_ID == 7
+    assert codecs['FRAME_TYPES'] == {codecs['point'].TYPE_ID: codecs['point'], 7: codecs['sample']}
+
+def test_duplicate_type_ids_are_rejected():
+    spec = {'struct_list': [dict(structure, type_id=3) for structure in SPEC['struct_list']]}
+    with pytest.raises(SerCParseError, match='same type_id'):
+        generateC(spec)
+
+def test_python_frames():
+    codecs = generatePython(SPEC)
+    sample = codecs['sample'](300, 3, (10, 12, -100))
+    frame = sample.pack_frame()
+    assert codecs['sample'].unpack_frame(frame) == sample
+    assert codecs['check_frame'](frame) == (len(frame), 7, sample.pack())
+    assert codecs['check_frame'](frame[:-1])[0] == 0
+    with pytest.raises(ValueError):
+        codecs['point'].unpack_frame(frame)
+
+    corrupt = bytearray(frame)
+    corrupt[-3] ^= 1
+    assert codecs['check_frame'](corrupt)[0] == -1
+
+def test_c_and_python_decoders_resynchronize(runC):
+    codecs = generatePython(SPEC)
+    lines = runC(generateC(SPEC), HARNESS).split('\n')
+    assert lines[1:4] == ['point 42', 'sample 300 -100', 'point 42']
+    skipped = int(lines[4].split()[1])
+    assert skipped > 3
+
+    # The Python decoder finds the same frames in the stream C wrote
+    decoder = codecs['FrameDecoder']()
+    stream = bytes.fromhex(lines[0])
+    for start in range(0, len(stream), 5):
+        decoder.feed(stream[start:start + 5])
+    assert list(decoder.records()) == [codecs['point'](1.5, -2.5, 42), codecs['sample'](300, 3, (10, 12, -100)), codecs['point'](1.5, -2.5, 42)]
+    assert decoder.skipped == skipped
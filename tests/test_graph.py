@@ -0,0 +1,65 @@
+import io
+import json
+
+import pytest
+
+import serc
+from serc.SerCExceptions import SerCParseError
+from helpers import parseSpec
+
+def struct(typeName):
+    return {'type_name': 'struct', 'args': [typeName]}
+
+def vector(element):
+    return {'type_name': 'vector', 'args': [element]}
+
+SPEC = {'struct_list': [
+    {'type_name': 'outer', 'contents': [
+        {'name': 'm', 'type': struct('mid')},
+        {'name': 'n', 'type': 'uint8_t'},
+        {'name': 'l', 'type': vector(struct('leaf2')), 'list_length': 'this->n'},
+    ]},
+    {'type_name': 'unused', 'contents': [{'name': 'x', 'type': 'int'}]},
+    {'type_name': 'mid', 'contents': [{'name': 'l', 'type': struct('leaf')}]},
+    {'type_name': 'leaf', 'contents': [{'name': 'x', 'type': 'int'}]},
+    {'type_name': 'leaf2', 'contents': [{'name': 'x', 'type': 'int'}]},
+]}
+
+def cycle(*typeNames):
+    """Structures that each hold a vector of the next, and the last of the first"""
+    return {'struct_list': [{'type_name': typeName, 'contents': [
+        {'name': 'n', 'type': 'uint8_t'},
+        {'name': 'next', 'type': vector(struct(typeNames[(index + 1) % len(typeNames)])), 'list_length': 'this->n'},
+    ]} for index, typeName in enumerate(typeNames)]}
+
+def parseRoots(spec, roots):
+    serializer = serc.JsonToCSerializer(io.StringIO(json.dumps(spec)), roots=roots)
+    serializer.parseStructures()
+    return list(serializer.getStructures())
+
+def test_dependencies_come_first():
+    assert list(parseSpec(SPEC)[0].getStructures()) == ['leaf', 'mid', 'leaf2', 'outer', 'unused']
+
+def test_roots_drop_unused_structures():
+    assert parseRoots(SPEC, ['outer']) == ['leaf', 'mid', 'leaf2', 'outer']
+    assert parseRoots(SPEC, ['mid', 'unused']) == ['unused', 'leaf', 'mid']
+    with pytest.raises(SerCParseError):
+        parseRoots(SPEC, ['missing'])
+
+def test_vector_cycles_are_allowed():
+    serializer, code = parseSpec(cycle('a', 'b', 'c'))
+    assert sorted(serializer.getStructures()) == ['a', 'b', 'c']
+    # The prototypes come first, so each structure can point at the next
+    assert code.index('struct c;') < code.index('struct a {')
+
+def test_nesting_cycles_are_rejected():
+    spec = {'struct_list': [
+        {'type_name': 'a', 'contents': [{'name': 'b', 'type': struct('b')}]},
+        {'type_name': 'b', 'contents': [{'name': 'a', 'type': struct('a')}]},
+    ]}
+    with pytest.raises(SerCParseError, match='contain themselves'):
+        parseSpec(spec)
+
+def test_unknown_structures_are_rejected():
+    with pytest.raises(SerCParseError):
+        parseSpec({'struct_list': SPEC['struct_list'][:2]})
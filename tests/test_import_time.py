@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+import subprocess
+
+import pytest
+
+from serc.SerCBench import DEFAULT_IMPORT_BUDGET
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that only some runs need, and so must be imported where they are used
+LAZY_MODULES = ['serc.SerCCache', 'serc.SerCPythonBackend', 'serc.SerCNumpyBackend', 'serc.SerCProfile',
+                'serc.SerCSplit', 'serc.SerCWatch', 'serc.SerCEncoding', 'numpy', 'tempfile', 'concurrent.futures']
+
+def runInterpreter(code):
+    return subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, check=True, capture_output=True, text=True).stdout
+
+def timeInterpreter(code, repeats=5):
+    """The best wall time of running code in a fresh interpreter"""
+    times = []
+    for _ in range(repeats):
+        startTime = time.perf_counter()
+        runInterpreter(code)
+        times.append(time.perf_counter() - startTime)
+    return min(times)
+
+# The benchmark holds imports to DEFAULT_IMPORT_BUDGET, this only catches
+# gross regressions on machines that may be busy running other tests
+IMPORT_HEADROOM = 3
+
+@pytest.mark.slow
+def test_cli_import_is_within_budget():
+    importTime = timeInterpreter('import serc.__main__') - timeInterpreter('pass')
+    assert importTime < IMPORT_HEADROOM * DEFAULT_IMPORT_BUDGET, 'importing the CLI took {0:.3f}s'.format(importTime)
+
+def test_cli_import_is_lazy():
+    loaded = runInterpreter('import sys, serc.__main__; print(" ".join(sys.modules))').split()
+    assert [name for name in LAZY_MODULES if name in loaded] == []
@@ -0,0 +1,86 @@
+import io
+import json
+
+import serc
+from serc.SerCTypeBase import SerCType
+from serc.SerCLayout import orderByAlignment, computeLayouts, formatLayoutReport
+from helpers import parseSpec
+
+class SerCTypeTestTimespec(SerCType):
+    """A third party type, whose alignment cannot be known from the type alone"""
+    def getTypeID():
+        return 'test_timespec'
+
+    def getRequiredHeaders(self):
+        return {'time.h'}
+
+    def getRequiredArguments(self):
+        return []
+
+    def formatCType(self):
+        return 'struct timespec'
+
+    def formatConstructor(self, out):
+        pass
+
+    def formatSize(self):
+        return 'sizeof(struct timespec)'
+
+def layoutSpec(layout):
+    return {'struct_list': [
+        {'type_name': 'mixed', 'layout': layout, 'contents': [
+            {'name': 'a', 'type': 'uint8_t'},
+            {'name': 'b', 'type': 'double'},
+            {'name': 'c', 'type': 'uint8_t'},
+            {'name': 'd', 'type': {'type_name': 'int', 'args': ['signed', 32]}},
+            {'name': 'e', 'type': {'type_name': 'int', 'args': ['unsigned', 16]}},
+        ]},
+        {'type_name': 'outer', 'layout': 'aligned', 'contents': [
+            {'name': 'flag', 'type': 'uint8_t'},
+            {'name': 'inner', 'type': {'type_name': 'struct', 'args': ['mixed']}},
+        ]},
+    ]}
+
+def test_order_by_alignment_is_stable():
+    structures = parseSpec(layoutSpec('aligned'))[0].getStructures()
+    assert [record.name for record in orderByAlignment(structures['mixed'].getRecords())] == ['b', 'd', 'e', 'a', 'c']
+    # Nested structures are assumed to have the largest alignment
+    assert [record.name for record in orderByAlignment(structures['outer'].getRecords())] == ['inner', 'flag']
+
+def test_reordering_removes_padding():
+    structures = parseSpec(layoutSpec('aligned'))[0].getStructures()
+    layouts = computeLayouts(structures)
+    mixed = layouts['mixed']
+    assert mixed.packedSize == 16
+    assert (mixed.declaredSize, mixed.declaredPadding) == (32, 16)
+    assert (mixed.optimizedSize, mixed.optimizedPadding) == (16, 0)
+    assert mixed.getBytesSaved() == 16
+    assert mixed.getSize() == (16, 8)
+    # The outer structure nests mixed at its reordered size
+    assert (layouts['outer'].optimizedSize, layouts['outer'].optimizedPadding) == (24, 7)
+
+    report = formatLayoutReport(structures)
+    row = next(line for line in report.splitlines() if line.startswith('mixed '))
+    assert row.split()[:3] == ['mixed', 'aligned', '16']
+    assert '32 (16 pad)' in row and '16 (0 pad)' in row
+    assert report.endswith('Reordering saves 16 bytes over all structures, compared to natural layouts in spec order')
+
+def test_packed_structures_report_their_packed_size():
+    layouts = computeLayouts(parseSpec(layoutSpec('packed'))[0].getStructures())
+    assert layouts['mixed'].getSize() == (16, 1)
+    assert (layouts['outer'].packedSize, layouts['outer'].optimizedSize) == (17, 17)
+
+def test_unknown_alignments_are_not_available():
+    spec = layoutSpec('aligned')
+    spec['struct_list'][0]['contents'].append({'name': 'when', 'type': 'test_timespec'})
+    spec['struct_list'].append({'type_name': 'plain', 'contents': [{'name': 'x', 'type': 'int'}]})
+    serializer = serc.JsonToCSerializer(io.StringIO(json.dumps(spec)))
+    serializer.parseStructures()
+    structures = serializer.getStructures()
+
+    # outer nests mixed, so it is not available either
+    assert list(computeLayouts(structures)) == ['plain']
+    report = formatLayoutReport(structures).splitlines()
+    assert report[1].split() == ['mixed', 'aligned', 'n/a', 'n/a', 'n/a', 'n/a']
+    assert report[2].split() == ['outer', 'aligned', 'n/a', 'n/a', 'n/a', 'n/a']
+    assert report[3].split()[:3] == ['plain', 'packed', '4']
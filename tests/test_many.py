@@ -0,0 +1,80 @@
+import sys
+
+import pytest
+
+from helpers import generateC
+
+def manySpec(byteOrder, encoding):
+    options = {'byte_order': byteOrder, 'encoding': encoding}
+    return {'struct_list': [
+        dict(options, type_name='point', encoding='fixed', contents=[
+            {'name': 'x', 'type': {'type_name': 'int', 'args': ['signed', 16]}},
+            {'name': 'y', 'type': {'type_name': 'int', 'args': ['signed', 32]}},
+        ]),
+        dict(options, type_name='sample', contents=[
+            {'name': 'id', 'type': {'type_name': 'int', 'args': ['unsigned', 32]}},
+            {'name': 'pos', 'type': {'type_name': 'struct', 'args': ['point']}},
+        ]),
+        dict(options, type_name='reading', contents=[
+            {'name': 'id', 'type': {'type_name': 'int', 'args': ['unsigned', 16]}},
+            {'name': 'count', 'type': 'uint8_t'},
+            {'name': 'values', 'type': {'type_name': 'vector', 'args': [{'type_name': 'int', 'args': ['signed', 32]}]}, 'list_length': 'this->count'},
+            {'name': 'scale', 'type': 'double'},
+        ]),
+    ]}
+
+# For each of a fixed size and a variable size structure, prints whether
+# serialize_many matches serializing each item in turn, whether
+# deserialize_many reads that back, and whether the iovecs gather to the
+# same bytes, or that there are no iovecs
+HARNESS = '''
+#define CHECK_MANY(type, items, count) do { \\
+    uint8_t single[512], many[512], gathered[512]; \\
+    size_t length = 0; \\
+    for (size_t i = 0; i < count; i++) { \\
+        length += type##_serialize(&(single[length]), sizeof(single) - length, &(items[i])); \\
+    } \\
+    ssize_t manyLength = type##_serialize_many(many, sizeof(many), items, count); \\
+    printf("%d ", manyLength == (ssize_t)length && memcmp(single, many, length) == 0); \\
+    if (type##_deserialize_many(many, manyLength, decoded, count) != manyLength) { \\
+        return 1; \\
+    } \\
+    printf("%d ", type##_serialize_many(many, sizeof(many), decoded, count) == manyLength && memcmp(single, many, length) == 0); \\
+    struct iovec iov[16]; \\
+    ssize_t used = type##_serialize_iov(items, count, iov, 16); \\
+    if (used < 0) { \\
+        printf("none\\n"); \\
+    } else { \\
+        size_t gatheredLength = 0; \\
+        for (ssize_t i = 0; i < used; i++) { \\
+            memcpy(&(gathered[gatheredLength]), iov[i].iov_base, iov[i].iov_len); \\
+            gatheredLength += iov[i].iov_len; \\
+        } \\
+        printf("%d\\n", gatheredLength == length && memcmp(single, gathered, length) == 0); \\
+    } \\
+} while (0)
+
+int main(void) {
+    struct sample samples[3] = {{1, {-2, 70000}}, {0x01020304, {300, -5}}, {7, {0, 0}}};
+    int32_t values[2][3] = {{1, -2, 300000}, {-70000, 5, 6}};
+    struct reading readings[2] = {{1, 3, values[0], 0.5}, {0x0102, 2, values[1], -8.0}};
+    {
+        struct sample decoded[3];
+        CHECK_MANY(sample, samples, 3);
+    }
+    {
+        int32_t decodedValues[2][3];
+        struct reading decoded[2] = {{.values = decodedValues[0]}, {.values = decodedValues[1]}};
+        CHECK_MANY(reading, readings, 2);
+    }
+    return 0;
+}
+'''
+
+@pytest.mark.parametrize('encoding', ['fixed', 'compact'])
+@pytest.mark.parametrize('byteOrder', ['host', 'big'])
+def test_many_and_iov_match_serialize(runC, byteOrder, encoding):
+    output = runC(generateC(manySpec(byteOrder, encoding)), HARNESS)
+    inPlace = encoding == 'fixed' and (byteOrder == 'host' or sys.byteorder == 'big')
+    iov = '1' if inPlace else 'none'
+    assert output == '1 1 {0}\n1 1 {0}\n'.format(iov)
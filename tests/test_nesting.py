@@ -0,0 +1,161 @@
+import io
+import json
+
+import pytest
+
+import serc
+from serc.SerCExceptions import SerCParseError
+from helpers import generateC, generatePython
+
+POINT = {'type_name': 'point', 'byte_order': 'big', 'contents': [
+    {'name': 'x', 'type': 'int'},
+    {'name': 'y', 'type': 'int'},
+    {'name': 'z', 'type': 'double'},
+]}
+
+def nestingSpec(point, layout):
+    return {'struct_list': [point, {'type_name': 'seg', 'layout': layout, 'contents': [
+        {'name': 'id', 'type': 'uint8_t'},
+        {'name': 'a', 'type': {'type_name': 'struct', 'args': ['point']}},
+        {'name': 'b', 'type': {'type_name': 'struct', 'args': ['point']}},
+    ]}]}
+
+def test_wire_byte_order_rejects_host_nested_structure():
+    spec = nestingSpec(dict(POINT, byte_order='host'), 'packed')
+    spec['struct_list'][1]['byte_order'] = 'big'
+    with pytest.raises(SerCParseError, match='host byte order'):
+        generateC(spec)
+
+def test_packed_rejects_variable_size_nested_structure():
+    points = dict(POINT, byte_order='host', contents=POINT['contents'] + [
+        {'name': 'n', 'type': 'int'},
+        {'name': 'tags', 'type': {'type_name': 'vector', 'args': ['uint8_t']}, 'list_length': 'this->n'},
+    ])
+    with pytest.raises(SerCParseError, match='not fixed size'):
+        generateC(nestingSpec(points, 'packed'))
+
+@pytest.mark.parametrize('layout', ['packed', 'aligned'])
+def test_swaps_nested_structure(runC, layout):
+    spec = nestingSpec(POINT, layout)
+    codecs = generatePython(spec)
+    expected = codecs['seg'](7, codecs['point'](0x01020304, -2, 1.5), codecs['point'](-1, 5, -0.25))
+
+    output = runC(generateC(spec), '''
+int main(void) {
+    struct seg value = {.id = 7, .a = {.x = 0x01020304, .y = -2, .z = 1.5}, .b = {.x = -1, .y = 5, .z = -0.25}};
+    uint8_t buffer[64];
+    print_hex(buffer, seg_serialize(buffer, sizeof(buffer), &value));
+
+    struct seg decoded;
+    size_t length = read_hex(buffer, sizeof(buffer));
+    if (seg_deserialize(buffer, length, &decoded) < 0) {
+        return 1;
+    }
+    printf("%d %d %d %g %d %d %g\\n", decoded.id, decoded.a.x, decoded.a.y, decoded.a.z, decoded.b.x, decoded.b.y, decoded.b.z);
+    return 0;
+}
+''', stdin=expected.pack().hex())
+    written, decoded = output.split('\n')[:2]
+    assert bytes.fromhex(written) == expected.pack()
+    assert written.startswith('0701020304fffffffe')
+    assert decoded == '7 16909060 -2 1.5 -1 5 -0.25'
+
+def test_vectors_reject_aligned_elements():
+    # The element structure comes after the vector, so streaming only sees it at the end
+    spec = {'struct_list': [
+        {'type_name': 'poly', 'layout': 'aligned', 'contents': [
+            {'name': 'n', 'type': 'uint8_t'},
+            {'name': 'points', 'type': {'type_name': 'vector', 'args': [{'type_name': 'struct', 'args': ['point']}]}, 'list_length': 'this->n'},
+        ]},
+        dict(POINT, layout='aligned'),
+    ]}
+    with pytest.raises(SerCParseError, match='raw bytes'):
+        generateC(spec)
+    with pytest.raises(SerCParseError, match='raw bytes'):
+        serc.JsonToCSerializer(io.StringIO(json.dumps(spec))).stream(io.StringIO())
+
+def test_vectors_reject_host_elements():
+    spec = {'struct_list': [
+        {'type_name': 'poly', 'byte_order': 'little', 'contents': [
+            {'name': 'n', 'type': 'uint8_t'},
+            {'name': 'points', 'type': {'type_name': 'vector', 'args': [{'type_name': 'struct', 'args': ['point']}]}, 'list_length': 'this->n'},
+        ]},
+        dict(POINT, byte_order='host'),
+    ]}
+    with pytest.raises(SerCParseError, match='host byte order'):
+        generateC(spec)
+    with pytest.raises(SerCParseError, match='host byte order'):
+        serc.JsonToCSerializer(io.StringIO(json.dumps(spec))).stream(io.StringIO())
+
+# Nested packed structures two deep and a vector of structures, all in the
+# spec-wide byte order
+WIRE_SPEC = {'struct_list': [
+    {'type_name': 'poly', 'contents': [
+        {'name': 'n', 'type': 'uint8_t'},
+        {'name': 'points', 'type': {'type_name': 'vector', 'args': [{'type_name': 'struct', 'args': ['point']}]}, 'list_length': 'this->n'},
+        {'name': 'last', 'type': {'type_name': 'int', 'args': ['signed', 16]}},
+    ]},
+    {'type_name': 'point', 'contents': POINT['contents']},
+    nestingSpec(POINT, 'packed')['struct_list'][1],
+    {'type_name': 'pair', 'contents': [
+        {'name': 's', 'type': {'type_name': 'struct', 'args': ['seg']}},
+        {'name': 'k', 'type': {'type_name': 'int', 'args': ['unsigned', 16]}},
+    ]},
+]}
+
+WIRE_HARNESS = '''
+int main(void) {
+    struct point points[2] = {{.x = 0x01020304, .y = -2, .z = 1.5}, {.x = -1, .y = 5, .z = -0.25}};
+    struct pair value = {.s = {.id = 7, .a = points[0], .b = points[1]}, .k = 0x1234};
+    struct poly shape = {.n = 2, .points = points, .last = -3};
+    uint8_t buffer[128];
+    print_hex(buffer, pair_serialize(buffer, sizeof(buffer), &value));
+    print_hex(buffer, poly_serialize(buffer, sizeof(buffer), &shape));
+    print_hex(buffer, pair_serialize_many(buffer, sizeof(buffer), &value, 1));
+
+    struct pair decoded;
+    struct point decodedPoints[2];
+    struct poly decodedShape = {.points = decodedPoints};
+    size_t length = read_hex(buffer, PAIR_SERIALIZED_SIZE);
+    if (pair_deserialize(buffer, length, &decoded) < 0) {
+        return 1;
+    }
+    printf("%d %d %g %d %u\\n", decoded.s.a.x, decoded.s.a.y, decoded.s.a.z, decoded.s.b.x, decoded.k);
+    if (pair_deserialize_many(buffer, length, &decoded, 1) < 0) {
+        return 1;
+    }
+    printf("%d %d %g %d %u\\n", decoded.s.a.x, decoded.s.a.y, decoded.s.a.z, decoded.s.b.x, decoded.k);
+    length = read_hex(buffer, sizeof(buffer));
+    if (poly_deserialize(buffer, length, &decodedShape) < 0) {
+        return 1;
+    }
+    printf("%d %d %g %d\\n", decodedShape.points[0].x, decodedShape.points[1].y, decodedShape.points[1].z, decodedShape.last);
+    return 0;
+}
+'''
+
+@pytest.mark.parametrize('byteOrder', ['big', 'little', 'host'])
+def test_spec_wide_byte_order_swaps_nested_structures(runC, byteOrder):
+    defaults = {'byte_order': byteOrder}
+    codecs = generatePython(WIRE_SPEC, defaults)
+    points = [codecs['point'](0x01020304, -2, 1.5), codecs['point'](-1, 5, -0.25)]
+    pair = codecs['pair'](codecs['seg'](7, points[0], points[1]), 0x1234)
+    poly = codecs['poly'](2, points, -3)
+
+    output = runC(generateC(WIRE_SPEC, defaults), WIRE_HARNESS, stdin=pair.pack().hex() + poly.pack().hex())
+    written, writtenPoly, writtenMany, decoded, decodedMany, decodedPoly = output.split('\n')[:6]
+    assert bytes.fromhex(written) == pair.pack()
+    assert bytes.fromhex(writtenPoly) == poly.pack()
+    assert writtenMany == written
+    if byteOrder == 'big':
+        assert written.startswith('0701020304fffffffe')
+    assert decoded == decodedMany == '16909060 -2 1.5 -1 4660'
+    assert decodedPoly == '16909060 5 -0.25 -3'
+
+def test_host_structure_swaps_nested_structure_in_stream():
+    # The vector's elements are only defined after it, which the swaps do not depend on
+    spec = {'struct_list': [WIRE_SPEC['struct_list'][0], POINT]}
+    streamed = io.StringIO()
+    serc.JsonToCSerializer(io.StringIO(json.dumps(spec))).stream(streamed)
+    assert 'point_swap_fields(&(buffer[offset + i * sizeof(struct point)]));' in streamed.getvalue()
+    assert '#define POINT_SWAP_FIELDS (POINT_BYTE_SWAP)' in streamed.getvalue()
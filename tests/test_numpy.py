@@ -0,0 +1,55 @@
+import pytest
+
+from serc.SerCExceptions import SerCError
+from serc.SerCNumpyBackend import SerCNumpyBackend, fromBuffer, readCaptureFile
+from helpers import parseSpec, generatePython
+
+numpy = pytest.importorskip('numpy')
+
+SPEC = {'struct_list': [
+    {'type_name': 'inner', 'byte_order': 'big', 'contents': [{'name': 'a', 'type': {'type_name': 'int', 'args': ['signed', 16]}}, {'name': 'b', 'type': 'uint8_t'}]},
+    {'type_name': 'point', 'byte_order': 'big', 'contents': [
+        {'name': 'x', 'type': 'float'},
+        {'name': 'id', 'type': {'type_name': 'int', 'args': ['unsigned', 32]}},
+        {'name': 'in', 'type': {'type_name': 'struct', 'args': ['inner']}},
+    ]},
+    {'type_name': 'list', 'contents': [
+        {'name': 'n', 'type': 'uint8_t'},
+        {'name': 'values', 'type': {'type_name': 'vector', 'args': ['double']}, 'list_length': 'this->n'},
+    ]},
+]}
+
+def test_dtypes_match_the_wire_format():
+    backend = SerCNumpyBackend(parseSpec(SPEC)[0].getStructures())
+    dtype = backend.getDtype('point')
+    assert dtype.itemsize == 4 + 4 + 2 + 1
+    assert dtype['id'].str == '>u4'
+    # Variable size structures have no dtype
+    assert 'list' not in backend.getDtypes()
+
+def test_from_buffer_matches_python_codecs():
+    codecs = generatePython(SPEC)
+    points = [codecs['point'](i / 4, 1000 + i, codecs['inner'](-i, i)) for i in range(10)]
+    array = fromBuffer(b''.join(point.pack() for point in points), SerCNumpyBackend(parseSpec(SPEC)[0].getStructures()).getDtype('point'))
+    assert array['id'].tolist() == [point.id for point in points]
+    assert array['x'].tolist() == [point.x for point in points]
+    assert array['in']['a'].tolist() == [point.in_.a for point in points]
+
+def test_capture_files_without_a_whole_record_are_empty(tmp_path):
+    dtype = SerCNumpyBackend(parseSpec(SPEC)[0].getStructures()).getDtype('point')
+    capture = tmp_path / 'capture.bin'
+    capture.write_bytes(b'')
+    assert readCaptureFile(str(capture), dtype).shape == (0,)
+    capture.write_bytes(b'\0' * (dtype.itemsize - 1))
+    assert readCaptureFile(str(capture), dtype).shape == (0,)
+    capture.write_bytes(b'\0' * (dtype.itemsize * 2 + 1))
+    assert readCaptureFile(str(capture), dtype).shape == (2,)
+
+def test_zero_size_dtypes_are_rejected(tmp_path):
+    dtype = numpy.dtype([])
+    capture = tmp_path / 'capture.bin'
+    capture.write_bytes(b'\0' * 4)
+    with pytest.raises(SerCError, match='no size'):
+        fromBuffer(b'\0' * 4, dtype)
+    with pytest.raises(SerCError, match='no size'):
+        readCaptureFile(str(capture), dtype)
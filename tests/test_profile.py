@@ -0,0 +1,34 @@
+import io
+import json
+
+import serc
+from serc.SerCEmitter import SerCEmitter
+from serc.SerCProfile import SerCProfiler
+
+SPEC = {'struct_list': [
+    {'type_name': 'point', 'contents': [{'name': 'x', 'type': 'int'}, {'name': 'y', 'type': 'float'}]},
+    {'type_name': 'poly', 'contents': [
+        {'name': 'n', 'type': 'uint8_t'},
+        {'name': 'points', 'type': {'type_name': 'vector', 'args': [{'type_name': 'struct', 'args': ['point']}]}, 'list_length': 'this->n'},
+        {'name': 'origin', 'type': {'type_name': 'struct', 'args': ['point']}},
+    ]},
+]}
+
+def test_profiler_records_phases_and_member_types():
+    profiler = SerCProfiler()
+    out = SerCEmitter()
+    serc.JsonToCSerializer(io.StringIO(json.dumps(SPEC)), out, hooks=profiler).parse()
+
+    assert {name: calls for name, (wallTime, calls) in profiler.types.items()} == {
+        'SerCTypeInt': 1, 'SerCTypeUint8': 1, 'SerCTypeFloat': 1, 'SerCTypeVector': 1, 'SerCTypeStructureStub': 1}
+    assert all(wallTime >= 0 for wallTime, calls in profiler.types.values())
+    for phase in ['json.load', 'parse', 'graph', 'emit', 'emit.declaration', 'emit.serializer']:
+        assert phase in profiler.phases
+    assert profiler.phases['parse'][1] == 2
+    assert profiler.phases['emit.declaration'][1] == 2
+    assert (profiler.structureCount, profiler.memberCount) == (2, 5)
+    assert profiler.charactersEmitted == len(out.getvalue())
+
+    report = profiler.formatReport()
+    assert 'SerCTypeVector' in report
+    assert report.endswith('2 structures, 5 members, {0} characters emitted'.format(len(out.getvalue())))
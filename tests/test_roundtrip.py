@@ -0,0 +1,113 @@
+import struct
+
+import pytest
+
+from helpers import generateC, generatePython
+
+def readingSpec(layout, byteOrder):
+    return {'struct_list': [{'type_name': 'reading', 'layout': layout, 'byte_order': byteOrder, 'contents': [
+        {'name': 'id', 'type': {'type_name': 'int', 'args': ['unsigned', 32]}},
+        {'name': 'flag', 'type': 'uint8_t'},
+        {'name': 'temp', 'type': {'type_name': 'int', 'args': ['signed', 16]}},
+        {'name': 'scale', 'type': 'double'},
+        {'name': 'count', 'type': 'uint8_t'},
+        {'name': 'samples', 'type': {'type_name': 'vector', 'args': ['float']}, 'list_length': 'this->count'},
+    ]}]}
+
+HARNESS = '''
+int main(void) {
+    float samples[3] = {0.5f, -1.0f, 8.0f};
+    struct reading value = {.id = 0x01020304, .flag = 9, .temp = -300, .scale = 2.5, .count = 3, .samples = samples};
+    uint8_t buffer[256];
+    ssize_t length = reading_serialize(buffer, sizeof(buffer), &value);
+    if (length != (ssize_t)reading_size(&value)) {
+        return 1;
+    }
+    print_hex(buffer, length);
+
+    float decodedSamples[3];
+    struct reading decoded = {.samples = decodedSamples};
+    length = (ssize_t)read_hex(buffer, sizeof(buffer));
+    if (reading_deserialize(buffer, length, &decoded) != length) {
+        return 1;
+    }
+    printf("%u %u %d %g %u %g %g %g\\n", (unsigned)decoded.id, decoded.flag, decoded.temp, decoded.scale, decoded.count,
+           decodedSamples[0], decodedSamples[1], decodedSamples[2]);
+    return 0;
+}
+'''
+
+@pytest.mark.parametrize('byteOrder', ['host', 'little', 'big'])
+@pytest.mark.parametrize('layout', ['packed', 'aligned'])
+def test_c_and_python_agree(runC, layout, byteOrder):
+    spec = readingSpec(layout, byteOrder)
+    codecs = generatePython(spec)
+    expected = codecs['reading'](0x01020304, 9, -300, 2.5, 3, (0.5, -1.0, 8.0))
+
+    # C decodes what Python encodes, and the reverse
+    written, decoded = runC(generateC(spec), HARNESS, stdin=expected.pack().hex()).split('\n')[:2]
+    assert bytes.fromhex(written) == expected.pack()
+    assert codecs['reading'].unpack_from(bytes.fromhex(written)) == expected
+    assert decoded == '16909060 9 -300 2.5 3 0.5 -1 8'
+
+def test_byte_order_sets_the_wire_format(runC):
+    def written(byteOrder):
+        spec = readingSpec('packed', byteOrder)
+        stdin = generatePython(spec)['reading'](0, 0, 0, 0.0, 0, ()).pack().hex()
+        return runC(generateC(spec), HARNESS, stdin=stdin).split('\n')[0]
+    little = written('little')
+    big = written('big')
+    assert little.startswith('04030201' + '09' + 'd4fe')
+    assert big.startswith('01020304' + '09' + 'fed4')
+
+def test_python_codec_sizes():
+    codecs = generatePython(readingSpec('packed', 'little'))
+    value = codecs['reading'](1, 2, 3, 4.0, 2, (1.0, 2.0))
+    assert value.encoded_size() == 4 + 1 + 2 + 8 + 1 + 2 * 4
+    assert len(value.pack()) == value.encoded_size()
+    assert codecs['reading'].decode_from(b'\0' + value.pack(), 1) == (value, 1 + value.encoded_size())
+
+NESTED_SPEC = {'struct_list': [
+    {'type_name': 'point', 'byte_order': 'big', 'contents': [
+        {'name': 'x', 'type': 'int'},
+        {'name': 'y', 'type': {'type_name': 'int', 'args': ['signed', 16]}},
+    ]},
+    {'type_name': 'seg', 'byte_order': 'big', 'contents': [
+        {'name': 'id', 'type': 'uint8_t'},
+        {'name': 'a', 'type': {'type_name': 'struct', 'args': ['point']}},
+        {'name': 'b', 'type': {'type_name': 'struct', 'args': ['point']}},
+    ]},
+    {'type_name': 'poly', 'contents': [
+        {'name': 'n', 'type': 'uint8_t'},
+        {'name': 'points', 'type': {'type_name': 'vector', 'args': [{'type_name': 'struct', 'args': ['point']}]}, 'list_length': 'this->n'},
+    ]},
+]}
+
+def test_nested_fixed_size_structures_decode_in_one_struct():
+    codecs = generatePython(NESTED_SPEC)
+    seg, point = codecs['seg'], codecs['point']
+    value = seg(7, point(0x01020304, -2), point(-1, 5))
+    assert seg.STRUCT.format == '>Bihih'
+    assert seg.SIZE == len(value.pack()) == 13
+    assert value.pack().hex() == '07' + '01020304fffe' + 'ffffffff0005'
+    assert seg.unpack_from(value.pack()) == value
+    assert list(seg.iter_unpack(value.pack() * 2)) == [value, value]
+
+def test_fixed_size_structures_nesting_another_byte_order_have_a_size():
+    spec = {'struct_list': NESTED_SPEC['struct_list'][:2]}
+    spec['struct_list'][1] = dict(spec['struct_list'][1], byte_order='little')
+    codecs = generatePython(spec)
+    seg, point = codecs['seg'], codecs['point']
+    value = seg(7, point(0x01020304, -2), point(-1, 5))
+    assert not hasattr(seg, 'STRUCT')
+    assert seg.SIZE == len(value.pack()) == 13
+    assert list(seg.iter_unpack(value.pack() * 2)) == [value, value]
+    with pytest.raises(struct.error):
+        list(seg.iter_unpack(value.pack() + b'\0'))
+
+def test_vectors_of_structures_decode_to_tuples():
+    codecs = generatePython(NESTED_SPEC)
+    value = codecs['poly'](2, (codecs['point'](1, 2), codecs['point'](3, 4)))
+    decoded = codecs['poly'].unpack_from(value.pack())
+    assert isinstance(decoded.points, tuple)
+    assert decoded == value
@@ -0,0 +1,57 @@
+from helpers import generateC, generatePython
+
+SPEC = {'struct_list': [
+    {'type_name': 'inner', 'byte_order': 'big', 'contents': [{'name': 'a', 'type': {'type_name': 'int', 'args': ['signed', 16]}}, {'name': 'b', 'type': 'uint8_t'}]},
+    {'type_name': 'point', 'soa': True, 'byte_order': 'big', 'contents': [
+        {'name': 'x', 'type': 'float'},
+        {'name': 'y', 'type': 'float'},
+        {'name': 'id', 'type': {'type_name': 'int', 'args': ['unsigned', 32]}},
+        {'name': 'in', 'type': {'type_name': 'struct', 'args': ['inner']}},
+    ]},
+]}
+
+# Reads count points from the wire into a structure of arrays, and writes
+# them back out
+HARNESS = '''
+int main(void) {
+    uint8_t wire[1024], rewritten[1024];
+    size_t length = read_hex(wire, sizeof(wire));
+    size_t count = length / POINT_SERIALIZED_SIZE;
+    struct point_soa* soa;
+    if (point_soa_new(&soa, count) < 0) {
+        return 1;
+    }
+    if (point_soa_from_wire(soa, wire, length, count + 1) >= 0) {
+        return 1;
+    }
+    if (point_soa_from_wire(soa, wire, length, count) != (ssize_t)length) {
+        return 1;
+    }
+    if (((uintptr_t)point_soa_y(soa) % 64) != 0) {
+        return 1;
+    }
+    for (size_t i = 0; i < count; i++) {
+        struct point p;
+        point_soa_get(soa, i, &p);
+        printf("%g %u %d\\n", point_soa_y(soa)[i], (unsigned)soa->id[i], p.in.a);
+    }
+    print_hex(rewritten, point_soa_to_wire(soa, rewritten, sizeof(rewritten)));
+    free(soa);
+    return 0;
+}
+'''
+
+def test_soa_round_trip(runC):
+    codecs = generatePython(SPEC)
+    points = [codecs['point'](i * 0.5, -i, 1000 + i, codecs['inner'](-i, 7)) for i in range(20)]
+    wire = b''.join(point.pack() for point in points)
+    lines = runC(generateC(SPEC), HARNESS, stdin=wire.hex()).split('\n')
+    assert lines[:20] == ['{0:g} {1} {2}'.format(-i, 1000 + i, -i) for i in range(20)]
+    assert bytes.fromhex(lines[20]) == wire
+
+def test_soa_only_for_fixed_size_structures():
+    code = generateC({'struct_list': [{'type_name': 'list', 'contents': [
+        {'name': 'n', 'type': 'uint8_t'},
+        {'name': 'values', 'type': {'type_name': 'vector', 'args': ['double']}, 'list_length': 'this->n'},
+    ]}]}, defaults={'soa': True})
+    assert 'list_soa' not in code
@@ -0,0 +1,77 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from serc.SerCSplit import writeSplit
+from helpers import parseSpec
+
+SPEC = {'struct_list': [
+    {'type_name': 'poly', 'contents': [
+        {'name': 'n', 'type': 'uint8_t'},
+        {'name': 'points', 'type': {'type_name': 'vector', 'args': [{'type_name': 'struct', 'args': ['point']}]}, 'list_length': 'this->n'},
+    ]},
+    {'type_name': 'point', 'byte_order': 'big', 'contents': [
+        {'name': 'x', 'type': 'int'},
+        {'name': 'y', 'type': 'int'},
+    ]},
+    {'type_name': 'seg', 'contents': [
+        {'name': 'id', 'type': 'uint8_t'},
+        {'name': 'a', 'type': {'type_name': 'struct', 'args': ['point']}},
+        {'name': 'b', 'type': {'type_name': 'struct', 'args': ['point']}},
+    ]},
+]}
+
+MAIN = '''#include <stdio.h>
+#include "poly.h"
+#include "seg.h"
+
+int main(void) {
+    struct point points[2] = {{.x = 1, .y = -2}, {.x = 3, .y = 4}};
+    struct poly shape = {.n = 2, .points = points};
+    struct seg value = {.id = 7, .a = {.x = 5, .y = 6}, .b = {.x = -7, .y = 8}};
+    uint8_t buffer[64];
+    ssize_t length = poly_serialize(buffer, sizeof(buffer), &shape);
+    struct point decodedPoints[2];
+    struct poly decodedShape = {.points = decodedPoints};
+    if (length != 17 || buffer[4] != 1 || poly_deserialize(buffer, length, &decodedShape) != length) {
+        return 1;
+    }
+    length = seg_serialize(buffer, sizeof(buffer), &value);
+    struct seg decoded;
+    if (length != 17 || buffer[4] != 5 || seg_deserialize(buffer, length, &decoded) != length) {
+        return 1;
+    }
+    printf("%d %d %d %d\\n", decodedPoints[0].y, decodedPoints[1].x, decoded.a.y, decoded.b.x);
+    return 0;
+}
+'''
+
+def test_split_files_compile_and_link(tmp_path):
+    compiler = shutil.which('cc') or shutil.which('gcc')
+    if compiler is None:
+        pytest.skip('no C compiler')
+    splitDir = str(tmp_path / 'split')
+    written, unchanged = writeSplit(parseSpec(SPEC)[0], splitDir)
+    assert sorted(os.path.basename(path) for path in written) == ['point.c', 'point.h', 'poly.c', 'poly.h', 'seg.c', 'seg.h']
+    assert unchanged == []
+
+    (tmp_path / 'main.c').write_text(MAIN)
+    sources = [str(tmp_path / 'main.c')] + [path for path in written if path.endswith('.c')]
+    objects = []
+    for source in sources:
+        objects.append(source[:-2] + '.o')
+        subprocess.run([compiler, '-std=c11', '-Wall', '-Werror', '-Wno-unused-function', '-I', splitDir, '-c', '-o', objects[-1], source], check=True)
+    binary = str(tmp_path / 'main')
+    subprocess.run([compiler, '-o', binary] + objects, check=True)
+    assert subprocess.run([binary], capture_output=True, text=True, check=True).stdout == '-2 3 6 -7\n'
+
+def test_unchanged_split_rewrites_nothing(tmp_path):
+    splitDir = str(tmp_path / 'split')
+    written, unchanged = writeSplit(parseSpec(SPEC)[0], splitDir)
+    mtimes = {path: os.stat(path).st_mtime_ns for path in written}
+    written, unchanged = writeSplit(parseSpec(SPEC)[0], splitDir)
+    assert written == []
+    assert sorted(unchanged) == sorted(mtimes)
+    assert {path: os.stat(path).st_mtime_ns for path in unchanged} == mtimes
@@ -0,0 +1,82 @@
+import io
+import json
+
+import pytest
+
+import serc
+from serc.SerCExceptions import SerCParseError
+from serc.SerCStream import iterStructList
+from helpers import generateC
+
+def streamSpec(spec, defaults=None):
+    """The C code generated for a spec dictionary in streaming mode"""
+    out = io.StringIO()
+    serc.JsonToCSerializer(io.StringIO(json.dumps(spec)), defaults=defaults).stream(out)
+    return out.getvalue()
+
+def struct(typeName):
+    return {'type_name': 'struct', 'args': [typeName]}
+
+def vector(element):
+    return {'type_name': 'vector', 'args': [element]}
+
+IN_ORDER = {'struct_list': [
+    {'type_name': 'leaf', 'contents': [{'name': 'x', 'type': 'int'}]},
+    {'type_name': 'mid', 'envelope': 'crc16', 'contents': [{'name': 'l', 'type': struct('leaf')}, {'name': 'y', 'type': 'double'}]},
+    {'type_name': 'outer', 'encoding': 'compact', 'contents': [
+        {'name': 'n', 'type': 'uint8_t'},
+        {'name': 'ms', 'type': vector(struct('leaf')), 'list_length': 'this->n'},
+        {'name': 'v', 'type': vector({'type_name': 'int', 'args': ['signed', 32]}), 'list_length': 'this->n'},
+    ]},
+]}
+
+# mid nests leaf before it is defined, and a and b refer to each other through vectors
+OUT_OF_ORDER = {'struct_list': [
+    {'type_name': 'mid', 'contents': [{'name': 'l', 'type': struct('leaf')}]},
+    {'type_name': 'leaf', 'contents': [{'name': 'x', 'type': 'int'}]},
+    {'type_name': 'a', 'contents': [{'name': 'n', 'type': 'uint8_t'}, {'name': 'bs', 'type': vector(struct('b')), 'list_length': 'this->n'}]},
+    {'type_name': 'b', 'contents': [{'name': 'n', 'type': 'uint8_t'}, {'name': 'as', 'type': vector(struct('a')), 'list_length': 'this->n'}]},
+]}
+
+@pytest.mark.parametrize('defaults', [None, {'allocation': 'arena', 'soa': True}])
+def test_stream_matches_parse(defaults):
+    assert streamSpec(IN_ORDER, defaults) == generateC(IN_ORDER, defaults)
+
+def test_stream_out_of_order():
+    # The same code, though structures may be defined in a different order
+    streamed = streamSpec(OUT_OF_ORDER)
+    assert sorted(streamed.splitlines()) == sorted(generateC(OUT_OF_ORDER).splitlines())
+    assert streamed.index('struct leaf {') < streamed.index('struct mid {')
+
+def test_stream_errors():
+    with pytest.raises(SerCParseError, match='more than once'):
+        streamSpec({'struct_list': IN_ORDER['struct_list'] + IN_ORDER['struct_list'][:1]})
+    with pytest.raises(SerCParseError, match='unknown structure'):
+        streamSpec({'struct_list': IN_ORDER['struct_list'][1:]})
+
+@pytest.mark.parametrize('chunkSize', [1, 7, 4096])
+def test_iter_struct_list(chunkSize):
+    text = json.dumps({'version': 1, 'struct_list': OUT_OF_ORDER['struct_list'], 'after': [1, 2]}, indent=2)
+    assert list(iterStructList(io.StringIO(text), chunkSize)) == OUT_OF_ORDER['struct_list']
+
+class CountingReader(io.StringIO):
+    """A file that counts how many characters have been read from it"""
+    def __init__(self, text):
+        super().__init__(text)
+        self.charactersRead = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.charactersRead += len(chunk)
+        return chunk
+
+def test_malformed_json_is_reported_straight_away():
+    spec = CountingReader('{"struct_list": [{"type_name": "a",, "contents": []}' + ' ' * 1000000 + ']}')
+    with pytest.raises(SerCParseError, match='malformed JSON.*character 35'):
+        list(iterStructList(spec, 64))
+    assert spec.charactersRead < 1000
+
+@pytest.mark.parametrize('text', ['{"struct_list": [{"type_name": "a"', '{"struct_list": [{"type_name": "a', '{"struct_list": [{"n": tru'])
+def test_truncated_json(text):
+    with pytest.raises(SerCParseError, match='truncated'):
+        list(iterStructList(io.StringIO(text), 4))
@@ -0,0 +1,80 @@
+import pytest
+
+from serc.SerCExceptions import SerCParseError
+from helpers import generateC, generatePython
+
+def vectorSpec(lengthMember, **options):
+    return {'struct_list': [
+        {'type_name': 'header', 'byte_order': 'big', 'contents': [
+            {'name': 'version', 'type': 'uint8_t'},
+            {'name': 'count', 'type': {'type_name': 'int', 'args': ['unsigned', 16]}},
+        ]},
+        {'type_name': 'point', 'byte_order': 'big', 'contents': [
+            {'name': 'x', 'type': 'int'},
+            {'name': 'y', 'type': 'int'},
+        ]},
+        dict({'type_name': 'shape', 'byte_order': 'big', 'contents': [
+            {'name': 'hdr', 'type': {'type_name': 'struct', 'args': ['header']}},
+            {'name': 'n', 'type': 'uint8_t'},
+            {'name': 'points', 'type': {'type_name': 'vector', 'args': [{'type_name': 'struct', 'args': ['point']}]}, 'list_length': lengthMember},
+            {'name': 'scale', 'type': 'double'},
+        ]}, **options),
+    ]}
+
+VIEW_HARNESS = '''
+int main(void) {
+    uint8_t buffer[256];
+    size_t length = read_hex(buffer, sizeof(buffer));
+    size_t count;
+    const uint8_t* points = shape_view_points(buffer, &count);
+    if (shape_view_size(buffer) != length || points != buffer + 4) {
+        return 1;
+    }
+    for (size_t i = 0; i < count; i++) {
+        struct point value = shape_view_points_at(buffer, i);
+        printf("%d %d ", value.x, value.y);
+    }
+    printf("%u %u %g\\n", header_view_count(shape_view_hdr(buffer)), shape_view_n(buffer), shape_view_scale(buffer));
+    return 0;
+}
+'''
+
+@pytest.mark.parametrize('lengthMember', ['this->n', 'this->hdr.count'])
+def test_views_read_vectors_of_structures(runC, lengthMember):
+    spec = vectorSpec(lengthMember)
+    codecs = generatePython(spec)
+    points = (codecs['point'](0x01020304, -2), codecs['point'](-1, 5))
+    value = codecs['shape'](codecs['header'](1, 2), 2, points, 1.5)
+
+    output = runC(generateC(spec), VIEW_HARNESS, stdin=value.pack().hex())
+    assert output == '16909060 -2 -1 5 2 2 1.5\n'
+
+def test_views_stop_at_lengths_they_cannot_read(runC):
+    # The size of the nested member's own nested structure has no view
+    spec = vectorSpec('this->hdr.count')
+    spec['struct_list'][0]['contents'].append({'name': 'inner', 'type': {'type_name': 'struct', 'args': ['point']}})
+    spec['struct_list'].insert(0, spec['struct_list'].pop(1))
+    spec['struct_list'][2]['contents'][2]['list_length'] = 'this->hdr.inner.x'
+    code = generateC(spec)
+    assert 'shape_view_n(' in code
+    assert 'shape_view_points(' not in code
+    runC(code, 'int main(void) { return 0; }')
+
+def test_views_stop_at_compact_lengths(runC):
+    spec = vectorSpec('this->n')
+    spec['struct_list'][2]['contents'][1]['encoding'] = 'varint'
+    code = generateC(spec)
+    assert 'shape_view_hdr(' in code
+    assert 'shape_view_n(' not in code
+    assert 'shape_view_points(' not in code
+    runC(code, 'int main(void) { return 0; }')
+
+def test_lengths_must_come_before_their_vector():
+    spec = vectorSpec('this->n')
+    contents = spec['struct_list'][2]['contents']
+    contents.append(contents.pop(1))
+    with pytest.raises(SerCParseError, match='not before it'):
+        generateC(spec)
+    spec = vectorSpec('this->m')
+    with pytest.raises(SerCParseError, match='unknown member'):
+        generateC(spec)
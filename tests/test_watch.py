@@ -0,0 +1,62 @@
+import io
+import json
+import os
+
+from serc.SerCBatch import outputPathFor
+from serc.SerCWatch import SerCWatcher
+
+def pointSpec(yType='int'):
+    return {'struct_list': [
+        {'type_name': 'point', 'contents': [{'name': 'x', 'type': 'int'}, {'name': 'y', 'type': yType}]},
+        {'type_name': 'flag', 'contents': [{'name': 'on', 'type': 'uint8_t'}]},
+    ]}
+
+def writeSpec(path, spec, step):
+    """Write a spec, moving its mtime on so the watcher sees every write"""
+    path.write_text(json.dumps(spec))
+    os.utime(path, ns=(step * 10 ** 9, step * 10 ** 9))
+
+def readFiles(directory):
+    return {name: (directory / name).read_text() for name in sorted(os.listdir(directory))}
+
+def test_poll_rewrites_only_the_changed_structure(tmp_path):
+    specPath = tmp_path / 'spec.json'
+    splitDir = tmp_path / 'split'
+    log = io.StringIO()
+    writeSpec(specPath, pointSpec(), 1)
+    watcher = SerCWatcher([str(specPath)], splitDir=str(splitDir), log=log)
+    assert watcher.poll() == [str(specPath)]
+    assert watcher.poll() == []
+    before = readFiles(splitDir)
+    mtimes = {name: os.stat(splitDir / name).st_mtime_ns for name in before}
+
+    writeSpec(specPath, pointSpec('double'), 2)
+    assert watcher.poll() == [str(specPath)]
+    after = readFiles(splitDir)
+    assert 'parsed 1 of 2 structures, wrote 2 files' in log.getvalue().splitlines()[-1]
+    assert after['point.h'] != before['point.h']
+    assert after['flag.h'] == before['flag.h']
+    assert os.stat(splitDir / 'flag.h').st_mtime_ns == mtimes['flag.h']
+    assert os.stat(splitDir / 'flag.c').st_mtime_ns == mtimes['flag.c']
+
+def test_poll_keeps_outputs_on_parse_errors(tmp_path):
+    specPath = tmp_path / 'spec.json'
+    log = io.StringIO()
+    writeSpec(specPath, pointSpec(), 1)
+    watcher = SerCWatcher([str(specPath)], outputDir=str(tmp_path / 'out'), log=log)
+    watcher.poll()
+    outputPath = outputPathFor(str(specPath), str(tmp_path / 'out'))
+    with open(outputPath) as outputFile:
+        before = outputFile.read()
+
+    writeSpec(specPath, pointSpec('no_such_type'), 2)
+    assert watcher.poll() == [str(specPath)]
+    assert 'SerCParseError' in log.getvalue().splitlines()[-1]
+    with open(outputPath) as outputFile:
+        assert outputFile.read() == before
+
+    # The next good edit is picked up again
+    writeSpec(specPath, pointSpec('double'), 3)
+    watcher.poll()
+    with open(outputPath) as outputFile:
+        assert 'double y;' in outputFile.read()